@@ -0,0 +1,103 @@
+# benchmarks/bench_codec.py
+"""
+Per-request serialization cost of the prediction endpoints.
+
+"generic" is what FastAPI did for `payload: dict` handlers: stdlib json.loads,
+pydantic validation of the dict, build_feature_matrix, and jsonable_encoder +
+JSONResponse for the response. "codec" is src/codec.py: orjson.loads straight
+into a FeatureSchema matrix, and orjson.dumps of the numpy predictions. The
+1-row case is a /predict call (with and without echoing the input); larger
+sizes are /predict/batch record payloads.
+
+Run from the repo root:
+    python -m benchmarks.bench_codec --rows 1 100 10000
+"""
+
+import argparse
+import json
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from benchmarks.common import time_call
+from benchmarks.load_test import standin_records
+from src import codec
+from src.codec import FeatureSchema
+from src.inference import build_feature_matrix
+
+NAMES = ["full_sq", "life_sq", "floor", "product_type"]
+_dict_adapter = TypeAdapter(dict)
+
+
+def generic_decode(body: bytes, single: bool) -> np.ndarray:
+    payload = _dict_adapter.validate_python(json.loads(body))
+    if single:
+        payload = {"records": [payload]}
+    X, _ = build_feature_matrix(payload, NAMES)
+    return X
+
+
+def codec_decode(schema: FeatureSchema, body: bytes, single: bool) -> np.ndarray:
+    payload = codec.loads(body)
+    return schema.matrix({"records": [payload]} if single else payload)
+
+
+def generic_encode(content: dict) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 100, 10_000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    schema = FeatureSchema(NAMES)
+    for n in args.rows:
+        records = standin_records(n)
+        single = n == 1
+        body = json.dumps(records[0] if single else {"records": records}).encode()
+        np.testing.assert_array_equal(
+            generic_decode(body, single), codec_decode(schema, body, single)
+        )
+        preds = np.random.default_rng(0).normal(8e6, 1e6, n)
+        if single:
+            reply = {"prediction": float(preds[0]), "model_version": "v1"}
+            echoed = {"input": records[0], **reply}
+            old_reply, new_reply = echoed, reply
+        else:
+            old_reply = {
+                "predictions": preds.tolist(),
+                "count": n,
+                "model_version": "v1",
+            }
+            new_reply = {"predictions": preds, "count": n, "model_version": "v1"}
+
+        repeat = max(5, args.repeat // max(1, n // 1000))
+
+        def p50(fn):
+            return time_call(fn, repeat)["p50_ms"]
+
+        result = {
+            "rows": n,
+            "request_bytes": len(body),
+            "decode_generic_ms": p50(lambda: generic_decode(body, single)),
+            "decode_codec_ms": p50(lambda: codec_decode(schema, body, single)),
+            "encode_generic_ms": p50(lambda: generic_encode(old_reply)),
+            "encode_codec_ms": p50(lambda: codec.dumps(new_reply)),
+        }
+        if single:
+            result["encode_codec_echo_ms"] = p50(lambda: codec.dumps(echoed))
+        result["saved_ms"] = (
+            result["decode_generic_ms"]
+            + result["encode_generic_ms"]
+            - result["decode_codec_ms"]
+            - result["encode_codec_ms"]
+        )
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_drift.py
+"""
+Per-request cost and memory of the drift monitor as traffic accumulates.
+
+Feeds single-row observations (the /predict path) and reports the p50 cost of
+one observe() call (last 10k calls) and the traced Python heap after each
+checkpoint; tracemalloc itself inflates the absolute timings.
+
+Run from the repo root:
+    python -m benchmarks.bench_drift --checkpoints 1000 100000 1000000
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+from benchmarks.common import FEATURES, synthetic_frame
+from src.drift_monitor import DriftMonitor, build_reference_profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--checkpoints", type=int, nargs="+", default=[1_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    reference = synthetic_frame(50_000, seed=0)
+    profile = build_reference_profile(reference[FEATURES], reference["price_doc"])
+    traffic = synthetic_frame(10_000, seed=1)
+    rows = traffic[FEATURES].to_numpy()[:, None, :]
+    preds = traffic["price_doc"].to_numpy()[:, None]
+
+    tracemalloc.start()
+    monitor = DriftMonitor()
+    seen, results = 0, []
+    for checkpoint in args.checkpoints:
+        samples = deque(maxlen=10_000)  # bounded so only the monitor can grow
+        while seen < checkpoint:
+            i = seen % len(rows)
+            start = time.perf_counter()
+            monitor.observe(profile, rows[i], preds[i])
+            samples.append(time.perf_counter() - start)
+            seen += 1
+        current, _ = tracemalloc.get_traced_memory()
+        result = {
+            "rows_observed": seen,
+            "observe_p50_us": float(np.percentile(samples, 50) * 1e6),
+            "traced_memory_kb": current / 1024,
+        }
+        results.append(result)
+        print(
+            f"rows={seen:>9}  observe p50 {result['observe_p50_us']:6.1f} us  "
+            f"traced memory {result['traced_memory_kb']:8.1f} KB"
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
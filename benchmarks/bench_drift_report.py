@@ -0,0 +1,109 @@
+# benchmarks/bench_drift_report.py
+"""
+Full-data drift report vs. the sampled, parallel path in
+monitoring/drift_sampling.py.
+
+"full" loads both CSVs whole and runs every column test over every row in
+one process; when evidently is installed the original
+generate_data_drift_report is timed as well, though it runs Evidently's own
+tests rather than the KS / chi-square ones. "sampled cold" samples both
+files and fills the reference cache; "sampled warm" reuses it, so only the
+current file is read.
+
+Run from the repo root:
+    python -m benchmarks.bench_drift_report --rows 300000 --columns 40
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from monitoring.drift_sampling import (
+    DROP_COLUMNS,
+    column_drift,
+    generate_sampled_drift_report,
+    reference_stats,
+)
+
+
+def write_csv(path: str, rows: int, columns: int, seed: int, shift: float):
+    rng = np.random.default_rng(seed)
+    data = {f"num_{i}": rng.normal(shift * (i % 2), 1, rows) for i in range(columns)}
+    data["product_type"] = rng.choice(["Investment", "OwnerOccupier"], rows)
+    data["price_doc"] = rng.uniform(1e6, 1e7, rows)
+    pd.DataFrame(data).to_csv(path, index=False)
+
+
+def full_data_report(reference_path: str, current_path: str) -> int:
+    reference = pd.read_csv(reference_path).drop(columns=DROP_COLUMNS, errors="ignore")
+    current = pd.read_csv(current_path).drop(columns=DROP_COLUMNS, errors="ignore")
+    ref_stats = reference_stats(reference)
+    results = [column_drift((c, ref_stats[c], current[c])) for c in ref_stats]
+    return sum(r["drift"] for r in results)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--columns", type=int, default=40)
+    parser.add_argument("--sample-size", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        reference = os.path.join(tmp, "train.csv")
+        current = os.path.join(tmp, "test.csv")
+        write_csv(reference, args.rows, args.columns, seed=0, shift=0.0)
+        write_csv(current, args.rows, args.columns, seed=1, shift=0.1)
+
+        def sampled():
+            return generate_sampled_drift_report(
+                reference,
+                current,
+                output_path=os.path.join(tmp, "drift.json"),
+                sample_size=args.sample_size,
+                workers=args.workers,
+                cache_dir=os.path.join(tmp, "cache"),
+            )["drifted_columns"]
+
+        timings = {}
+        timings["full"], full_drifted = timed(
+            lambda: full_data_report(reference, current)
+        )
+        try:
+            from monitoring.evidently_dashboard import generate_data_drift_report
+
+            timings["evidently_full"], _ = timed(
+                lambda: generate_data_drift_report(
+                    pd.read_csv(reference),
+                    pd.read_csv(current),
+                    os.path.join(tmp, "report.html"),
+                )
+            )
+        except ImportError:
+            print("evidently not installed; skipping the Evidently full-data timing")
+        timings["sampled_cold"], cold_drifted = timed(sampled)
+        timings["sampled_warm"], warm_drifted = timed(sampled)
+
+    for name, seconds in timings.items():
+        print(f"{name:>15}: {seconds:7.2f}s")
+    print(
+        f"drifted columns: full {full_drifted}, sampled {cold_drifted}/{warm_drifted}"
+        f" of {args.columns + 1}"
+    )
+    print(json.dumps({"args": vars(args), "seconds": timings}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_incremental.py
+"""
+Warm-start retraining vs. a full retrain when a delta of new listings arrives.
+
+The base model is fitted on historical rows. Then a delta arrives whose
+prices have drifted upward. "full" refits a fresh forest on history + delta;
+"incremental" grows --new-trees on the delta and retires the oldest trees
+to stay at --n-estimators. Both are scored on held-out rows drawn from the
+new distribution.
+
+Run from the repo root:
+    python -m benchmarks.bench_incremental --history-rows 50000 --delta-rows 5000
+"""
+
+import argparse
+import copy
+import json
+import time
+
+import pandas as pd
+from sklearn.ensemble import ExtraTreesRegressor
+from sklearn.metrics import root_mean_squared_error
+
+from benchmarks.common import FEATURES, synthetic_frame
+from src.incremental_training import grow_forest
+
+
+def drifted_frame(n_rows: int, seed: int) -> pd.DataFrame:
+    df = synthetic_frame(n_rows, seed)
+    df["price_doc"] *= 1.15  # market moved since the history was collected
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--history-rows", type=int, default=50_000)
+    parser.add_argument("--delta-rows", type=int, default=5_000)
+    parser.add_argument("--n-estimators", type=int, default=50)
+    parser.add_argument("--new-trees", type=int, default=10)
+    args = parser.parse_args()
+
+    history = synthetic_frame(args.history_rows, seed=0)
+    delta = drifted_frame(args.delta_rows, seed=1)
+    holdout = drifted_frame(10_000, seed=2)
+
+    base = ExtraTreesRegressor(
+        n_estimators=args.n_estimators, n_jobs=-1, random_state=0
+    )
+    base.fit(history[FEATURES], history["price_doc"])
+
+    def rmse(model):
+        preds = model.predict(holdout[FEATURES])
+        return float(root_mean_squared_error(holdout["price_doc"], preds))
+
+    start = time.perf_counter()
+    full = ExtraTreesRegressor(
+        n_estimators=args.n_estimators, n_jobs=-1, random_state=0
+    )
+    combined = pd.concat([history, delta], ignore_index=True)
+    full.fit(combined[FEATURES], combined["price_doc"])
+    full_seconds = time.perf_counter() - start
+
+    incremental = copy.deepcopy(base)
+    start = time.perf_counter()
+    grow_forest(
+        incremental,
+        delta[FEATURES],
+        delta["price_doc"],
+        "delta",
+        n_new_trees=args.new_trees,
+        max_trees=args.n_estimators,
+    )
+    incremental_seconds = time.perf_counter() - start
+
+    summary = {
+        "base_rmse": rmse(base),
+        "full": {"seconds": full_seconds, "rmse": rmse(full)},
+        "incremental": {"seconds": incremental_seconds, "rmse": rmse(incremental)},
+    }
+    print(
+        f"base (no retrain) rmse {summary['base_rmse']:,.0f}\n"
+        f"full retrain      {full_seconds:7.2f}s  rmse {summary['full']['rmse']:,.0f}\n"
+        f"incremental       {incremental_seconds:7.2f}s  "
+        f"rmse {summary['incremental']['rmse']:,.0f}  "
+        f"({full_seconds / incremental_seconds:.1f}x faster)"
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_model_format.py
+"""
+Size, load time and accuracy of the .ftree format against the joblib pickle.
+
+Loads are timed cold-ish (file already in the page cache, fresh objects each
+time): joblib.load unpickles every tree, read_forest only maps the file and
+hashes it (or not, with verify=False). Accuracy is the max absolute and
+relative difference from sklearn's predictions on held-out rows.
+
+Run from the repo root:
+    python -m benchmarks.bench_model_format --n-estimators 100
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+import joblib
+import numpy as np
+
+from benchmarks.common import FEATURES, synthetic_frame, time_call, train_standin_model
+from src.model_format import LEAF_ENCODINGS, read_forest, write_forest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--train-rows", type=int, default=20_000)
+    parser.add_argument("--eval-rows", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    model = train_standin_model(args.train_rows, args.n_estimators)
+    model.set_params(n_jobs=1)
+    X = synthetic_frame(args.eval_rows, seed=1)[FEATURES]
+    expected = model.predict(X)
+    X = X.to_numpy()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, "model.pkl")
+        joblib.dump(model, pickle_path)
+        results = [
+            {
+                "format": "joblib",
+                "bytes": os.path.getsize(pickle_path),
+                "load_ms": time_call(
+                    lambda: joblib.load(pickle_path), args.repeat, warmup=1
+                )["p50_ms"],
+            }
+        ]
+        for encoding in LEAF_ENCODINGS:
+            path = os.path.join(tmp, f"model.{encoding}.ftree")
+            write_forest(model, path, encoding)
+            error = np.abs(read_forest(path).predict(X) - expected)
+            results.append(
+                {
+                    "format": f"ftree/{encoding}",
+                    "bytes": os.path.getsize(path),
+                    "load_ms": time_call(lambda: read_forest(path), args.repeat)[
+                        "p50_ms"
+                    ],
+                    "load_unverified_ms": time_call(
+                        lambda: read_forest(path, verify=False), args.repeat
+                    )["p50_ms"],
+                    "max_abs_error": float(error.max()),
+                    "max_rel_error": float((error / np.abs(expected)).max()),
+                }
+            )
+
+    for r in results:
+        print(json.dumps(r))
+
+
+if __name__ == "__main__":
+    main()
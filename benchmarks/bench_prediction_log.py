@@ -0,0 +1,77 @@
+# benchmarks/bench_prediction_log.py
+"""
+Request-path cost of capturing predictions: a synchronous JSONL append per
+request (serialize, write, flush) versus prediction_log.PredictionLog, which
+only queues a reference for its writer thread.
+
+"request_path_us" is the time per request spent in the handler;
+"drain_s" is how long the background writer then needs to write everything.
+The writer is held back until the end so the two are measured apart; in a
+server it runs concurrently and shares the CPU (and the GIL) with requests.
+
+Run from the repo root:
+    python -m benchmarks.bench_prediction_log --requests 50000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.load_test import standin_records
+from src import codec
+from src.prediction_log import PredictionLog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50000)
+    args = parser.parse_args()
+
+    bodies = [codec.dumps(r) for r in standin_records(1000)]
+    results = {"requests": args.requests}
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "sync.jsonl"), "ab") as fh:
+            start = time.perf_counter()
+            for i in range(args.requests):
+                record = {
+                    "ts": time.time(),
+                    "endpoint": "/predict",
+                    "model_version": "v1",
+                    "predictions": [float(i)],
+                    "input": codec.loads(bodies[i % len(bodies)]),
+                }
+                fh.write(codec.dumps(record) + b"\n")
+                fh.flush()
+            elapsed = time.perf_counter() - start
+        results["sync_jsonl"] = {"request_path_us": elapsed / args.requests * 1e6}
+
+        for fmt in ("jsonl", "parquet"):
+            log = PredictionLog(
+                os.path.join(tmp, fmt),
+                fmt=fmt,
+                capacity=args.requests,
+                flush_interval=3600,
+            )
+            start = time.perf_counter()
+            for i in range(args.requests):
+                log.record("/predict", "v1", bodies[i % len(bodies)], float(i))
+            queued = time.perf_counter() - start
+            log.close(timeout=None)
+            results[f"buffered_{fmt}"] = {
+                "request_path_us": queued / args.requests * 1e6,
+                "drain_s": time.perf_counter() - start - queued,
+                "file_mb": sum(
+                    os.path.getsize(os.path.join(tmp, fmt, f))
+                    for f in os.listdir(os.path.join(tmp, fmt))
+                )
+                / 1024
+                / 1024,
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
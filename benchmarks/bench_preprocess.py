@@ -0,0 +1,93 @@
+# benchmarks/bench_preprocess.py
+"""
+Per-row cost of turning raw payloads into model input, before and after the
+fitted FeaturePreprocessor.
+
+serving  before: the original /predict path, one pd.DataFrame per record,
+                 dict .map for product_type, select_dtypes
+serving  after:  build_feature_matrix with the fitted preprocessor
+training before: encode_labels + map_booleans (LabelEncoder refit per call)
+training after:  FeaturePreprocessor.transform with lookup arrays
+
+Run from the repo root:
+    python -m benchmarks.bench_preprocess --batch-sizes 1 64 4096
+"""
+
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import synthetic_frame, time_call
+from src.data_ingestion import FeaturePreprocessor, encode_labels, map_booleans
+from src.inference import build_feature_matrix
+
+FEATURES = ["full_sq", "life_sq", "floor", "product_type"]
+LEGACY_MAPPING = {"Investment": 1, "OwnerOccupier": 0}
+
+
+def raw_records(n_rows: int) -> list:
+    df = synthetic_frame(n_rows, seed=1)[FEATURES]
+    df["product_type"] = np.where(df["product_type"] > 0, "Investment", "OwnerOccupier")
+    return df.to_dict(orient="records")
+
+
+def legacy_serving(records: list) -> np.ndarray:
+    rows = []
+    for payload in records:
+        df = pd.DataFrame([payload])
+        df["product_type"] = df["product_type"].map(LEGACY_MAPPING)
+        rows.append(df.select_dtypes(include=["number"]).to_numpy())
+    return np.vstack(rows)
+
+
+def training_frame(records: list) -> pd.DataFrame:
+    df = pd.DataFrame(records)
+    df["water_1line"] = np.where(df["floor"] > 10, "yes", "no")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 4096])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    records = raw_records(max(args.batch_sizes))
+    preprocessor = FeaturePreprocessor().fit(training_frame(records))
+
+    results = []
+    for n in args.batch_sizes:
+        batch = records[:n]
+        frame = training_frame(batch)
+        timings = {
+            "serving_before": time_call(
+                lambda: legacy_serving(batch), repeat=args.repeat
+            ),
+            "serving_after": time_call(
+                lambda: build_feature_matrix(
+                    {"records": batch}, FEATURES, preprocessor
+                ),
+                repeat=args.repeat,
+            ),
+            "training_before": time_call(
+                lambda: map_booleans(encode_labels(frame.copy())), repeat=args.repeat
+            ),
+            "training_after": time_call(
+                lambda: preprocessor.transform(frame.copy()), repeat=args.repeat
+            ),
+        }
+        per_row_us = {k: v["p50_ms"] * 1000 / n for k, v in timings.items()}
+        results.append({"batch_size": n, "per_row_us": per_row_us})
+        print(
+            f"batch={n:>5}  serving {per_row_us['serving_before']:9.2f} -> "
+            f"{per_row_us['serving_after']:8.2f} us/row  |  training "
+            f"{per_row_us['training_before']:8.2f} -> "
+            f"{per_row_us['training_after']:8.2f} us/row"
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
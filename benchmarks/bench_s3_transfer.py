@@ -0,0 +1,151 @@
+# benchmarks/bench_s3_transfer.py
+"""
+Throughput of src/s3_transfer.py against the per-call boto3 code it replaced.
+
+"legacy" creates a new boto3 client per call like the old helpers did: one
+GET of the whole body for downloads and CSV loads, and upload_file with the
+default TransferConfig. "transfer" uses the pooled client, parallel ranged
+GETs, the streaming CSV reader and the tuned TransferConfig, and also hashes
+every byte for the sha256 check.
+
+Runs against an in-process moto S3, where every call would otherwise return
+instantly. To stand in for a real bucket, each request sleeps --latency-ms
+plus its payload size at --stream-mb-per-s (S3 throughput is limited per
+connection, which is what parallel parts work around). The sleeps release
+the GIL, so concurrent requests overlap as they would on the network. Pass
+--endpoint-url to use minio or S3 with no simulated delays.
+
+Run from the repo root:
+    python -m benchmarks.bench_s3_transfer --size-mb 128 --latency-ms 20
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import boto3
+import numpy as np
+import pandas as pd
+
+from src import s3_transfer
+
+BUCKET = "bench-transfer"
+
+
+def _simulate_network(client, latency_ms: float, mb_per_s: float):
+    """Delay every request by latency + payload / per-connection bandwidth."""
+
+    def before(params, **_):
+        body = params.get("Body", params.get("body"))
+        sent = len(body) if isinstance(body, (bytes, bytearray)) else 0
+        if hasattr(body, "seek") and hasattr(body, "tell"):
+            position = body.tell()
+            body.seek(0, os.SEEK_END)
+            sent = body.tell() - position
+            body.seek(position)
+        time.sleep(latency_ms / 1000 + sent / 2**20 / mb_per_s)
+
+    def after(parsed, model, **_):
+        if model.name == "GetObject":
+            time.sleep(parsed.get("ContentLength", 0) / 2**20 / mb_per_s)
+
+    client.meta.events.register("before-call.s3.*", before)
+    client.meta.events.register("after-call.s3.*", after)
+    return client
+
+
+def _timed(fn, size: int) -> dict:
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    return {"seconds": round(seconds, 3), "mb_per_s": round(size / 2**20 / seconds, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=128)
+    parser.add_argument("--csv-rows", type=int, default=1_000_000)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--stream-mb-per-s", type=float, default=80)
+    parser.add_argument("--endpoint-url", help="real S3-compatible endpoint")
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        s3_transfer.S3_ENDPOINT_URL = args.endpoint_url
+        mock = contextlib.nullcontext()
+    else:
+        from moto import mock_aws
+
+        for var in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+            os.environ.setdefault(var, "testing")
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        mock = mock_aws()
+
+    def network(client):
+        if args.endpoint_url:
+            return client
+        return _simulate_network(client, args.latency_ms, args.stream_mb_per_s)
+
+    def legacy_client():
+        kwargs = {"endpoint_url": args.endpoint_url} if args.endpoint_url else {}
+        return network(boto3.client("s3", **kwargs))
+
+    with mock, tempfile.TemporaryDirectory() as tmp:
+        s3_transfer.reset_client()
+        network(s3_transfer.client())
+        legacy_client().create_bucket(Bucket=BUCKET)
+
+        artifact = os.path.join(tmp, "artifact.bin")
+        with open(artifact, "wb") as fh:
+            fh.write(np.random.default_rng(0).bytes(args.size_mb * 2**20))
+        csv_path = os.path.join(tmp, "train.csv")
+        rng = np.random.default_rng(1)
+        pd.DataFrame(
+            rng.normal(size=(args.csv_rows, 4)), columns=["a", "b", "c", "price_doc"]
+        ).to_csv(csv_path, index=False)
+        size, csv_size = os.path.getsize(artifact), os.path.getsize(csv_path)
+        out = os.path.join(tmp, "out.bin")
+
+        def legacy_download():
+            body = legacy_client().get_object(Bucket=BUCKET, Key="legacy.bin")["Body"]
+            with open(out, "wb") as fh:
+                for chunk in iter(lambda: body.read(8 * 2**20), b""):
+                    fh.write(chunk)
+
+        def legacy_csv():
+            body = legacy_client().get_object(Bucket=BUCKET, Key="train.csv")["Body"]
+            return pd.read_csv(io.BytesIO(body.read()))
+
+        def transfer_csv():
+            with s3_transfer.open_object(BUCKET, "train.csv") as stream:
+                return pd.read_csv(stream)
+
+        results = {
+            "size_mb": args.size_mb,
+            "csv_mb": round(csv_size / 2**20, 1),
+            "latency_ms": args.latency_ms,
+            "stream_mb_per_s": args.stream_mb_per_s,
+            "upload_legacy": _timed(
+                lambda: legacy_client().upload_file(artifact, BUCKET, "legacy.bin"),
+                size,
+            ),
+            "upload_transfer": _timed(
+                lambda: s3_transfer.upload_file(artifact, BUCKET, "artifact.bin"), size
+            ),
+            "download_legacy": _timed(legacy_download, size),
+            "download_transfer": _timed(
+                lambda: s3_transfer.download_file(BUCKET, "artifact.bin", out), size
+            ),
+        }
+        s3_transfer.upload_file(csv_path, BUCKET, "train.csv")
+        results["csv_legacy"] = _timed(legacy_csv, csv_size)
+        results["csv_transfer"] = _timed(transfer_csv, csv_size)
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_search.py
+"""
+Wall-clock time of the hyperparameter search as the worker count grows,
+plus how many trees early stopping saved.
+
+Run from the repo root:
+    python -m benchmarks.bench_search --trials 12 --workers 1 2 4
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.common import FEATURES, synthetic_frame
+from src.hyperparameter_search import candidate_params, run_search
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trials", type=int, default=12)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--train-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.train_rows + 5_000, seed=0)
+    X, y = df[FEATURES].to_numpy(), df["price_doc"].to_numpy()
+    split = (X[: args.train_rows], y[: args.train_rows])
+    split += (X[args.train_rows :], y[args.train_rows :])
+    candidates = candidate_params(n_trials=args.trials, mode="random")
+    requested = sum(p["n_estimators"] for p in candidates)
+
+    summary = []
+    for workers in args.workers:
+        results = []
+        start = time.perf_counter()
+        best = run_search(*split, candidates, workers=workers, on_result=results.append)
+        seconds = time.perf_counter() - start
+        trained = sum(r["n_trees"] for r in results)
+        summary.append(
+            {
+                "workers": workers,
+                "seconds": seconds,
+                "pruned": sum(r["pruned"] for r in results),
+                "trees_trained": trained,
+                "trees_requested": requested,
+                "best_rmse": best["rmse"],
+            }
+        )
+        print(
+            f"workers={workers:>2}  {seconds:7.1f}s  "
+            f"pruned {summary[-1]['pruned']}/{len(results)}  "
+            f"trees {trained}/{requested}  best rmse {best['rmse']:.0f}"
+        )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/bench_startup.py
+"""
+API cold start: import time and time to first prediction.
+
+`import src.api` is timed in fresh interpreters (median of --repeat runs).
+Then uvicorn is started against a pickled stand-in model, once with the
+default blocking startup and once with FAST_STARTUP=1, polling every 50
+milliseconds for the first /health answer, the first 200 from /ready and
+the first successful /predict. All times are from process start. The
+latency of that first prediction is compared with the steady-state median.
+
+Run from the repo root:
+    python -m benchmarks.bench_startup --n-estimators 200
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import joblib
+
+from benchmarks.common import train_standin_model
+from benchmarks.load_test import UvicornServer, standin_records
+
+IMPORT_SNIPPET = (
+    "import time; s = time.perf_counter(); import src.api; "
+    "print(time.perf_counter() - s)"
+)
+
+
+def import_seconds(repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=dict(os.environ, CI_MODE="1"),
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def _poll(fn, started: float, timeout: float = 120.0, interval: float = 0.05):
+    """Seconds since `started` until fn() is truthy."""
+    while time.perf_counter() - started < timeout:
+        try:
+            if fn():
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(interval)
+    raise TimeoutError("startup milestone not reached")
+
+
+def cold_start(model_path: str, fast: bool) -> dict:
+    record = standin_records(1)[0]
+    started = time.perf_counter()
+    server = UvicornServer(model_path, FAST_STARTUP="1" if fast else "0")
+    try:
+        client = httpx.Client(base_url=server.url, timeout=30.0)
+        health = _poll(lambda: client.get("/health").status_code == 200, started)
+        ready = _poll(lambda: client.get("/ready").status_code == 200, started)
+        t0 = time.perf_counter()
+        first = client.post("/predict", json=record).json()
+        first_ms = (time.perf_counter() - t0) * 1000
+        assert "prediction" in first, first
+        first_prediction = time.perf_counter() - started
+        steady = []
+        for _ in range(50):
+            t0 = time.perf_counter()
+            client.post("/predict", json=record)
+            steady.append((time.perf_counter() - t0) * 1000)
+        client.close()
+    finally:
+        server.stop()
+    return {
+        "mode": "fast" if fast else "blocking",
+        "first_health_s": health,
+        "ready_s": ready,
+        "first_prediction_s": first_prediction,
+        "first_predict_ms": first_ms,
+        "steady_predict_p50_ms": statistics.median(steady),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(json.dumps({"import_src_api_s": import_seconds(args.repeat)}))
+    with tempfile.TemporaryDirectory(prefix="startup-") as tmp:
+        model_path = os.path.join(tmp, "model.pkl")
+        joblib.dump(train_standin_model(n_estimators=args.n_estimators), model_path)
+        for fast in (False, True):
+            print(json.dumps(cold_start(model_path, fast)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_tracking.py
+"""
+Cost of logging many metrics per call (the fluent MLflow API) versus through
+tracking.BufferedTracker.
+
+mlflow is not needed: the store is an on-disk SQLite table written the way
+MLflow's SQLAlchemy store does it, one transaction per fluent call versus
+one per log_batch. "critical_path_s" is the time the training loop spends
+logging; "total_s" also includes waiting for the final flush.
+
+Run from the repo root:
+    python -m benchmarks.bench_tracking --metrics 5000
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from src.tracking import BufferedTracker
+
+
+class SqliteStore:
+    """Minimal metrics/params/tags tables with MLflow-like transactions."""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS metrics "
+            "(run_id TEXT, key TEXT, value REAL, ts INTEGER, step INTEGER)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS params (run_id, key, value)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS tags (run_id, key, value)")
+        self.lock = threading.Lock()
+
+    def log_metric(self, run_id, key, value, step=0):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO metrics VALUES (?, ?, ?, ?, ?)",
+                (run_id, key, value, int(time.time() * 1000), step),
+            )
+
+    def log_batch(self, run_id, metrics=(), params=None, tags=None):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO metrics VALUES (?, ?, ?, ?, ?)",
+                [(run_id, *m) for m in metrics],
+            )
+            for table, rows in (("params", params), ("tags", tags)):
+                self.conn.executemany(
+                    f"INSERT INTO {table} VALUES (?, ?, ?)",
+                    [(run_id, k, str(v)) for k, v in (rows or {}).items()],
+                )
+
+    def log_artifact(self, run_id, local_path, artifact_path=None):
+        pass
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--metrics", type=int, default=5000)
+    args = parser.parse_args()
+
+    results = {"metrics": args.metrics}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteStore(os.path.join(tmp, "sync.db"))
+        start = time.perf_counter()
+        for step in range(args.metrics):
+            store.log_metric("run", "partial_rmse", 1.0 / (step + 1), step)
+        elapsed = time.perf_counter() - start
+        results["fluent"] = {"critical_path_s": elapsed, "total_s": elapsed}
+        assert store.count() == args.metrics
+
+        store = SqliteStore(os.path.join(tmp, "buffered.db"))
+        start = time.perf_counter()
+        with BufferedTracker("run", store, spool_dir=tmp) as tracker:
+            for step in range(args.metrics):
+                tracker.log_metric("partial_rmse", 1.0 / (step + 1), step=step)
+            logged = time.perf_counter() - start
+        results["buffered"] = {
+            "critical_path_s": logged,
+            "total_s": time.perf_counter() - start,
+        }
+        assert store.count() == args.metrics
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
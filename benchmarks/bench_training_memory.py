@@ -0,0 +1,124 @@
+# benchmarks/bench_training_memory.py
+"""
+Peak RSS of the training path on a large synthetic train.csv, default versus
+LEAN_TRAINING (float32 parsing of the kept columns, split_float32).
+
+default: pipeline_from_csv -> train_test_split -> ExtraTreesRegressor.fit
+lean:    pipeline_from_csv(lean=True) -> split_float32 -> fit
+
+Each mode runs in a fresh process and reports the peak RSS of its load,
+split and fit stages (src/peak_memory.py), stage times and validation RMSE.
+Trees are capped with --min-samples-leaf so the forest itself stays small
+next to the data.
+
+Run from the repo root:
+    python -m benchmarks.bench_training_memory --rows 10000000
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_frame
+
+MODES = ("default", "lean")
+
+
+def write_csv(path: str, n_rows: int, extra_columns: int, chunk: int = 1_000_000):
+    """train.csv-like file: the kept columns first, then columns drop_na drops."""
+    for start in range(0, n_rows, chunk):
+        df = synthetic_frame(min(chunk, n_rows - start), seed=start)
+        df["product_type"] = np.where(
+            df["product_type"] > 0, "Investment", "OwnerOccupier"
+        )
+        rng = np.random.default_rng(start)
+        for i in range(extra_columns):
+            df[f"extra_{i}"] = rng.normal(size=len(df)).round(3)
+        df.to_csv(path, mode="a", header=start == 0, index=False)
+
+
+def run_mode(mode: str, path: str, args, results):
+    from sklearn.ensemble import ExtraTreesRegressor
+    from sklearn.metrics import root_mean_squared_error
+    from sklearn.model_selection import train_test_split
+
+    from src.data_ingestion import pipeline_from_csv, split_float32
+    from src.peak_memory import PeakMemory
+
+    memory, seconds = PeakMemory(), {}
+    lean = mode == "lean"
+
+    start = time.perf_counter()
+    with memory.stage("load"):
+        X, y = pipeline_from_csv(path, chunksize=0, lean=lean)
+    seconds["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with memory.stage("split"):
+        if lean:
+            X_train, X_val, y_train, y_val = split_float32(X, y, 0.2, 42)
+        else:
+            X_train, X_val, y_train, y_val = train_test_split(
+                X, y, test_size=0.2, random_state=42
+            )
+    seconds["split"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with memory.stage("fit"):
+        model = ExtraTreesRegressor(
+            n_estimators=args.n_estimators,
+            min_samples_leaf=args.min_samples_leaf,
+            n_jobs=-1,
+            random_state=42,
+        ).fit(X_train, y_train)
+    seconds["fit"] = time.perf_counter() - start
+
+    rmse = root_mean_squared_error(y_val, model.predict(X_val))
+    results[mode] = {
+        **memory.metrics(),
+        "feature_mb": X.memory_usage(deep=True).sum() / 1024 / 1024,
+        "seconds": seconds,
+        "rmse": float(rmse),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--extra-columns", type=int, default=10)
+    parser.add_argument("--n-estimators", type=int, default=2)
+    parser.add_argument("--min-samples-leaf", type=int, default=100)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--csv", help="reuse (or create and keep) this CSV")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    results = ctx.Manager().dict()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv or os.path.join(tmp, "train.csv")
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            write_csv(path, args.rows, args.extra_columns)
+            print(
+                f"wrote {os.path.getsize(path) / 1024 / 1024:.0f} MB CSV "
+                f"in {time.perf_counter() - start:.0f}s",
+                flush=True,
+            )
+        for mode in args.modes:
+            proc = ctx.Process(target=run_mode, args=(mode, path, args, results))
+            proc.start()
+            proc.join()
+            if proc.exitcode != 0:
+                results[mode] = {"error": f"exit code {proc.exitcode}"}
+
+    out = {"rows": args.rows, "extra_columns": args.extra_columns, **results}
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
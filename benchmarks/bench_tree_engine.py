@@ -0,0 +1,57 @@
+# benchmarks/bench_tree_engine.py
+"""
+Compare sklearn ExtraTreesRegressor.predict with the flat-array CompiledForest.
+
+Run from the repo root:
+    python -m benchmarks.bench_tree_engine --n-estimators 100
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+from benchmarks.common import FEATURES, synthetic_frame, time_call, train_standin_model
+from src.tree_engine import CompiledForest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--train-rows", type=int, default=20_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 4096])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    model = train_standin_model(args.train_rows, args.n_estimators)
+    model.set_params(n_jobs=1)  # single-request serving path, no joblib fan-out
+    compiled = CompiledForest.from_estimator(model)
+    X = synthetic_frame(max(args.batch_sizes), seed=1)[FEATURES].to_numpy()
+
+    results = []
+    for n in args.batch_sizes:
+        batch = X[:n]
+        max_abs_diff = float(
+            np.abs(compiled.predict(batch) - model.predict(batch)).max()
+        )
+        sk = time_call(lambda: model.predict(batch), repeat=args.repeat)
+        fc = time_call(lambda: compiled.predict(batch), repeat=args.repeat)
+        results.append(
+            {
+                "batch_size": n,
+                "sklearn": sk,
+                "compiled": fc,
+                "speedup_p50": sk["p50_ms"] / fc["p50_ms"],
+                "max_abs_diff": max_abs_diff,
+            }
+        )
+        print(
+            f"batch={n:>5}  sklearn p50={sk['p50_ms']:8.3f} ms  "
+            f"compiled p50={fc['p50_ms']:8.3f} ms  "
+            f"speedup={sk['p50_ms'] / fc['p50_ms']:5.2f}x  max|diff|={max_abs_diff:.2e}"
+        )
+    print(json.dumps({"n_estimators": args.n_estimators, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/common.py
+"""Shared helpers for the benchmark scripts: synthetic data and timing."""
+
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import ExtraTreesRegressor
+
+# Benchmarks feed plain arrays to models fitted on named frames
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+FEATURES = ["full_sq", "life_sq", "floor", "product_type"]
+
+
+def synthetic_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Housing-like features plus a price_doc target."""
+    rng = np.random.default_rng(seed)
+    full_sq = rng.uniform(20, 150, n_rows)
+    df = pd.DataFrame(
+        {
+            "full_sq": full_sq,
+            "life_sq": full_sq * rng.uniform(0.4, 0.9, n_rows),
+            "floor": rng.integers(1, 30, n_rows).astype(float),
+            "product_type": rng.integers(0, 2, n_rows).astype(float),
+        }
+    )
+    df["price_doc"] = (
+        df["full_sq"] * 90_000
+        + df["product_type"] * 400_000
+        + rng.normal(0, 500_000, n_rows)
+    )
+    return df
+
+
+def train_standin_model(
+    n_rows: int = 20_000, n_estimators: int = 50, seed: int = 0
+) -> ExtraTreesRegressor:
+    """A locally trained ExtraTrees with the serving feature names."""
+    df = synthetic_frame(n_rows, seed)
+    model = ExtraTreesRegressor(n_estimators=n_estimators, n_jobs=-1, random_state=seed)
+    return model.fit(df[FEATURES], df["price_doc"])
+
+
+def time_call(fn, repeat: int = 20, warmup: int = 2) -> dict:
+    """Run `fn` repeatedly and return latency stats in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples = np.asarray(samples)
+    return {
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
@@ -0,0 +1,391 @@
+# benchmarks/load_test.py
+"""
+Reproducible load test of the prediction API against a local stand-in model.
+
+A stand-in ExtraTrees (benchmarks.common) is trained and pickled to a temp
+dir, then served either by a uvicorn subprocess (MODEL_SOURCE=local, so no
+AWS access is needed) or in-process through httpx's ASGI transport. Patterns:
+- single:     open-loop POST /predict at --rps
+- batch:      open-loop POST /predict/batch of --batch-size rows at --batch-rps
+- concurrent: --concurrency clients calling /predict back-to-back
+
+Open-loop requests are sent on a fixed schedule whether or not earlier ones
+have finished, and latency is measured from the scheduled send time, so a
+slow server shows up as latency instead of silently lowering the offered
+load. Results (p50/p95/p99, throughput, errors, server RSS) are written as
+JSON and can be compared against a stored baseline; any metric worse than
+the baseline by more than --threshold makes the run exit non-zero.
+
+Run from the repo root:
+    python -m benchmarks.load_test --output load_results.json
+    python -m benchmarks.load_test --baseline benchmarks/baselines/load_test.json
+    python -m benchmarks.load_test --save-baseline benchmarks/baselines/load_test.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import joblib
+import numpy as np
+
+from benchmarks.common import FEATURES, synthetic_frame, train_standin_model
+
+PATTERNS = ("single", "batch", "concurrent")
+# Metrics compared against the baseline, and whether higher is better
+COMPARED = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "throughput_rps": True,
+    "server_rss_mb": False,
+}
+
+
+def standin_records(n: int, seed: int = 1) -> list:
+    """JSON records shaped like real /predict payloads."""
+    df = synthetic_frame(n, seed)[FEATURES]
+    df["product_type"] = np.where(df["product_type"] > 0, "Investment", "OwnerOccupier")
+    return df.to_dict(orient="records")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> dict:
+    out = {}
+    with open(f"/proc/{pid}/status") as fh:
+        for line in fh:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key = "rss_mb" if line.startswith("VmRSS") else "peak_rss_mb"
+                out[key] = int(line.split()[1]) / 1024
+    return out
+
+
+class UvicornServer:
+    """The API in a uvicorn subprocess, serving the pickle at `model_path`."""
+
+    def __init__(self, model_path: str, workers: int = 1, **env_overrides):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = dict(
+            os.environ,
+            CI_MODE="0",
+            MODEL_SOURCE="local",
+            MODEL_PATH=model_path,
+            MODEL_POLL_INTERVAL="0",
+            PREDICTION_CACHE_SIZE="0",
+            **env_overrides,
+        )
+        self.proc = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "src.api:app",
+                "--port",
+                str(self.port),
+                "--workers",
+                str(workers),
+                "--log-level",
+                "warning",
+                "--no-access-log",
+            ],
+            env=env,
+        )
+
+    def wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                health = httpx.get(f"{self.url}/health", timeout=1.0).json()
+                if health.get("model_version"):
+                    return health
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise TimeoutError("API did not become healthy")
+
+    def rss(self) -> dict:
+        return _rss_mb(self.proc.pid)
+
+    def stop(self):
+        self.proc.terminate()
+        self.proc.wait(timeout=30)
+
+
+def succeeded(response: httpx.Response) -> bool:
+    """
+    A 200 carrying a prediction. The API answers internal failures with
+    200 {"error": ...}, which must not count as fast, error-free traffic.
+    """
+    if response.status_code != 200:
+        return False
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    return (
+        isinstance(body, dict)
+        and "error" not in body
+        and ("prediction" in body or "predictions" in body)
+    )
+
+
+def serve_inprocess(model_path: str):
+    """Serve the pickle at `model_path` from the in-process app (see _client)."""
+    import src.api as api
+    from src.model_manager import LocalModelSource
+
+    api.prediction_cache.max_entries = 0
+    # The registry routes through this manager, so keep it and swap the source
+    api.model_manager.source = LocalModelSource(model_path)
+    api.model_manager.pinned_version = None
+    api.model_manager.load_initial()
+
+
+def _client(url: str = None) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+    if url is not None:
+        return httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0)
+    from src.api import app
+
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+
+async def open_loop(client, path: str, bodies: list, rps: float, duration: float):
+    """Send one request every 1/rps seconds; latency counts from the schedule."""
+    latencies, errors = [], 0
+    loop = asyncio.get_running_loop()
+
+    async def fire(body, scheduled):
+        nonlocal errors
+        try:
+            response = await client.post(path, json=body)
+            if not succeeded(response):
+                errors += 1
+                return
+        except httpx.HTTPError:
+            errors += 1
+            return
+        latencies.append(loop.time() - scheduled)
+
+    n = max(1, int(rps * duration))
+    start = loop.time()
+    tasks = []
+    for i in range(n):
+        scheduled = start + i / rps
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(bodies[i % len(bodies)], scheduled)))
+    await asyncio.gather(*tasks)
+    return latencies, errors, loop.time() - start
+
+
+async def closed_loop(client, path: str, bodies: list, concurrency: int, duration):
+    """`concurrency` clients each sending their next request on completion."""
+    latencies, errors = [], 0
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def user(offset):
+        nonlocal errors
+        i = offset
+        while loop.time() - start < duration:
+            sent = loop.time()
+            try:
+                response = await client.post(path, json=bodies[i % len(bodies)])
+                ok = succeeded(response)
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(loop.time() - sent)
+            else:
+                errors += 1
+            i += concurrency
+
+    await asyncio.gather(*(user(k) for k in range(concurrency)))
+    return latencies, errors, loop.time() - start
+
+
+def summarize(latencies: list, errors: int, elapsed: float, rows_per_request=1):
+    ms = np.asarray(latencies) * 1000 if latencies else np.asarray([np.nan])
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "rows_per_sec": len(latencies) * rows_per_request / elapsed,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(np.max(ms)),
+    }
+
+
+async def run_patterns(args, url=None, rss=None) -> dict:
+    records = standin_records(1000)
+    singles = records
+    batches = [
+        {"records": records[i : i + args.batch_size]}
+        for i in range(0, len(records) - args.batch_size + 1, args.batch_size)
+    ] or [{"records": records[: args.batch_size]}]
+    results = {}
+    async with _client(url) as client:
+        # Warm-up: connections, the micro-batch worker and first-call costs
+        for body in singles[:20]:
+            await client.post("/predict", json=body)
+        await client.post("/predict/batch", json=batches[0])
+
+        for pattern in args.patterns:
+            if pattern == "single":
+                raw = await open_loop(
+                    client, "/predict", singles, args.rps, args.duration
+                )
+                stats = summarize(*raw)
+                stats["target_rps"] = args.rps
+            elif pattern == "batch":
+                raw = await open_loop(
+                    client, "/predict/batch", batches, args.batch_rps, args.duration
+                )
+                stats = summarize(*raw, rows_per_request=args.batch_size)
+                stats["target_rps"] = args.batch_rps
+                stats["batch_size"] = args.batch_size
+            else:
+                raw = await closed_loop(
+                    client, "/predict", singles, args.concurrency, args.duration
+                )
+                stats = summarize(*raw)
+                stats["concurrency"] = args.concurrency
+            if rss is not None:
+                stats["server_rss_mb"] = rss()["rss_mb"]
+            results[pattern] = stats
+            print(json.dumps({pattern: stats}), flush=True)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Metrics worse than the baseline by more than `threshold` (a fraction)."""
+    regressions = []
+    settings = ("n_estimators", "workers", "rps", "batch_rps", "batch_size")
+    for key in settings + ("concurrency", "cpus"):
+        ours, theirs = results["meta"].get(key), baseline.get("meta", {}).get(key)
+        if ours != theirs:
+            print(f"warning: {key} differs from the baseline ({theirs} -> {ours})")
+    for pattern, stats in results["patterns"].items():
+        base = baseline.get("patterns", {}).get(pattern)
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            if metric not in stats or metric not in base or not base[metric]:
+                continue
+            change = stats[metric] / base[metric] - 1
+            worse = -change if higher_is_better else change
+            status = "REGRESSION" if worse > threshold else "ok"
+            print(
+                f"{pattern:<11} {metric:<15} {base[metric]:>10.2f} -> "
+                f"{stats[metric]:>10.2f} ({change:+.1%}) {status}"
+            )
+            if worse > threshold:
+                regressions.append(
+                    {
+                        "pattern": pattern,
+                        "metric": metric,
+                        "baseline": base[metric],
+                        "value": stats[metric],
+                        "change": change,
+                    }
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--server", choices=["uvicorn", "inprocess"], default="uvicorn")
+    parser.add_argument("--url", help="load an already running API instead")
+    parser.add_argument(
+        "--patterns", nargs="+", choices=PATTERNS, default=list(PATTERNS)
+    )
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rps", type=float, default=40.0)
+    parser.add_argument("--batch-rps", type=float, default=5.0)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--output", default="load_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--save-baseline", help="also write the results here")
+    args = parser.parse_args()
+
+    meta = {
+        "server": "external" if args.url else args.server,
+        "n_estimators": args.n_estimators,
+        "workers": args.workers,
+        "duration": args.duration,
+        "rps": args.rps,
+        "batch_rps": args.batch_rps,
+        "batch_size": args.batch_size,
+        "concurrency": args.concurrency,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.time(),
+    }
+    if args.url:
+        patterns = asyncio.run(run_patterns(args, url=args.url))
+    else:
+        with tempfile.TemporaryDirectory(prefix="loadtest-") as tmp:
+            model_path = os.path.join(tmp, "model.pkl")
+            joblib.dump(train_standin_model(n_estimators=args.n_estimators), model_path)
+            if args.server == "uvicorn":
+                server = UvicornServer(model_path, args.workers)
+                try:
+                    server.wait_ready()
+                    patterns = asyncio.run(
+                        run_patterns(args, url=server.url, rss=server.rss)
+                    )
+                finally:
+                    server.stop()
+            else:
+                serve_inprocess(model_path)
+                patterns = asyncio.run(
+                    run_patterns(args, rss=lambda: _rss_mb(os.getpid()))
+                )
+
+    results = {"meta": meta, "patterns": patterns}
+    with open(args.output, "w") as fh:
+        json.dump(results, fh, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or ".", exist_ok=True)
+        with open(args.save_baseline, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.threshold)
+        if regressions:
+            print(
+                f"{len(regressions)} metric(s) regressed by more than "
+                f"{args.threshold:.0%}"
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/memory_report.py
+"""
+Per-worker RSS/PSS when N processes serve the same model.
+
+Each mode starts N worker processes that load the model the way
+`inference.load_model` would, score a batch so the trees are paged in,
+then read /proc/self/smaps_rollup while all workers are still alive.
+PSS splits shared pages between the processes mapping them, so with
+`mmap` the forest is counted once across workers instead of N times.
+
+Linux only. Run from the repo root:
+    python -m benchmarks.memory_report --workers 4 --n-estimators 200
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import tempfile
+
+import joblib
+
+from benchmarks.common import FEATURES, synthetic_frame, train_standin_model
+
+
+def _smaps_rollup() -> dict:
+    out = {}
+    with open("/proc/self/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Shared_Clean:", "Private_Dirty:"):
+                out[parts[0].rstrip(":").lower() + "_mb"] = int(parts[1]) / 1024
+    return out
+
+
+def _worker(mode, model_path, barrier, results):
+    from src.inference import load_shared_arrays
+    from src.tree_engine import compile_model
+
+    if mode == "sklearn":
+        model = joblib.load(model_path)
+    elif mode == "compiled":
+        model = compile_model(joblib.load(model_path))
+    else:
+        model = load_shared_arrays(model_path)
+    model.predict(synthetic_frame(2000, seed=os.getpid())[FEATURES].to_numpy())
+    barrier.wait()  # every worker is loaded before anyone measures
+    results.put(_smaps_rollup())
+    barrier.wait()  # keep mappings alive until everyone has measured
+
+
+def measure(mode: str, model_path: str, workers: int) -> list:
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(mode, model_path, barrier, results))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    reports = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--train-rows", type=int, default=50_000)
+    parser.add_argument("--modes", nargs="+", default=["sklearn", "compiled", "mmap"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, "model.pkl")
+        joblib.dump(train_standin_model(args.train_rows, args.n_estimators), model_path)
+        size_mb = os.path.getsize(model_path) / 1024**2
+        print(f"model: {args.n_estimators} trees, pickle {size_mb:.1f} MB")
+
+        summary = {}
+        for mode in args.modes:
+            reports = measure(mode, model_path, args.workers)
+            rss = sum(r["rss_mb"] for r in reports)
+            pss = sum(r["pss_mb"] for r in reports)
+            summary[mode] = {
+                "workers": reports,
+                "total_rss_mb": rss,
+                "total_pss_mb": pss,
+            }
+            per_worker = ", ".join(f"{r['pss_mb']:.0f}" for r in reports)
+            print(
+                f"{mode:>8}: per-worker PSS {per_worker} MB | "
+                f"total RSS {rss:.0f} MB, total PSS {pss:.0f} MB"
+            )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
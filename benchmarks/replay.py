@@ -0,0 +1,143 @@
+# benchmarks/replay.py
+"""
+Replay captured production traffic (src/prediction_log.py) against an API.
+
+Requests are sent open-loop on their recorded schedule, compressed by
+--speed (2 = twice as fast; 0 = as fast as --concurrency clients can go),
+and latency counts from the scheduled send time as in load_test.py. Each
+response is compared with the prediction logged at capture time; a replay
+against the same model version should report no changed predictions.
+
+Responses without a prediction (including 200 {"error": ...}) count as
+errors. Replay against a running API with --url, or serve a local model
+pickle in-process with --model.
+
+Run from the repo root:
+    python -m benchmarks.replay logs/predictions --url http://localhost:8000
+    python -m benchmarks.replay logs/predictions --url ... --speed 10 --output replay.json
+    python -m benchmarks.replay logs/predictions --model models/model.pkl
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.load_test import _client, serve_inprocess, succeeded, summarize
+from src import codec
+from src.prediction_log import read_records
+
+
+def _predictions(response_body: dict) -> list:
+    if "predictions" in response_body:
+        return response_body["predictions"]
+    return [response_body["prediction"]]
+
+
+async def replay(client, records: list, speed: float, concurrency: int, rtol: float):
+    """Send `records`; returns (summary stats, per-version changed counts)."""
+    latencies, errors, changed = [], 0, {}
+    loop = asyncio.get_running_loop()
+
+    async def fire(record, scheduled):
+        nonlocal errors
+        try:
+            response = await client.post(
+                record["endpoint"],
+                content=codec.dumps(record["input"]),
+                headers={"Content-Type": "application/json"},
+            )
+        except httpx.HTTPError:
+            errors += 1
+            return
+        if not succeeded(response):
+            errors += 1
+            return
+        latencies.append(loop.time() - scheduled)
+        version = response.headers.get("X-Model-Version")
+        ours = np.asarray(_predictions(response.json()), dtype=np.float64)
+        theirs = np.asarray(record["predictions"], dtype=np.float64)
+        if ours.shape != theirs.shape or not np.allclose(ours, theirs, rtol=rtol):
+            changed[version] = changed.get(version, 0) + 1
+
+    start = loop.time()
+    if speed > 0:
+        first = records[0]["ts"]
+        tasks = []
+        for record in records:
+            scheduled = start + (record["ts"] - first) / speed
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(fire(record, scheduled)))
+        await asyncio.gather(*tasks)
+    else:
+        queue = iter(records)
+
+        async def user():
+            for record in queue:
+                await fire(record, loop.time())
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    return summarize(latencies, errors, loop.time() - start), changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("paths", nargs="+", help="log files or directories")
+    parser.add_argument("--url", help="API to replay against")
+    parser.add_argument("--model", help="model pickle to serve in-process instead")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="1 = recorded pace, 0 = flat out"
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="for --speed 0")
+    parser.add_argument("--endpoint", help="only replay this endpoint")
+    parser.add_argument("--limit", type=int, help="replay at most this many requests")
+    parser.add_argument("--rtol", type=float, default=1e-6)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+    if (args.url is None) == (args.model is None):
+        parser.error("pass either --url or --model")
+
+    records = [
+        r
+        for r in read_records(args.paths)
+        if args.endpoint is None or r["endpoint"] == args.endpoint
+    ]
+    records.sort(key=lambda r: r["ts"])
+    records = records[: args.limit]
+    if not records:
+        parser.error("no logged requests found")
+
+    if args.model:
+        serve_inprocess(args.model)
+
+    async def run():
+        async with _client(args.url) as client:
+            return await replay(
+                client, records, args.speed, args.concurrency, args.rtol
+            )
+
+    started = time.time()
+    stats, changed = asyncio.run(run())
+    results = {
+        "meta": {
+            "records": len(records),
+            "speed": args.speed,
+            "recorded_seconds": records[-1]["ts"] - records[0]["ts"],
+            "started": started,
+        },
+        "replay": stats,
+        "changed_predictions": changed,
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
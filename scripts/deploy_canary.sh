@@ -0,0 +1,15 @@
+#!/usr/bin/env bash
+# Load a model version next to the primary and send it a share of traffic.
+# Usage: scripts/deploy_canary.sh <version> [weight] [api_url]
+set -euo pipefail
+
+VERSION="${1:?usage: $0 <version> [weight] [api_url]}"
+WEIGHT="${2:-0.1}"
+API_URL="${3:-http://localhost:8000}"
+: "${ADMIN_TOKEN:?ADMIN_TOKEN must be set}"
+
+curl -fsS -X POST -H "X-Admin-Token: $ADMIN_TOKEN" "$API_URL/admin/models/$VERSION"
+echo
+curl -fsS -X PUT -H "X-Admin-Token: $ADMIN_TOKEN" -H "Content-Type: application/json" \
+     -d "{\"weights\": {\"$VERSION\": $WEIGHT}}" "$API_URL/admin/routing"
+echo
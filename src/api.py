@@ -1,10 +1,26 @@
 # src/api.py
-from fastapi import FastAPI, Response
+import asyncio
+import hmac
+import os
+import time
+from collections import defaultdict
+from fastapi import FastAPI, Header, HTTPException, Request, Response
 from prometheus_fastapi_instrumentator import Instrumentator
-import pandas as pd
-from src.inference import load_model, predict  # use from src.inference
+import numpy as np
+from src import codec
+from src.drift_monitor import VersionedDriftMonitor
+from src.model_manager import ModelManager
+from src.model_registry import ModelRegistry, timed_predict
+from src.prediction_cache import PredictionCache, cache_key
+from src.prediction_log import PredictionLog
+from src.telemetry import (
+    SamplingProfiler,
+    record_rows,
+    stage,
+    track_request,
+)
 import logging
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, Histogram
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -16,47 +32,277 @@ app = FastAPI(title="Finance Assistant API", version="1.0")
 # Initialize Prometheus
 instrumentator = Instrumentator().instrument(app)
 
+# Micro-batching window for single-record /predict calls
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2"))
+# Start serving immediately and load the model in a background thread;
+# /ready answers 503 until the model is loaded and warmed up
+FAST_STARTUP = os.getenv("FAST_STARTUP", "0") == "1"
+# Whether /predict repeats the request body in its response (`?echo=` overrides)
+PREDICT_ECHO_INPUT = os.getenv("PREDICT_ECHO_INPUT", "1") == "1"
+# /admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Paths whose requests get per-stage timings, keyed to their endpoint label
+TRACKED_ENDPOINTS = {"/predict": "predict", "/predict/batch": "predict_batch"}
+
+MICROBATCH_SIZE = Histogram(
+    "predict_microbatch_size",
+    "Number of /predict requests scored together in one model.predict call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+MICROBATCH_QUEUE_WAIT = Histogram(
+    "predict_microbatch_queue_wait_seconds",
+    "Time a /predict request waited in the micro-batch queue before scoring",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5),
+)
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent single-row requests into one predict call.
+
+    Requests are queued on the event loop; a single worker task collects up to
+    `max_batch_size` rows or waits at most `max_wait_ms` after the first one,
+    runs the stacked batch in a worker thread and resolves each request's
+    future with its own prediction.
+    """
+
+    def __init__(self, predict_fn, max_batch_size: int, max_wait_ms: float):
+        # predict_fn(handle, X) -> predictions
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._loop = None
+        self._queue = None
+        self._task = None
+
+    def _ensure_started(self):
+        # The worker is bound to the loop serving requests; (re)start it lazily
+        # so it also works when no startup event ran (e.g. a bare TestClient).
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, row: np.ndarray, handle) -> float:
+        """Queue one feature row for `handle`'s model and await its prediction."""
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((row, handle, future, time.perf_counter()))
+        return await future
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except TimeoutError:
+                break
+        return batch
+
+    def _predict_rows(self, batch: list) -> list:
+        # Each request is scored by the model version it started on (or was
+        # routed to), so a batch straddling a hot reload or mixing canary and
+        # primary traffic is split per model. Models fitted without feature
+        # names may also see payloads of different widths.
+        groups = defaultdict(list)
+        for i, (row, handle, _, _) in enumerate(batch):
+            groups[(id(handle.model), row.shape[0])].append(i)
+        out = [None] * len(batch)
+        for idx in groups.values():
+            handle = batch[idx[0]][1]
+            preds = self.predict_fn(handle, np.vstack([batch[i][0] for i in idx]))
+            for i, p in zip(idx, preds):
+                out[i] = float(p)
+        return out
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            for *_, enqueued in batch:
+                MICROBATCH_QUEUE_WAIT.observe(started - enqueued)
+            MICROBATCH_SIZE.observe(len(batch))
+            try:
+                preds = await asyncio.to_thread(self._predict_rows, batch)
+            except Exception as e:  # noqa: BLE001 - re-raised in every request
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future, _), pred in zip(batch, preds):
+                if not future.done():
+                    future.set_result(pred)
+
+
+batcher = MicroBatcher(timed_predict, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS)
+model_manager = ModelManager()
+# Canary / shadow versions held next to the hot-reloaded primary
+registry = ModelRegistry(model_manager)
+prediction_cache = PredictionCache.from_env()
+# Served inputs/outputs for drift analysis and replay (off unless configured)
+prediction_log = PredictionLog.from_env()
+drift_monitor = VersionedDriftMonitor()
+profiler = SamplingProfiler()
+
+
+def current_model(request: Request = None):
+    """
+    The model handle a request should use for its whole lifetime: the
+    version named by its X-Model-Version header, or one drawn by the
+    registry's canary weights. 503 while no model is loaded yet.
+    """
+    requested = request.headers.get("X-Model-Version") if request else None
+    try:
+        handle, _ = registry.route(requested)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if request is not None:
+        request.state.model_version = handle.version
+    return handle
+
+
+def predict_cached(handle, X: np.ndarray) -> np.ndarray:
+    """Predict only the rows missing from the prediction cache."""
+    if not prediction_cache.enabled:
+        return timed_predict(handle, X)
+    with stage("cache"):
+        keys = [cache_key(handle.version, row) for row in X]
+        cached = prediction_cache.get_many(keys)
+    missing = [i for i, p in enumerate(cached) if p is None]
+    if not missing:
+        return np.asarray(cached, dtype=np.float64)
+    fresh = timed_predict(handle, X[missing])
+    prediction_cache.set_many({keys[i]: float(p) for i, p in zip(missing, fresh)})
+    for i, p in zip(missing, fresh):
+        cached[i] = p
+    return np.asarray(cached, dtype=np.float64)
+
+
+@app.middleware("http")
+async def model_version_header(request: Request, call_next):
+    endpoint = TRACKED_ENDPOINTS.get(request.url.path)
+    if endpoint is None:
+        response = await call_next(request)
+    else:
+        # The context variable set here follows the request into the handler
+        with track_request(endpoint):
+            response = await call_next(request)
+    # Prediction endpoints record the version they actually used
+    version = getattr(request.state, "model_version", None) or model_manager.version
+    if version is not None:
+        response.headers["X-Model-Version"] = version
+    return response
+
+
+def load_extra_models():
+    """Canary / shadow versions from the environment; failures are not fatal."""
+    try:
+        registry.load_configured()
+    except Exception:
+        logger.exception("Loading canary/shadow models failed")
+
+
+async def load_initial_model():
+    """Load and warm the first model off the event loop, then start watching."""
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(model_manager.load_initial)
+    except Exception:
+        # /ready keeps answering 503 so the instance never receives traffic
+        logger.exception("Initial model load failed")
+        return
+    await asyncio.to_thread(load_extra_models)
+    model_manager.start_watching()
+    logger.info(
+        "✅ Model %s ready after %.2fs",
+        model_manager.version,
+        time.perf_counter() - start,
+    )
+
 
 @app.on_event("startup")
 async def startup_event():
-    """Load model once and expose metrics"""
-    global model
-    model = load_model()  # load from S3 inside inference.py
+    """Load model once, start the hot-reload watcher and expose metrics"""
     instrumentator.expose(app)
-    logger.info("✅ Model loaded and metrics endpoint exposed")
+    if FAST_STARTUP:
+        app.state.model_loader = asyncio.create_task(load_initial_model())
+        logger.info("✅ Metrics endpoint exposed; loading model in the background")
+        return
+    model_manager.load_initial()  # load from S3 inside inference.py
+    load_extra_models()
+    model_manager.start_watching()
+    logger.info(
+        "✅ Model %s loaded and metrics endpoint exposed", model_manager.version
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await model_manager.stop()
+    await batcher.stop()
+    registry.shutdown()
+    prediction_log.close()
 
 
 @app.get("/health")
 def health():
     """Simple health check"""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "ready": model_manager.current is not None,
+        "model_version": model_manager.version,
+        "resident_models": registry.versions(),
+    }
 
 
-@app.post("/predict")
-async def predict_api(payload: dict):
-    try:
-        # Convert JSON → DataFrames
-        df = pd.DataFrame([payload])
+@app.get("/ready")
+def ready(response: Response):
+    """Readiness probe: 200 once a warmed-up model is being served."""
+    if model_manager.current is None:
+        response.status_code = 503
+        return {"status": "loading"}
+    return {"status": "ready", "model_version": model_manager.version}
 
-        # --- FIX categorical mapping ---
-        # Map product_type same way as training
-        if "product_type" in df.columns:
-            mapping = {"Investment": 1, "OwnerOccupier": 0}
-            df["product_type"] = df["product_type"].map(mapping)
 
-        # Drop any non-numeric leftovers
-        df = df.select_dtypes(include=["number"])
+def json_response(content) -> Response:
+    """Encode with the fast codec; numpy arrays need no .tolist()."""
+    with stage("serialize"):
+        return Response(codec.dumps(content), media_type="application/json")
 
-        # Predict
-        preds = model.predict(df)
-        return {"input": payload, "prediction": float(preds[0])}
 
-    except Exception as e:
-        logger.exception("Prediction failed")
-        return {"error": str(e)}
+def features(handle, payload) -> np.ndarray:
+    """Feature matrix for `payload` via the model's compiled schema."""
+    with stage("features"):
+        return handle.matrix(payload)
+
 
+@app.post("/predict")
+async def predict_api(request: Request, echo: bool = PREDICT_ECHO_INPUT):
     """
     Accepts raw JSON input (flat dict) → runs prediction.
+    Concurrent calls are micro-batched into a single model.predict.
+    `?echo=false` leaves the input out of the response.
     Example input:
     {
       "full_sq": 89,
@@ -66,17 +312,163 @@ async def predict_api(payload: dict):
     }
     """
     try:
-        # Convert single JSON input into a DataFrame
-        df = pd.DataFrame([payload])
-        preds = predict(model, df)
-        return {"prediction": float(preds[0])}
+        body = await request.body()
+        with stage("decode"):
+            payload = codec.loads(body)
+        if not isinstance(payload, dict):
+            raise TypeError("Payload must be a JSON object")
+        handle = current_model(request)
+        # Encode categoricals with the model's fitted preprocessor
+        X = features(handle, {"records": [payload]})
+        record_rows("predict", handle.version, len(X))
+        key = cache_key(handle.version, X[0]) if prediction_cache.enabled else None
+        # The shared (Redis) tier is queried in a worker thread, off the loop
+        with stage("cache"):
+            prediction = await prediction_cache.aget(key) if key is not None else None
+        if prediction is None:
+            with stage("batch_wait"):
+                prediction = await batcher.submit(X[0], handle)
+            if key is not None:
+                await prediction_cache.aset(key, prediction)
+        with stage("drift"):
+            drift_monitor.observe(
+                handle.version, handle.reference_profile, X, [prediction]
+            )
+        registry.shadow(handle, {"records": [payload]}, [prediction])
+        prediction_log.record("/predict", handle.version, body, prediction)
+        response = {"prediction": prediction, "model_version": handle.version}
+        if echo:
+            response = {"input": payload, **response}
+        return json_response(response)
 
+    except HTTPException:
+        raise
+    except (KeyError, ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.exception("Prediction failed")
         return {"error": str(e)}
 
 
+def score_batch(body: bytes, request: Request) -> Response:
+    with stage("decode"):
+        payload = codec.loads(body)
+    handle = current_model(request)
+    X = features(handle, payload)
+    record_rows("predict_batch", handle.version, len(X))
+    preds = predict_cached(handle, X)
+    with stage("drift"):
+        drift_monitor.observe(handle.version, handle.reference_profile, X, preds)
+    registry.shadow(handle, payload, preds)
+    prediction_log.record("/predict/batch", handle.version, body, preds)
+    return json_response(
+        {"predictions": preds, "count": len(preds), "model_version": handle.version}
+    )
+
+
+@app.post("/predict/batch")
+async def predict_batch_api(request: Request):
+    """
+    Score many rows with one vectorized preprocessing pass and one predict call.
+    The body is read on the event loop; decoding, scoring and encoding run in
+    a worker thread.
+    Accepts either an array of records or a columnar payload:
+    {"records": [{"full_sq": 89, "product_type": "Investment", ...}, ...]}
+    {"columns": {"full_sq": [89, 54], "product_type": ["Investment", "OwnerOccupier"]}}
+    """
+    body = await request.body()
+    try:
+        return await asyncio.to_thread(score_batch, body, request)
+    except HTTPException:
+        raise
+    except (KeyError, ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Batch prediction failed")
+        return {"error": str(e)}
+
+
 @app.get("/metrics")
 def metrics():
     """Expose Prometheus metrics endpoint."""
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def require_admin(token):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if token is None or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.post("/admin/profiler/start")
+def start_profiler(interval_ms: float = 5.0, x_admin_token: str = Header(default=None)):
+    """Start sampling the stacks of all threads every `interval_ms`."""
+    require_admin(x_admin_token)
+    profiler.start(interval_ms)
+    return profiler.status()
+
+
+@app.post("/admin/profiler/stop")
+def stop_profiler(x_admin_token: str = Header(default=None)):
+    """Stop the profiler and return its samples as collapsed stacks."""
+    require_admin(x_admin_token)
+    profiler.stop()
+    return Response(profiler.collapsed(), media_type="text/plain")
+
+
+@app.get("/admin/profiler")
+def profiler_status(x_admin_token: str = Header(default=None)):
+    require_admin(x_admin_token)
+    return profiler.status()
+
+
+@app.get("/admin/models")
+def models_status(x_admin_token: str = Header(default=None)):
+    """Resident versions, canary weights and the shadow configuration."""
+    require_admin(x_admin_token)
+    return registry.status()
+
+
+@app.post("/admin/models/{version}")
+def load_model_version(version: str, x_admin_token: str = Header(default=None)):
+    """Load `version` from the model source and keep it resident (no traffic yet)."""
+    require_admin(x_admin_token)
+    try:
+        registry.load(version)
+    except LookupError as e:
+        # No such version, or one the source cannot load exactly
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return registry.status()
+
+
+@app.delete("/admin/models/{version}")
+def unload_model_version(version: str, x_admin_token: str = Header(default=None)):
+    require_admin(x_admin_token)
+    try:
+        registry.unload(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model {version} is not resident")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return registry.status()
+
+
+@app.put("/admin/routing")
+def set_routing(payload: dict, x_admin_token: str = Header(default=None)):
+    """
+    Set canary weights and the shadow version, e.g.
+    {"weights": {"<version>": 0.1}, "shadow": "<version>", "shadow_sample": 0.2}
+    """
+    require_admin(x_admin_token)
+    try:
+        registry.set_routing(
+            payload.get("weights"), payload.get("shadow"), payload.get("shadow_sample")
+        )
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return registry.status()
@@ -0,0 +1,118 @@
+# src/codec.py
+"""
+Fast JSON decoding and encoding for the prediction endpoints.
+
+The endpoints read the raw request body instead of declaring `payload: dict`,
+so FastAPI's generic JSON parsing and pydantic validation are skipped. The
+body is parsed with orjson and written column by column into one
+preallocated (n_rows, n_features) float64 array by a `FeatureSchema`
+compiled once per model version from its feature names and fitted
+preprocessor. A columns payload is written straight from the parsed lists;
+a records payload is first gathered into one list per feature, because the
+categorical encoders work on whole columns. No DataFrame or np.column_stack
+is built either way.
+Responses are encoded with orjson, which serializes numpy arrays natively.
+Without orjson installed the stdlib json module is used.
+"""
+
+import json
+import time
+
+import numpy as np
+
+from src.inference import LEGACY_PREPROCESSOR
+from src.telemetry import observe_stage
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is several times slower
+    orjson = None
+
+
+def loads(body: bytes):
+    """Parse a JSON request body; malformed input raises ValueError."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    """Encode a response body; numpy arrays and scalars are allowed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default).encode()
+
+
+class FeatureSchema:
+    """
+    Feature order and encoders of one model. `matrix` accepts the same
+    payloads as inference.build_feature_matrix and returns the same values.
+    """
+
+    def __init__(self, names: list, preprocessor=None):
+        self.names = list(names)
+        self.preprocessor = preprocessor or LEGACY_PREPROCESSOR
+        self.categorical = [self.preprocessor.handles(n) for n in self.names]
+
+    def _fill(self, X: np.ndarray, columns):
+        """Write (j, raw values) pairs into X, timing encode and convert."""
+        elapsed = {True: 0.0, False: 0.0}
+        for j, values in columns:
+            name, categorical = self.names[j], self.categorical[j]
+            start = time.perf_counter()
+            try:
+                if categorical:
+                    X[:, j] = self.preprocessor.transform_column(name, values)
+                else:
+                    X[:, j] = values
+            except (TypeError, ValueError):
+                raise ValueError(f"Feature '{name}' has non-numeric values")
+            elapsed[categorical] += time.perf_counter() - start
+        observe_stage("encode", elapsed[True])
+        observe_stage("convert", elapsed[False])
+
+    def matrix(self, payload) -> np.ndarray:
+        """(n_rows, n_features) float64 from a records or columns payload."""
+        if not isinstance(payload, dict):
+            raise TypeError("Payload must be a JSON object")
+        if "records" in payload:
+            records = payload["records"]
+            if (
+                not isinstance(records, list)
+                or not records
+                or not all(isinstance(rec, dict) for rec in records)
+            ):
+                raise ValueError("'records' must be a non-empty list of objects")
+            columns = [[rec.get(name) for rec in records] for name in self.names]
+            missing = [
+                n for n, v in zip(self.names, columns) if all(x is None for x in v)
+            ]
+            if missing:
+                raise KeyError(f"Missing features: {missing}")
+            X = np.empty((len(records), len(self.names)), dtype=np.float64)
+            self._fill(X, enumerate(columns))
+            return X
+        if "columns" in payload:
+            columns = payload["columns"]
+            if not isinstance(columns, dict) or not columns:
+                raise ValueError("'columns' must be a non-empty object of lists")
+            missing = [n for n in self.names if n not in columns]
+            if missing:
+                raise KeyError(f"Missing features: {missing}")
+            if not all(isinstance(columns[n], (list, np.ndarray)) for n in self.names):
+                raise ValueError("'columns' must be a non-empty object of lists")
+            lengths = {len(columns[n]) for n in self.names}
+            if len(lengths) != 1:
+                raise ValueError("All columns must have the same length")
+            X = np.empty((lengths.pop(), len(self.names)), dtype=np.float64)
+            self._fill(X, ((j, columns[n]) for j, n in enumerate(self.names)))
+            return X
+        raise ValueError("Payload must contain 'records' or 'columns'")
@@ -5,14 +5,15 @@ Designed to mirror the preprocessing in ExtraTrees_Regressor.ipynb.
 """
 
 import os
+import json
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-from typing import Tuple, List
-import io
-import boto3
+from typing import ClassVar
 import logging
 from dotenv import load_dotenv
 
+from src.s3_transfer import open_object
+
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
 
 
@@ -40,13 +41,26 @@ LABEL_COLUMNS = ["product_type", "ecology"]
 
 S3_BUCKET = os.getenv("S3_BUCKET")
 S3_TRAIN_KEY = os.getenv("S3_TRAIN_KEY")
+# Training data location; s3:// paths resolve to S3_BUCKET/S3_TRAIN_KEY
+TRAIN_CSV_SOURCE = "s3://mlops-financeai-s3-bucket /datasets/train.csv"
+# The fitted FeaturePreprocessor is stored as <model or feature file> + this
+PREPROCESSOR_SUFFIX = ".preprocessor.json"
+# Rows per chunk for streaming ingestion; 0 reads the whole CSV at once
+INGEST_CHUNKSIZE = int(os.getenv("INGEST_CHUNKSIZE", "0"))
+# Stream only the kept columns with float32 features and categorical text,
+# and train from one float32 matrix split by index (see split_float32)
+LEAN_TRAINING = os.getenv("LEAN_TRAINING", "0") == "1"
+# Chunk size used when LEAN_TRAINING is on and INGEST_CHUNKSIZE is 0; one
+# read_csv call over the whole file peaks at several times its result
+LEAN_CHUNKSIZE = 1_000_000
+# Tree models compare features as float32, so they see the same values
+FEATURE_DTYPE = np.float32
 
 
 def load_csv_from_s3(bucket: str, key: str) -> pd.DataFrame:
-    """Load CSV from S3 into a pandas DataFrame."""
-    s3 = boto3.client("s3")
-    response = s3.get_object(Bucket=bucket, Key=key)
-    return pd.read_csv(io.BytesIO(response["Body"].read()))
+    """Load CSV from S3 into a pandas DataFrame, parsing while it downloads."""
+    with open_object(bucket, key) as stream:
+        return pd.read_csv(stream)
 
 
 def load_csv(path: str) -> pd.DataFrame:
@@ -55,11 +69,9 @@ def load_csv(path: str) -> pd.DataFrame:
     """
     if path.startswith("s3://"):
         try:
-            s3 = boto3.client("s3")
             bucket, key = path.replace("s3://", "").split("/", 1)
             logger.info(f"Loading CSV from S3: bucket={S3_BUCKET}, key={S3_TRAIN_KEY}")
-            response = s3.get_object(Bucket=S3_BUCKET, Key=S3_TRAIN_KEY)
-            df = pd.read_csv(response["Body"])
+            df = load_csv_from_s3(S3_BUCKET, S3_TRAIN_KEY)
             logger.info(f"Loaded dataset with shape {df.shape}")
             return df
         except Exception as e:
@@ -71,6 +83,61 @@ def load_csv(path: str) -> pd.DataFrame:
         return df
 
 
+def _open_csv_stream(path: str):
+    """Binary stream over the CSV, resolved the same way as load_csv."""
+    if path.startswith("s3://"):
+        logger.info(f"Streaming CSV from S3: bucket={S3_BUCKET}, key={S3_TRAIN_KEY}")
+        return open_object(S3_BUCKET, S3_TRAIN_KEY)
+    logger.info(f"Streaming CSV from local path: {path}")
+    return open(path, "rb")
+
+
+def kept_columns(header: list[str], target_col: str = "price_doc") -> list[str]:
+    """Columns drop_na keeps: the first four plus the target."""
+    return header[:4] + ([target_col] if target_col not in header[:4] else [])
+
+
+def read_csv_schema(
+    path: str,
+    target_col: str = "price_doc",
+    sample_rows: int = 1000,
+    lean: bool = False,
+) -> tuple[list[str], dict]:
+    """
+    Read only the header and a small sample to decide which columns to parse and
+    with which dtypes. Numeric columns are parsed as float64 so a NaN appearing
+    after the sample cannot break an integer dtype. With `lean`, numeric
+    features are parsed as FEATURE_DTYPE (the target stays float64) and text
+    columns as categoricals instead of one Python string per row.
+    """
+    with _open_csv_stream(path) as stream:
+        header = pd.read_csv(stream, nrows=0).columns.tolist()
+    if target_col not in header:
+        raise KeyError(f"Target column '{target_col}' not found in CSV header")
+    usecols = kept_columns(header, target_col)
+    with _open_csv_stream(path) as stream:
+        sample = pd.read_csv(stream, usecols=usecols, nrows=sample_rows)
+    numeric = np.dtype(FEATURE_DTYPE).name if lean else "float64"
+    dtypes = {
+        col: (
+            ("float64" if col == target_col else numeric)
+            if pd.api.types.is_numeric_dtype(sample[col])
+            else ("category" if lean else "object")
+        )
+        for col in usecols
+    }
+    return usecols, dtypes
+
+
+def iter_csv_chunks(path: str, usecols: list[str], dtypes: dict, chunksize: int):
+    """Yield DataFrame chunks holding only `usecols`, parsed with `dtypes`."""
+    with _open_csv_stream(path) as stream:
+        reader = pd.read_csv(stream, usecols=usecols, dtype=dtypes, chunksize=chunksize)
+        for chunk in reader:
+            # Keep file column order so drop_na's "first four" stays the same
+            yield chunk[usecols]
+
+
 def drop_na(df: pd.DataFrame) -> pd.DataFrame:
     """Drop rows with NA values (same as notebook)."""
     target_col = "price_doc"  # Replace with actual target column name
@@ -89,9 +156,11 @@ def basic_clean(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def encode_labels(
-    df: pd.DataFrame, label_cols: List[str] = LABEL_COLUMNS
+    df: pd.DataFrame, label_cols: list[str] = LABEL_COLUMNS
 ) -> pd.DataFrame:
     """Label-encode known categorical columns if present."""
+    from sklearn.preprocessing import LabelEncoder
+
     for col in label_cols:
         if col in df.columns:
             le = LabelEncoder()
@@ -100,7 +169,7 @@ def encode_labels(
 
 
 def map_booleans(
-    df: pd.DataFrame, bool_cols: List[str] = BOOLEAN_COLUMNS
+    df: pd.DataFrame, bool_cols: list[str] = BOOLEAN_COLUMNS
 ) -> pd.DataFrame:
     """Map yes/no columns to 1/0 where present."""
     for col in bool_cols:
@@ -109,9 +178,156 @@ def map_booleans(
     return df
 
 
+def _as_str(values: pd.Series) -> pd.Series:
+    """values.astype(str); categoricals only convert their categories."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        if values.isna().any():
+            if "nan" not in values.cat.categories:
+                values = values.cat.add_categories("nan")
+            values = values.fillna("nan")
+        return values.cat.rename_categories(values.cat.categories.astype(str))
+    return values.astype(str)
+
+
+def _as_number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _keep_numbers(values: np.ndarray, codes: np.ndarray, encoded: np.ndarray):
+    """`encoded`, with the unmapped entries of `values` that are numbers kept."""
+    unknown = np.flatnonzero(codes == -1)
+    if not len(unknown):
+        return encoded
+    try:
+        numbers = values[unknown].astype(np.float64)
+    except (TypeError, ValueError):
+        numbers = np.array([_as_number(v) for v in values[unknown]])
+    keep = ~np.isnan(numbers)
+    encoded[unknown[keep]] = numbers[keep]
+    return encoded
+
+
+class FeaturePreprocessor:
+    """
+    Fitted categorical/boolean encoding shared by training and serving.
+
+    Label columns get the codes LabelEncoder would give (sorted categories);
+    yes/no columns map to 1/0 with anything else as 0, like map_booleans,
+    except numbers: API clients have always been able to send these flags
+    as 0/1, and numeric values pass through unchanged.
+    Each column is encoded with one Index.get_indexer call into a precomputed
+    lookup array whose trailing slot holds the value for unknown inputs.
+    Saved as JSON next to the model so the API applies exactly these codes.
+    """
+
+    BOOLEAN_MAPPING: ClassVar[dict] = {"no": 0, "yes": 1}
+
+    def __init__(
+        self, mappings: dict | None = None, bool_cols: list[str] = BOOLEAN_COLUMNS
+    ):
+        self.mappings = {}
+        self.bool_cols = list(bool_cols)
+        self._tables = {}
+        for col in self.bool_cols:
+            self._add_table(col, self.BOOLEAN_MAPPING, unknown=0.0, numeric=True)
+        for col, mapping in (mappings or {}).items():
+            self._set_mapping(col, mapping)
+
+    def _add_table(self, col: str, mapping: dict, unknown: float, numeric=False):
+        index = pd.Index(list(mapping), dtype=object)
+        lookup = np.append(np.array(list(mapping.values()), dtype=float), unknown)
+        # numeric: values not in the mapping that are numbers are kept as is
+        self._tables[col] = (index, lookup, numeric)
+
+    def _set_mapping(self, col: str, mapping: dict):
+        self.mappings[col] = dict(mapping)
+        # Unknown categories become NaN, which the tree models route as missing
+        self._add_table(col, mapping, unknown=np.nan)
+
+    def fit(
+        self, df: pd.DataFrame, label_cols: list[str] = LABEL_COLUMNS
+    ) -> "FeaturePreprocessor":
+        """
+        Learn label codes for the label columns present in `df`. Columns that
+        already have codes (e.g. a deployed model's encoder being extended
+        with new data) keep them, and unseen categories get the next codes.
+        """
+        for col in label_cols:
+            if col in df.columns:
+                values = _as_str(df[col])
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    # The used categories, found from the small integer codes
+                    codes = np.unique(values.cat.codes.to_numpy())
+                    values = values.cat.categories[codes[codes >= 0]]
+                categories = np.unique(values.to_numpy())
+                mapping = dict(self.mappings.get(col, {}))
+                for category in categories:
+                    if category not in mapping:
+                        mapping[category] = max(mapping.values(), default=-1) + 1
+                self._set_mapping(col, mapping)
+        return self
+
+    def handles(self, col: str) -> bool:
+        return col in self._tables
+
+    def transform_column(self, col: str, values) -> np.ndarray:
+        """Encode one column of raw values to float64."""
+        index, lookup, numeric = self._tables[col]
+        if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+            # Encode each category once, then gather by code (-1, missing,
+            # picks the trailing entry)
+            categories = np.append(
+                np.asarray(values.cat.categories, dtype=object), np.nan
+            )
+            codes = index.get_indexer(categories)
+            encoded = lookup[codes]
+            if numeric:
+                encoded[:-1] = _keep_numbers(categories[:-1], codes[:-1], encoded[:-1])
+            return encoded[values.cat.codes.to_numpy()]
+        values = np.asarray(values, dtype=object)
+        codes = index.get_indexer(values)
+        encoded = lookup[codes]
+        return _keep_numbers(values, codes, encoded) if numeric else encoded
+
+    def map_booleans(self, df: pd.DataFrame) -> pd.DataFrame:
+        for col in self.bool_cols:
+            if col in df.columns:
+                df[col] = self.transform_column(col, df[col]).astype(int)
+        return df
+
+    def encode_labels(self, df: pd.DataFrame) -> pd.DataFrame:
+        for col in self.mappings:
+            if col in df.columns:
+                codes = self.transform_column(col, _as_str(df[col]))
+                df[col] = codes if np.isnan(codes).any() else codes.astype(np.int64)
+        return df
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.map_booleans(self.encode_labels(df))
+
+    def to_dict(self) -> dict:
+        return {"mappings": self.mappings, "bool_cols": self.bool_cols}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FeaturePreprocessor":
+        return cls(mappings=data["mappings"], bool_cols=data["bool_cols"])
+
+    def save(self, path: str):
+        with open(path, "w") as fh:
+            json.dump(self.to_dict(), fh)
+
+    @classmethod
+    def load(cls, path: str) -> "FeaturePreprocessor":
+        with open(path) as fh:
+            return cls.from_dict(json.load(fh))
+
+
 def prepare_features_target(
     df: pd.DataFrame, target_col: str = "price_doc"
-) -> Tuple[pd.DataFrame, pd.Series]:
+) -> tuple[pd.DataFrame, pd.Series]:
     """
     Split into features X and target y.
     Uses the notebook's convention: target column 'price_doc'.
@@ -125,19 +341,150 @@ def prepare_features_target(
     return X, y
 
 
-def full_pipeline_from_csv(
-    path: str, target_col: str = "price_doc"
-) -> Tuple[pd.DataFrame, pd.Series]:
-    """Complete ingestion -> cleaned (X, y) from CSV path."""
-    df = load_csv("s3://mlops-financeai-s3-bucket /datasets/train.csv")
+def downcast_features(X: pd.DataFrame) -> pd.DataFrame:
+    """Numeric feature columns (codes and flags included) as FEATURE_DTYPE."""
+    dtypes = {
+        col: FEATURE_DTYPE
+        for col in X.columns
+        if pd.api.types.is_numeric_dtype(X[col]) and X[col].dtype != FEATURE_DTYPE
+    }
+    return X.astype(dtypes, copy=False) if dtypes else X
+
+
+def split_float32(
+    X: pd.DataFrame, y: pd.Series, test_size: float, random_state: int
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
+    """
+    The rows train_test_split(X, y, ...) would pick, without copying the
+    frames: one C-contiguous float32 matrix is filled with the training rows
+    followed by the validation rows, and both splits are DataFrame views of
+    it, which sklearn fits on without converting X again.
+    """
+    from sklearn.model_selection import train_test_split
+
+    train_idx, val_idx = train_test_split(
+        np.arange(len(X)), test_size=test_size, random_state=random_state
+    )
+    order = np.concatenate([train_idx, val_idx])
+    matrix = np.empty((len(X), X.shape[1]), dtype=FEATURE_DTYPE)
+    for j, col in enumerate(X.columns):
+        matrix[:, j] = X[col].to_numpy()[order]
+    target = y.to_numpy(dtype=np.float64)[order]
+    index = X.index[order]
+    n = len(train_idx)
+
+    def frame(rows):
+        return pd.DataFrame(
+            matrix[rows], index=index[rows], columns=X.columns, copy=False
+        )
+
+    def series(rows):
+        return pd.Series(target[rows], index=index[rows], name=y.name, copy=False)
+
+    train, val = slice(0, n), slice(n, None)
+    return frame(train), frame(val), series(train), series(val)
+
+
+def _concat_column(pieces: list):
+    """One column from its per-chunk pieces; categoricals share categories."""
+    if isinstance(pieces[0].dtype, pd.CategoricalDtype):
+        return pd.api.types.union_categoricals(pieces)
+    return np.concatenate(pieces)
+
+
+def streaming_pipeline_from_csv(
+    path: str,
+    target_col: str = "price_doc",
+    chunksize: int = 100_000,
+    preprocessor: FeaturePreprocessor = None,
+    lean: bool = LEAN_TRAINING,
+) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    Chunked ingestion -> cleaned (X, y). Column selection is pushed into the
+    parser, and each chunk goes through drop_na -> basic_clean ->
+    map_booleans before its columns are kept. Label encoding runs once on
+    the assembled (already narrow) frame so codes are consistent across
+    chunks. Pass `preprocessor` to get the fitted encoder. With `lean`,
+    features are parsed and returned as FEATURE_DTYPE.
+
+    Peak memory is about the cleaned output plus one raw chunk and a few
+    temporaries the size of one column (while a column is assembled or
+    label-encoded): chunks are kept as per-column arrays, and each output
+    column is assembled from its pieces, which are freed before the next.
+    """
+    preprocessor = preprocessor if preprocessor is not None else FeaturePreprocessor()
+    usecols, dtypes = read_csv_schema(path, target_col, lean=lean)
+    pieces = {}
+    for chunk in iter_csv_chunks(path, usecols, dtypes, chunksize):
+        chunk = drop_na(chunk)
+        chunk = basic_clean(chunk)
+        chunk = preprocessor.map_booleans(chunk)
+        for col in chunk.columns:
+            values = chunk[col]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                # A copy, so the chunk's 2-D block is not kept alive by a view
+                values = values.to_numpy(copy=True)
+            pieces.setdefault(col, []).append(values)
+        del chunk
+    if not pieces:
+        df = drop_na(pd.DataFrame(columns=usecols))
+        df = preprocessor.fit(df).encode_labels(df)
+        X, y = prepare_features_target(df, target_col=target_col)
+        return (downcast_features(X) if lean else X), y
+
+    y = pd.Series(_concat_column(pieces.pop(target_col)), name=target_col)
+    # Columns are added one by one rather than passed to the DataFrame
+    # constructor, which would copy them all into one consolidated block
+    X = pd.DataFrame(index=pd.RangeIndex(len(y)))
+    for col in list(pieces):
+        X[col] = _concat_column(pieces.pop(col))
+    X = preprocessor.fit(X).encode_labels(X)
+    logger.info(f"Streamed dataset with shape {(len(X), X.shape[1] + 1)}")
+    return (downcast_features(X) if lean else X), y
+
+
+def pipeline_from_csv(
+    path: str,
+    target_col: str = "price_doc",
+    chunksize: int = INGEST_CHUNKSIZE,
+    preprocessor: FeaturePreprocessor = None,
+    lean: bool = LEAN_TRAINING,
+) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    Ingestion -> cleaned (X, y) from a local or s3:// CSV path. When an
+    unfitted `preprocessor` is passed it is fitted in place, ready to be
+    saved next to the model. With `lean`, the CSV is always streamed
+    (LEAN_CHUNKSIZE rows at a time unless `chunksize` is set) and the
+    features come back as FEATURE_DTYPE.
+    """
+    if lean:
+        chunksize = chunksize or LEAN_CHUNKSIZE
+    if chunksize:
+        return streaming_pipeline_from_csv(
+            path, target_col, chunksize, preprocessor, lean
+        )
+    preprocessor = preprocessor if preprocessor is not None else FeaturePreprocessor()
+    df = load_csv(path)
     df = drop_na(df)
     df = basic_clean(df)
-    df = encode_labels(df)
-    df = map_booleans(df)
+    df = preprocessor.fit(df).transform(df)
     X, y = prepare_features_target(df, target_col=target_col)
     return X, y
 
 
+def full_pipeline_from_csv(
+    path: str,
+    target_col: str = "price_doc",
+    chunksize: int = INGEST_CHUNKSIZE,
+    preprocessor: FeaturePreprocessor = None,
+    lean: bool = LEAN_TRAINING,
+) -> tuple[pd.DataFrame, pd.Series]:
+    """Complete ingestion -> cleaned (X, y) from the training CSV."""
+    return pipeline_from_csv(
+        TRAIN_CSV_SOURCE, target_col, chunksize, preprocessor, lean
+    )
+
+
 if __name__ == "__main__":
     # Quick local test (not executed in production)
     import os
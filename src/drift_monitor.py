@@ -0,0 +1,274 @@
+# src/drift_monitor.py
+"""
+Online drift monitoring of live /predict traffic.
+
+At training time `build_reference_profile` bins every feature (and the
+validation predictions) at reference quantiles and stores the bin edges and
+proportions as JSON next to the model. At serving time `DriftMonitor` keeps
+one fixed-size count vector per feature over the same bins, so each request
+costs a binary search per feature and memory does not grow with traffic.
+Counts cover the current and the previous window of DRIFT_WINDOW_ROWS rows,
+which keeps the scores responsive to recent traffic. Every
+DRIFT_UPDATE_EVERY rows PSI and a binned KS statistic against the reference
+are published as Prometheus gauges.
+
+`VersionedDriftMonitor` keeps one such monitor per model version, so
+interleaved primary and canary requests each build up their own windows
+(labelled `model_version` in the gauges) instead of resetting a shared one.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from prometheus_client import Gauge
+
+from src.inference import S3_BUCKET, S3_MODEL_KEY, load_sidecar
+
+logger = logging.getLogger(__name__)
+
+# Saved next to the model as <S3_MODEL_KEY> + this
+DRIFT_PROFILE_SUFFIX = ".drift_profile.json"
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "10"))
+DRIFT_WINDOW_ROWS = int(os.getenv("DRIFT_WINDOW_ROWS", "10000"))
+DRIFT_UPDATE_EVERY = int(os.getenv("DRIFT_UPDATE_EVERY", "100"))
+# Versions with drift windows; the least recently served one is dropped
+DRIFT_MAX_VERSIONS = int(os.getenv("DRIFT_MAX_VERSIONS", "4"))
+PREDICTION = "prediction"
+
+DRIFT_PSI = Gauge(
+    "feature_drift_psi",
+    "Population stability index vs. training",
+    ["model_version", "feature"],
+)
+DRIFT_KS = Gauge(
+    "feature_drift_ks",
+    "Binned Kolmogorov-Smirnov statistic vs. training",
+    ["model_version", "feature"],
+)
+DRIFT_ROWS = Gauge(
+    "feature_drift_window_rows",
+    "Rows behind the current drift scores",
+    ["model_version"],
+)
+
+_EPS = 1e-4
+
+
+class ReferenceProfile:
+    """Per-column inner bin edges and reference proportions (last slot: NaN)."""
+
+    def __init__(self, columns: list, edges: list, proportions: list):
+        self.columns = list(columns)
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        self.proportions = [np.asarray(p, dtype=np.float64) for p in proportions]
+
+    @property
+    def features(self) -> list:
+        return [c for c in self.columns if c != PREDICTION]
+
+    def to_dict(self) -> dict:
+        return {
+            "columns": self.columns,
+            "edges": [e.tolist() for e in self.edges],
+            "proportions": [p.tolist() for p in self.proportions],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ReferenceProfile":
+        return cls(data["columns"], data["edges"], data["proportions"])
+
+    def save(self, path: str):
+        with open(path, "w") as fh:
+            json.dump(self.to_dict(), fh)
+
+    @classmethod
+    def load(cls, path: str) -> "ReferenceProfile":
+        with open(path) as fh:
+            return cls.from_dict(json.load(fh))
+
+
+def bin_counts(edges: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Counts of `values` in the len(edges)+1 bins plus a trailing NaN slot."""
+    values = np.asarray(values, dtype=np.float64)
+    idx = np.searchsorted(edges, values, side="right")
+    idx[np.isnan(values)] = len(edges) + 1
+    return np.bincount(idx, minlength=len(edges) + 2)
+
+
+def build_reference_profile(X, predictions, n_bins: int = DRIFT_BINS):
+    """Quantile-binned profile of the training features and predictions."""
+    columns = list(X.columns) + [PREDICTION]
+    data = [X[c].to_numpy(dtype=np.float64) for c in X.columns]
+    data.append(np.asarray(predictions, dtype=np.float64))
+    edges, proportions = [], []
+    for values in data:
+        finite = values[~np.isnan(values)]
+        quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+        inner = np.unique(np.quantile(finite, quantiles)) if len(finite) else []
+        counts = bin_counts(np.asarray(inner), values)
+        edges.append(inner)
+        proportions.append(counts / max(1, counts.sum()))
+    return ReferenceProfile(columns, edges, proportions)
+
+
+def load_reference_profile(bucket=S3_BUCKET, key=S3_MODEL_KEY, model_object=None):
+    """
+    The profile saved with the model (the one uploaded with `model_object`,
+    if given). None turns drift monitoring off for the model, which beats
+    comparing its traffic with another model's training data.
+    """
+    try:
+        data = load_sidecar(bucket, key, DRIFT_PROFILE_SUFFIX, model_object)
+    except LookupError as e:
+        logger.warning("Drift monitoring off: %s", e)
+        return None
+    return None if data is None else ReferenceProfile.from_dict(data)
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    e = np.clip(expected, _EPS, None)
+    a = np.clip(actual, _EPS, None)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def binned_ks(expected: np.ndarray, actual: np.ndarray) -> float:
+    # NaN slot excluded: KS compares the distributions of observed values
+    e, a = expected[:-1], actual[:-1]
+    e = np.cumsum(e) / max(e.sum(), _EPS)
+    a = np.cumsum(a) / max(a.sum(), _EPS)
+    return float(np.max(np.abs(e - a)))
+
+
+class DriftMonitor:
+    def __init__(
+        self,
+        window_rows: int = DRIFT_WINDOW_ROWS,
+        update_every: int = DRIFT_UPDATE_EVERY,
+        version: str = "",
+    ):
+        self.window_rows = window_rows
+        self.update_every = update_every
+        # Gauge label; one monitor per served version (VersionedDriftMonitor)
+        self.version = version
+        self.profile = None
+        self._lock = threading.Lock()
+
+    def _reset(self, profile: ReferenceProfile):
+        self.profile = profile
+        self._current = [np.zeros(len(e) + 2, dtype=np.int64) for e in profile.edges]
+        self._previous = [np.zeros_like(c) for c in self._current]
+        self._current_rows = 0
+        self._since_update = 0
+
+    def observe(self, profile, X: np.ndarray, predictions) -> None:
+        """
+        Add a batch of feature rows (columns in profile.features order) and
+        their predictions. A new profile, i.e. a new model, restarts the window.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if profile is None or X.shape[1] != len(profile.features):
+            return
+        columns = list(X.T) + [np.asarray(predictions, dtype=np.float64)]
+        with self._lock:
+            if profile is not self.profile:
+                self._reset(profile)
+            for counts, edges, values in zip(self._current, profile.edges, columns):
+                counts += bin_counts(edges, values)
+            self._current_rows += len(X)
+            self._since_update += len(X)
+            if self._current_rows >= self.window_rows:
+                self._previous, self._current = self._current, self._previous
+                for counts in self._current:
+                    counts[:] = 0
+                self._current_rows = 0
+            if self._since_update >= self.update_every:
+                self._since_update = 0
+                self._publish()
+
+    def scores(self) -> dict:
+        """{column: {"psi", "ks"}} over the current and previous windows."""
+        with self._lock:
+            return self._scores()
+
+    def _scores(self) -> dict:
+        out = {}
+        if self.profile is None:
+            return out
+        for column, expected, current, previous in zip(
+            self.profile.columns,
+            self.profile.proportions,
+            self._current,
+            self._previous,
+        ):
+            counts = current + previous
+            actual = counts / max(1, counts.sum())
+            out[column] = {
+                "psi": psi(expected, actual),
+                "ks": binned_ks(expected, actual),
+            }
+        return out
+
+    def _publish(self):
+        for column, score in self._scores().items():
+            DRIFT_PSI.labels(self.version, column).set(score["psi"])
+            DRIFT_KS.labels(self.version, column).set(score["ks"])
+        rows = int(self._current[0].sum() + self._previous[0].sum())
+        DRIFT_ROWS.labels(self.version).set(rows)
+
+    def clear_gauges(self):
+        """Remove this version's series from the drift gauges."""
+        with self._lock:
+            columns = self.profile.columns if self.profile is not None else []
+            for gauge in (DRIFT_PSI, DRIFT_KS):
+                for column in columns:
+                    try:
+                        gauge.remove(self.version, column)
+                    except KeyError:
+                        pass
+            try:
+                DRIFT_ROWS.remove(self.version)
+            except KeyError:
+                pass
+
+
+class VersionedDriftMonitor:
+    """A DriftMonitor per model version, at most `max_versions` of them."""
+
+    def __init__(
+        self,
+        max_versions: int = DRIFT_MAX_VERSIONS,
+        window_rows: int = DRIFT_WINDOW_ROWS,
+        update_every: int = DRIFT_UPDATE_EVERY,
+    ):
+        self.max_versions = max(1, max_versions)
+        self.window_rows = window_rows
+        self.update_every = update_every
+        self._monitors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def monitor(self, version: str) -> DriftMonitor:
+        with self._lock:
+            monitor = self._monitors.get(version)
+            if monitor is not None:
+                self._monitors.move_to_end(version)
+                return monitor
+            monitor = DriftMonitor(self.window_rows, self.update_every, version)
+            self._monitors[version] = monitor
+            while len(self._monitors) > self.max_versions:
+                _, evicted = self._monitors.popitem(last=False)
+                evicted.clear_gauges()
+        return monitor
+
+    def observe(self, version: str, profile, X: np.ndarray, predictions) -> None:
+        """DriftMonitor.observe on the windows of `version`."""
+        if profile is None:
+            return
+        self.monitor(version).observe(profile, X, predictions)
+
+    def scores(self, version: str) -> dict:
+        monitor = self._monitors.get(version)
+        return monitor.scores() if monitor is not None else {}
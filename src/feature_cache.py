@@ -0,0 +1,154 @@
+# src/feature_cache.py
+"""
+Cache of the cleaned (X, y) produced by data_ingestion.
+
+The cleaned frame is written as an uncompressed Arrow IPC (Feather v2) file
+keyed by the source object's version and a hash of the preprocessing config
+(BOOLEAN_COLUMNS, LABEL_COLUMNS, target), with the fitted FeaturePreprocessor
+saved beside it. Later runs memory-map that file
+and hand its buffers to pandas without parsing or copying, instead of
+re-downloading and re-cleaning the CSV. Uncompressed IPC is used rather than
+Parquet because Parquet pages always have to be decoded into new memory.
+
+Also runnable as the `features` DVC stage:
+    python -m src.feature_cache
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src import s3_transfer
+from src.data_ingestion import (
+    BOOLEAN_COLUMNS,
+    FEATURE_DTYPE,
+    INGEST_CHUNKSIZE,
+    LABEL_COLUMNS,
+    LEAN_TRAINING,
+    PREPROCESSOR_SUFFIX,
+    S3_BUCKET,
+    S3_TRAIN_KEY,
+    TRAIN_CSV_SOURCE,
+    FeaturePreprocessor,
+    pipeline_from_csv,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FEATURE_CACHE_DIR = os.getenv("FEATURE_CACHE_DIR", "data/features")
+# Bump when the cleaning steps change in a way the config hash cannot see
+PIPELINE_VERSION = 1
+
+
+def preprocessing_config(target_col: str = "price_doc") -> dict:
+    config = {
+        "pipeline_version": PIPELINE_VERSION,
+        "boolean_columns": BOOLEAN_COLUMNS,
+        "label_columns": LABEL_COLUMNS,
+        "target": target_col,
+    }
+    if LEAN_TRAINING:
+        # Only set when lean, so existing float64 caches keep their keys
+        config["feature_dtype"] = np.dtype(FEATURE_DTYPE).name
+    return config
+
+
+def source_version(source: str) -> str:
+    """S3 VersionId/ETag of the training object, or size+mtime of a local file."""
+    if source.startswith("s3://"):
+        head = s3_transfer.client().head_object(Bucket=S3_BUCKET, Key=S3_TRAIN_KEY)
+        version_id = head.get("VersionId")
+        if version_id and version_id != "null":
+            return version_id
+        return head["ETag"].strip('"')
+    st = os.stat(source)
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+def cache_key(source: str, target_col: str = "price_doc") -> str:
+    payload = {
+        "source": source,
+        "version": source_version(source),
+        "config": preprocessing_config(target_col),
+    }
+    blob = json.dumps(payload, sort_keys=True).encode()
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def write_features(X: pd.DataFrame, y: pd.Series, path: str):
+    """Write X plus the target column as one uncompressed Arrow IPC file."""
+    df = X.assign(**{y.name: y})
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Store NaN as NaN rather than as Arrow nulls: a column with a validity
+    # bitmap has to be copied to become a NumPy array again
+    for i, name in enumerate(table.column_names):
+        column = table.column(i)
+        if pa.types.is_floating(column.type) and column.null_count:
+            values = pa.array(df[name].to_numpy(), from_pandas=False)
+            table = table.set_column(i, name, values)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with (
+        pa.OSFile(tmp_path, "wb") as sink,
+        pa.ipc.new_file(sink, table.schema) as writer,
+    ):
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_features(path: str, target_col: str = "price_doc"):
+    """Memory-map a feature file; numeric columns are zero-copy views of it."""
+    source = pa.memory_map(path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    # The target is split off in Arrow: DataFrame.drop would copy every
+    # feature column off the map. split_blocks avoids consolidating columns
+    # into a freshly allocated block.
+    X = table.drop([target_col]).to_pandas(split_blocks=True)
+    y = table.select([target_col]).to_pandas(split_blocks=True)[target_col]
+    return X, y
+
+
+def _cache_path(source: str, target_col: str, cache_dir: str) -> str:
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, f"features-{cache_key(source, target_col)}.arrow")
+
+
+def load_features(
+    source: str = TRAIN_CSV_SOURCE,
+    target_col: str = "price_doc",
+    cache_dir: str = FEATURE_CACHE_DIR,
+) -> tuple[pd.DataFrame, pd.Series]:
+    """Cleaned (X, y) from the cache, building and caching them on a miss."""
+    path = _cache_path(source, target_col, cache_dir)
+    if os.path.exists(path) and os.path.exists(path + PREPROCESSOR_SUFFIX):
+        logger.info(f"Feature cache hit: {path}")
+        return read_features(path, target_col)
+    logger.info(f"Feature cache miss; building features from {source}")
+    preprocessor = FeaturePreprocessor()
+    X, y = pipeline_from_csv(source, target_col, INGEST_CHUNKSIZE, preprocessor)
+    write_features(X, y, path)
+    preprocessor.save(path + PREPROCESSOR_SUFFIX)
+    logger.info(f"Cached features with shape {X.shape} at {path}")
+    return read_features(path, target_col)
+
+
+def load_preprocessor(
+    source: str = TRAIN_CSV_SOURCE,
+    target_col: str = "price_doc",
+    cache_dir: str = FEATURE_CACHE_DIR,
+) -> FeaturePreprocessor:
+    """The encoder fitted alongside the cached features for `source`."""
+    path = _cache_path(source, target_col, cache_dir) + PREPROCESSOR_SUFFIX
+    if not os.path.exists(path):
+        load_features(source, target_col, cache_dir)
+    return FeaturePreprocessor.load(path)
+
+
+if __name__ == "__main__":
+    X, y = load_features(os.getenv("TRAIN_CSV_SOURCE", TRAIN_CSV_SOURCE))
+    print("X shape:", X.shape, "y shape:", y.shape)
@@ -0,0 +1,214 @@
+# src/hyperparameter_search.py
+"""
+Parallel hyperparameter search for the ExtraTreesRegressor in train.py.
+
+The train/validation arrays are written once as float32/float64 .npy files
+and memory-mapped by every worker, so no trial pickles the dataset and all
+workers share the same page-cache copy (float32 is what the tree builder
+uses internally, so sklearn does not copy the mapped X again).
+
+Each trial runs single-threaded in its own process and grows its forest in
+stages with warm_start. After every stage the partial forest is scored on
+the validation set; a trial whose partial RMSE is worse than the best
+finished trial by more than SEARCH_PRUNE_TOLERANCE stops early. One trial
+per core means wall-clock time falls roughly linearly with the core count.
+MLflow logging stays in the parent (its active-run stack is per process).
+"""
+
+import logging
+import math
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.ensemble import ExtraTreesRegressor
+from sklearn.metrics import r2_score, root_mean_squared_error
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the search; otherwise the number of random trials (or the grid cap)
+SEARCH_TRIALS = int(os.getenv("SEARCH_TRIALS", "0"))
+# "random" samples SEARCH_TRIALS points; "grid" tries every combination
+SEARCH_MODE = os.getenv("SEARCH_MODE", "random")
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", str(os.cpu_count() or 1)))
+# Fractions of n_estimators after which a partial forest is scored
+SEARCH_STAGES = [
+    float(f) for f in os.getenv("SEARCH_STAGES", "0.25,0.5,1.0").split(",")
+]
+# A trial stops once its partial RMSE exceeds best * (1 + tolerance)
+SEARCH_PRUNE_TOLERANCE = float(os.getenv("SEARCH_PRUNE_TOLERANCE", "0.05"))
+
+SEARCH_SPACE = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [None, 10, 20],
+    "max_features": [1.0, "sqrt", 0.5],
+    "min_samples_leaf": [1, 2, 5],
+}
+
+# Set in each worker by _init_worker
+_data = None
+_best_rmse = None
+
+
+def candidate_params(
+    space: dict = SEARCH_SPACE,
+    n_trials: int = SEARCH_TRIALS,
+    mode: str = SEARCH_MODE,
+    random_state: int = 42,
+) -> list:
+    if mode == "grid":
+        return list(ParameterGrid(space))[:n_trials]
+    if mode == "random":
+        return list(ParameterSampler(space, n_trials, random_state=random_state))
+    raise ValueError(f"Unknown search mode: {mode}")
+
+
+def share_arrays(data_dir: str, X_train, y_train, X_val, y_val):
+    """Write the split once as .npy files that workers memory-map."""
+    arrays = {
+        "X_train": np.ascontiguousarray(X_train, dtype=np.float32),
+        "y_train": np.ascontiguousarray(y_train, dtype=np.float64),
+        "X_val": np.ascontiguousarray(X_val, dtype=np.float32),
+        "y_val": np.ascontiguousarray(y_val, dtype=np.float64),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(data_dir, f"{name}.npy"), array)
+
+
+def _init_worker(data_dir: str, best_rmse):
+    global _data, _best_rmse
+    _data = {
+        name: np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode="r")
+        for name in ("X_train", "y_train", "X_val", "y_val")
+    }
+    _best_rmse = best_rmse
+
+
+def run_trial(trial_id: int, params: dict, random_state: int = 42) -> dict:
+    """Grow one forest in stages, stopping early if it cannot win."""
+    start = time.perf_counter()
+    params = dict(params)
+    n_estimators = params.pop("n_estimators")
+    model = ExtraTreesRegressor(
+        n_estimators=1, warm_start=True, n_jobs=1, random_state=random_state, **params
+    )
+    history, pruned = [], False
+    for fraction in SEARCH_STAGES:
+        model.set_params(n_estimators=max(1, math.ceil(n_estimators * fraction)))
+        model.fit(_data["X_train"], _data["y_train"])
+        preds = model.predict(_data["X_val"])
+        rmse = float(root_mean_squared_error(_data["y_val"], preds))
+        history.append((len(model.estimators_), rmse))
+        if len(model.estimators_) >= n_estimators:
+            break
+        if rmse > _best_rmse.value * (1 + SEARCH_PRUNE_TOLERANCE):
+            pruned = True
+            break
+
+    if not pruned:
+        with _best_rmse.get_lock():
+            _best_rmse.value = min(_best_rmse.value, rmse)
+    return {
+        "trial": trial_id,
+        "params": {"n_estimators": n_estimators, **params},
+        "rmse": rmse,
+        "r2": float(r2_score(_data["y_val"], preds)),
+        "n_trees": len(model.estimators_),
+        "pruned": pruned,
+        "history": history,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def log_trial_to_mlflow(result: dict, tracker=None):
+    """
+    Record one trial as a nested run under the active MLflow run. With a
+    tracking.BufferedTracker its records are queued instead of each being a
+    blocking call.
+    """
+    import mlflow
+
+    with mlflow.start_run(run_name=f"trial-{result['trial']}", nested=True) as run:
+        if tracker is None:
+            mlflow.log_params(result["params"])
+            for n_trees, rmse in result["history"]:
+                mlflow.log_metric("partial_rmse", rmse, step=n_trees)
+            mlflow.log_metric("rmse", result["rmse"])
+            mlflow.log_metric("r2", result["r2"])
+            mlflow.log_metric("trial_seconds", result["seconds"])
+            mlflow.set_tag("pruned", str(result["pruned"]))
+            return
+        run_id = run.info.run_id
+        tracker.log_params(result["params"], run_id=run_id)
+        for n_trees, rmse in result["history"]:
+            tracker.log_metric("partial_rmse", rmse, step=n_trees, run_id=run_id)
+        tracker.log_metrics(
+            {
+                "rmse": result["rmse"],
+                "r2": result["r2"],
+                "trial_seconds": result["seconds"],
+            },
+            run_id=run_id,
+        )
+        tracker.set_tag("pruned", str(result["pruned"]), run_id=run_id)
+
+
+def run_search(
+    X_train,
+    y_train,
+    X_val,
+    y_val,
+    candidates: list,
+    workers: int = SEARCH_WORKERS,
+    random_state: int = 42,
+    on_result=None,
+) -> dict:
+    """
+    Evaluate `candidates` across `workers` processes and return the best
+    unpruned trial. `on_result` is called in the parent as each trial finishes.
+    """
+    ctx = mp.get_context("spawn")
+    best_rmse = ctx.Value("d", math.inf)
+    results = []
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="search-") as data_dir:
+        share_arrays(data_dir, X_train, y_train, X_val, y_val)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(data_dir, best_rmse),
+        ) as pool:
+            futures = [
+                pool.submit(run_trial, i, params, random_state)
+                for i, params in enumerate(candidates)
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                logger.info(
+                    "Trial %d %s: rmse=%.4f trees=%d%s",
+                    result["trial"],
+                    result["params"],
+                    result["rmse"],
+                    result["n_trees"],
+                    " (pruned)" if result["pruned"] else "",
+                )
+                if on_result is not None:
+                    on_result(result)
+                results.append(result)
+
+    finished = [r for r in results if not r["pruned"]]
+    best = min(finished, key=lambda r: r["rmse"])
+    logger.info(
+        "Search of %d trials (%d pruned) took %.1fs with %d workers; best %s",
+        len(results),
+        len(results) - len(finished),
+        time.perf_counter() - start,
+        workers,
+        best["params"],
+    )
+    return best
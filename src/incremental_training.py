@@ -0,0 +1,161 @@
+# src/incremental_training.py
+"""
+Warm-start retraining of the deployed ExtraTreesRegressor.
+
+Instead of refitting the whole forest, the currently deployed model is loaded
+and `warm_start` grows INCREMENTAL_NEW_TREES extra trees on the most recent
+partition of the data. Once the forest exceeds INCREMENTAL_MAX_TREES the
+oldest trees are retired, so the ensemble slides forward over time. Every
+tree carries the label of the run that grew it (`tree_sources_`), and the
+forest remembers the last row its data extended to (`data_cutoff_`); both
+are recorded as lineage in MLflow, and the next run fits only the rows after
+that cutoff.
+"""
+
+import json
+import logging
+import os
+import tempfile
+from collections import Counter
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+INCREMENTAL_TRAINING = os.getenv("INCREMENTAL_TRAINING", "0") == "1"
+INCREMENTAL_NEW_TREES = int(os.getenv("INCREMENTAL_NEW_TREES", "20"))
+INCREMENTAL_MAX_TREES = int(os.getenv("INCREMENTAL_MAX_TREES", "200"))
+# Trailing share of the rows (file order is arrival order) treated as new data
+# when the deployed forest has no recorded cutoff
+INCREMENTAL_RECENT_FRACTION = float(os.getenv("INCREMENTAL_RECENT_FRACTION", "0.1"))
+
+
+def recent_cutoff(index: pd.Index, fraction: float = INCREMENTAL_RECENT_FRACTION):
+    """First index label of the trailing `fraction` of rows."""
+    return index[min(len(index) - 1, int(len(index) * (1 - fraction)))]
+
+
+def partition_cutoff(
+    model, index: pd.Index, fraction: float = INCREMENTAL_RECENT_FRACTION
+):
+    """
+    First index label after the data `model` last saw (its `data_cutoff_`),
+    or recent_cutoff(index, fraction) for forests that never recorded one.
+    """
+    previous = getattr(model, "data_cutoff_", None)
+    if previous is None:
+        return recent_cutoff(index, fraction)
+    newer = index[index > previous]
+    if not len(newer):
+        raise ValueError(f"No rows after the previous run's cutoff {previous!r}")
+    return newer.min()
+
+
+def recent_partition(
+    X: pd.DataFrame, y: pd.Series, cutoff
+) -> tuple[pd.DataFrame, pd.Series]:
+    """Rows of (X, y) whose index is at or after `cutoff`."""
+    mask = X.index >= cutoff
+    logger.info("Recent partition: %d of %d rows", int(mask.sum()), len(X))
+    return X[mask], y[mask]
+
+
+def grow_forest(
+    model,
+    X_new: pd.DataFrame,
+    y_new: pd.Series,
+    source: str,
+    n_new_trees: int = INCREMENTAL_NEW_TREES,
+    max_trees: int = INCREMENTAL_MAX_TREES,
+    data_cutoff=None,
+) -> dict:
+    """
+    Add `n_new_trees` trees fitted on (X_new, y_new) to `model` in place, then
+    drop the oldest trees beyond `max_trees`. `data_cutoff` is the last index
+    label of the data this run read; the next run starts after it. Returns a
+    lineage summary.
+    """
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None and list(names) != list(X_new.columns):
+        raise ValueError(
+            f"New data columns {list(X_new.columns)} do not match the model's "
+            f"features {list(names)}"
+        )
+    n_before = len(model.estimators_)
+    sources = list(getattr(model, "tree_sources_", ["initial"] * n_before))
+
+    model.set_params(warm_start=True, n_estimators=n_before + n_new_trees)
+    model.fit(X_new, y_new)
+    sources += [source] * n_new_trees
+
+    retired = max(0, len(model.estimators_) - max_trees)
+    if retired:
+        model.estimators_ = model.estimators_[retired:]
+        sources = sources[retired:]
+    model.tree_sources_ = sources
+    if data_cutoff is not None:
+        model.data_cutoff_ = data_cutoff
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+
+    summary = {
+        "trees_before": n_before,
+        "trees_added": n_new_trees,
+        "trees_retired": retired,
+        "trees_total": len(model.estimators_),
+        "rows_fitted": len(X_new),
+        "data_cutoff": getattr(model, "data_cutoff_", None),
+        "tree_sources": dict(Counter(sources)),
+    }
+    logger.info("Grew forest: %s", summary)
+    return summary
+
+
+def log_lineage_to_mlflow(summary: dict, parent_version: str, tracker=None):
+    """
+    Record where the warm-started forest came from on the active run, queued
+    on `tracker` (a tracking.BufferedTracker) when given.
+    """
+    tags = {"training_mode": "incremental", "parent_model_version": parent_version}
+    params = {k: v for k, v in summary.items() if k != "tree_sources"}
+    if tracker is None:
+        import mlflow
+
+        mlflow.set_tags(tags)
+        mlflow.log_params(params)
+        mlflow.log_dict(summary["tree_sources"], "lineage/tree_sources.json")
+    else:
+        tracker.set_tags(tags)
+        tracker.log_params(params)
+        tracker.submit(
+            _log_json,
+            tracker.client,
+            tracker.run_id,
+            dict(summary["tree_sources"]),
+            "lineage/tree_sources.json",
+        )
+
+
+def _log_json(client, run_id: str, obj, artifact_file: str):
+    """Upload `obj` as the JSON artifact `artifact_file` of `run_id`."""
+    artifact_path, name = os.path.split(artifact_file)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, name)
+        with open(path, "w") as fh:
+            json.dump(obj, fh)
+        client.log_artifact(run_id, path, artifact_path or None)
+
+
+def load_deployed_model(bucket: str, key: str):
+    """The currently deployed sklearn forest, its encoder and its S3 version."""
+    from src.inference import (
+        load_model,
+        load_preprocessor,
+        model_version_in_s3,
+        resolve_model_object,
+    )
+
+    version = model_version_in_s3(bucket, key)
+    # Model and encoder from the same upload, even if a new one lands meanwhile
+    model_object = resolve_model_object(bucket, key, version)
+    model = load_model(engine="sklearn", model_object=model_object)
+    return model, load_preprocessor(model_object=model_object), version
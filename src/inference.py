@@ -1,10 +1,21 @@
 # src/inference.py
+import hashlib
 import os
-import boto3
-import joblib
+import json
+import shutil
+import numpy as np
 import pandas as pd
 import logging
+import time
+import warnings
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
+from src.data_ingestion import PREPROCESSOR_SUFFIX, FeaturePreprocessor
+from src import s3_transfer
+from src.model_cache import ModelCache, file_lock
+from src.model_format import COMPACT_MODEL_SUFFIX, read_forest
+from src.telemetry import observe_stage, stage
+from src.tree_engine import CompiledForest, compile_model, load_arrays, save_arrays
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,28 +24,104 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
 CI_MODE = os.getenv("CI_MODE", "0") == "1"
 S3_BUCKET = os.getenv("S3_BUCKET")
 S3_MODEL_KEY = os.getenv("S3_MODEL_KEY")
-AWS_REGION = os.getenv("AWS_REGION")
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+# "sklearn" (default), "compiled" (flat-array engine in tree_engine.py),
+# "mmap" (compiled arrays memory-mapped from disk and shared across workers)
+# or "compact" (the .ftree artifact from model_format.py, memory-mapped)
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "sklearn")
+# Batches at least this large go back to sklearn when the compiled engine is on
+COMPILED_FALLBACK_ROWS = int(os.getenv("COMPILED_FALLBACK_ROWS", "256"))
+
+# Same categorical mapping the API has always applied to product_type; only
+# used for models uploaded before their fitted preprocessor was saved with them
+CATEGORICAL_MAPPINGS = {"product_type": {"Investment": 1, "OwnerOccupier": 0}}
+LEGACY_PREPROCESSOR = FeaturePreprocessor(mappings=CATEGORICAL_MAPPINGS)
+
+
+def get_s3_client():
+    # The pooled client from s3_transfer; boto3 and joblib (and sklearn, via
+    # the unpickled model) are imported on first use so `import src.api`
+    # stays cheap; see FAST_STARTUP in api.py
+    return s3_transfer.client()
 
 
 def download_model_from_s3(
-    bucket=S3_BUCKET, key=S3_MODEL_KEY, local_path="models/model.pkl"
+    bucket=S3_BUCKET, key=S3_MODEL_KEY, cache=None, version_id=None, etag=None
 ):
-    """Download model from S3 and return local path."""
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY,
-        region_name=AWS_REGION,
+    """
+    Return a local path to the current model (or the given S3 `version_id`
+    and/or `etag`), downloading it only when the content-addressed cache has
+    no copy matching the object's ETag.
+    """
+    cache = cache or ModelCache()
+    logger.info(f"Resolving model s3://{bucket}/{key}")
+    return cache.fetch(get_s3_client(), bucket, key, version_id=version_id, etag=etag)
+
+
+def model_version_in_s3(bucket=S3_BUCKET, key=S3_MODEL_KEY) -> str:
+    """S3 VersionId of the current model object, or its ETag if unversioned."""
+    head = get_s3_client().head_object(Bucket=bucket, Key=key)
+    return s3_transfer.object_version(head)
+
+
+@dataclass
+class ModelObject:
+    """One exact version of a model object in S3 (see resolve_model_object)."""
+
+    bucket: str
+    key: str
+    version: str
+    etag: str
+    # None in unversioned buckets, where only the current object exists
+    version_id: str = None
+    metadata: dict = field(default_factory=dict)
+    # Whether this version is the object currently stored under `key`
+    current: bool = True
+
+
+def resolve_model_object(bucket, key, version: str) -> ModelObject:
+    """
+    The object behind a `version` from model_version_in_s3: an S3 VersionId,
+    or the ETag of the current object in an unversioned bucket. Raises
+    LookupError when that version no longer exists or cannot be addressed.
+    """
+    from botocore.exceptions import ClientError
+
+    s3 = get_s3_client()
+    head = s3.head_object(Bucket=bucket, Key=key)
+    current = version in (head.get("VersionId"), head["ETag"].strip('"'))
+    if not current:
+        if head.get("VersionId") in (None, "null"):
+            raise LookupError(
+                f"s3://{bucket}/{key} is not versioned and no longer holds {version}"
+            )
+        try:
+            head = s3.head_object(Bucket=bucket, Key=key, VersionId=version)
+        except ClientError as e:
+            raise LookupError(f"No version {version} of s3://{bucket}/{key}") from e
+    version_id = head.get("VersionId")
+    return ModelObject(
+        bucket=bucket,
+        key=key,
+        version=version,
+        etag=head["ETag"],
+        version_id=None if version_id in (None, "null") else version_id,
+        metadata=head.get("Metadata", {}),
+        current=current,
     )
-    os.makedirs(os.path.dirname(local_path), exist_ok=True)
-    logger.info(f"Downloading model from s3://{bucket}/{key}")
-    s3.download_file(bucket, key, local_path)
-    return local_path
 
 
-def load_model():
+def load_model(
+    engine=None, bucket=S3_BUCKET, key=S3_MODEL_KEY, version_id=None, model_object=None
+):
+    """
+    Load the model; `engine` (default INFERENCE_ENGINE) picks sklearn, compiled
+    or mmap, `version_id` pins a specific S3 object version and
+    `model_object` (from resolve_model_object) loads exactly that object.
+    """
+    engine = engine or INFERENCE_ENGINE
+    if engine not in ("sklearn", "compiled", "mmap", "compact"):
+        raise ValueError(f"Unknown inference engine: {engine}")
+
     if CI_MODE:
         from sklearn.dummy import DummyRegressor
         import numpy as np
@@ -43,14 +130,285 @@ def load_model():
         dummy.fit(np.array([[0.0]]), np.array([0.0]))
         return dummy
 
-    """Load model from S3"""
-    model_path = download_model_from_s3()
+    etag = None
+    if model_object is not None:
+        bucket, key = model_object.bucket, model_object.key
+        version_id, etag = model_object.version_id, model_object.etag
+
+    if engine == "compact":
+        # The .ftree object has its own S3 versions: load the copy uploaded
+        # together with the model object, like the other sidecars
+        if model_object is not None:
+            selector = sidecar_selector(model_object, COMPACT_MODEL_SUFFIX)
+            version_id, etag = selector.get("VersionId"), selector.get("IfMatch")
+        elif version_id:
+            raise LookupError(
+                f"Version {version_id} names the pickle, not its "
+                f"{COMPACT_MODEL_SUFFIX}; pass the resolved model object"
+            )
+        key += COMPACT_MODEL_SUFFIX
+
+    # Load model from S3
+    model_path = download_model_from_s3(bucket, key, version_id=version_id, etag=etag)
+    return load_model_file(model_path, engine)
+
+
+def load_model_file(model_path: str, engine=None):
+    """Load a local model pickle with the given inference engine."""
+    engine = engine or INFERENCE_ENGINE
+    if engine == "mmap":
+        return load_shared_arrays(model_path)
+    if engine == "compact":
+        model = read_forest(model_path)
+        logger.info("✅ Model memory-mapped from %s", model_path)
+        return model
+    import joblib
+
     model = joblib.load(model_path)
     logger.info("✅ Model loaded successfully")
+    if engine == "compiled":
+        model = compile_model(model, fallback_min_rows=COMPILED_FALLBACK_ROWS)
+    return model
+
+
+def _sidecar_name(suffix: str) -> str:
+    # ".drift_profile.json" -> "drift-profile-json" (S3 metadata keys)
+    return suffix.strip(".").replace(".", "-").replace("_", "-")
+
+
+def sidecar_metadata(uploads: dict) -> dict:
+    """
+    Model object metadata recording which sidecar objects belong to it, from
+    {suffix: TransferStats of the sidecar upload}; see sidecar_selector.
+    """
+    metadata = {}
+    for suffix, stats in uploads.items():
+        name = _sidecar_name(suffix)
+        metadata[f"{name}-etag"] = stats.etag
+        if stats.version_id and stats.version_id != "null":
+            metadata[f"{name}-version-id"] = stats.version_id
+    return metadata
+
+
+def sidecar_selector(model_object: ModelObject, suffix: str) -> dict:
+    """
+    GET arguments for the `key + suffix` object uploaded with `model_object`.
+    Models that predate the recorded versions can only use the latest copy,
+    and only while they are the current object.
+    """
+    name = _sidecar_name(suffix)
+    etag = model_object.metadata.get(f"{name}-etag")
+    if etag is None:
+        if not model_object.current:
+            raise LookupError(
+                f"Model version {model_object.version} did not record its "
+                f"{suffix}; it cannot be loaded exactly"
+            )
+        logger.warning(
+            "Model %s predates versioned sidecars; using the latest %s",
+            model_object.version,
+            suffix,
+        )
+        return {}
+    # IfMatch also holds in unversioned buckets: a replaced copy fails loudly
+    selector = {"IfMatch": etag}
+    version_id = model_object.metadata.get(f"{name}-version-id")
+    if version_id:
+        selector["VersionId"] = version_id
+    return selector
+
+
+def load_sidecar(bucket, key, suffix, model_object=None):
+    """
+    JSON file train.py uploaded next to the model at `key + suffix`, or None
+    when the model predates it. With `model_object` (resolve_model_object)
+    it is the copy uploaded together with that model version.
+    """
+    from botocore.exceptions import ClientError
+
+    if CI_MODE:
+        return None
+    selector = {}
+    if model_object is not None:
+        bucket, key = model_object.bucket, model_object.key
+        selector = sidecar_selector(model_object, suffix)
+    try:
+        response = get_s3_client().get_object(
+            Bucket=bucket, Key=key + suffix, **selector
+        )
+    except ClientError as e:
+        if selector or e.response["Error"]["Code"] not in ("NoSuchKey", "404"):
+            raise
+        logger.warning(f"No {suffix} saved for s3://{bucket}/{key}")
+        return None
+    return json.loads(response["Body"].read())
+
+
+def load_preprocessor(bucket=S3_BUCKET, key=S3_MODEL_KEY, model_object=None):
+    """
+    The FeaturePreprocessor train.py saved next to the model (the one
+    uploaded with `model_object`, if given), or None when the model predates
+    it (callers then fall back to LEGACY_PREPROCESSOR).
+    """
+    data = load_sidecar(bucket, key, PREPROCESSOR_SUFFIX, model_object)
+    return None if data is None else FeaturePreprocessor.from_dict(data)
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _arrays_built_from(arrays_dir: str, digest: str) -> bool:
+    # "source" holds the digest of the pickle the arrays were converted from
+    if not os.path.exists(os.path.join(arrays_dir, "meta.json")):
+        return False
+    try:
+        with open(os.path.join(arrays_dir, "source")) as fh:
+            return fh.read() == digest
+    except FileNotFoundError:
+        return False
+
+
+def load_shared_arrays(model_path: str) -> CompiledForest:
+    """
+    Memory-map the compiled arrays for `model_path`, building them first if needed.
+    The array directory sits next to the content-addressed cached pickle, so the
+    first worker converts it under a lock and every other worker just maps it.
+    Arrays converted from other bytes (a local pickle replaced in place) are
+    rebuilt into a fresh directory, so processes still mapping them keep working.
+    """
+    arrays_dir = model_path + ".arrays"
+    digest = _file_digest(model_path)
+    if not _arrays_built_from(arrays_dir, digest):
+        with file_lock(model_path + ".arrays.lock"):
+            if not _arrays_built_from(arrays_dir, digest):
+                import joblib
+
+                logger.info("Converting %s to mmap arrays", model_path)
+                tmp_dir = f"{arrays_dir}.{os.getpid()}.tmp"
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                save_arrays(
+                    CompiledForest.from_estimator(joblib.load(model_path)), tmp_dir
+                )
+                with open(os.path.join(tmp_dir, "source"), "w") as fh:
+                    fh.write(digest)
+                if os.path.exists(arrays_dir):
+                    # Renamed, not overwritten: existing mappings stay valid
+                    stale = f"{arrays_dir}.{os.getpid()}.old.tmp"
+                    os.rename(arrays_dir, stale)
+                    shutil.rmtree(stale, ignore_errors=True)
+                os.rename(tmp_dir, arrays_dir)
+    model = load_arrays(arrays_dir, mmap_mode="r")
+    logger.info("✅ Model memory-mapped from %s", arrays_dir)
     return model
 
 
 def predict(model, X: pd.DataFrame):
     """Run model prediction"""
-    preds = model.predict(X)
+    with stage("predict"), warnings.catch_warnings():
+        # Batches are handed to the model as plain arrays already in
+        # feature_names_in_ order, so sklearn's "no feature names" warning is
+        # expected noise here (and only here)
+        warnings.filterwarnings(
+            "ignore",
+            message="X does not have valid feature names",
+            category=UserWarning,
+        )
+        preds = model.predict(X)
     return preds
+
+
+def feature_names(model):
+    """Feature order the model was fitted with, or None if it was fitted on arrays."""
+    names = getattr(model, "feature_names_in_", None)
+    return None if names is None else list(names)
+
+
+def _column_to_array(name, values, preprocessor) -> np.ndarray:
+    """Convert one column of raw JSON values to float64, encoding categoricals."""
+    if preprocessor.handles(name):
+        return preprocessor.transform_column(name, values)
+    return np.asarray(values, dtype=np.float64)
+
+
+def build_feature_matrix(payload: dict, names=None, preprocessor=None):
+    """
+    Build a single (n_rows, n_features) float64 matrix from a batch payload.
+
+    Accepts either {"records": [{...}, ...]} or {"columns": {"feature": [...]}}.
+    When `names` (the model's feature_names_in_) is given, columns are emitted in
+    exactly that order and missing features raise KeyError. Without a schema the
+    payload's own column order is used and non-numeric columns are dropped, the
+    same way the single-record endpoint drops them with select_dtypes.
+    Categorical and yes/no columns go through `preprocessor` (the encoder fitted
+    at training time), defaulting to LEGACY_PREPROCESSOR.
+    Returns (matrix, column_names).
+    """
+    preprocessor = preprocessor or LEGACY_PREPROCESSOR
+    with stage("assemble"):
+        columns = _payload_columns(payload, names)
+
+    # Categorical encoding and numeric conversion are timed as separate stages
+    elapsed = {True: 0.0, False: 0.0}
+    arrays, kept = [], []
+    for name, values in columns.items():
+        start = time.perf_counter()
+        try:
+            arrays.append(_column_to_array(name, values, preprocessor))
+        except (TypeError, ValueError):
+            if names is not None:
+                raise ValueError(f"Feature '{name}' has non-numeric values")
+            continue
+        finally:
+            elapsed[preprocessor.handles(name)] += time.perf_counter() - start
+        kept.append(name)
+    observe_stage("encode", elapsed[True])
+    observe_stage("convert", elapsed[False])
+    if not arrays:
+        raise ValueError("No numeric features in payload")
+    return np.column_stack(arrays), kept
+
+
+def _payload_columns(payload: dict, names=None) -> dict:
+    """{feature: raw values} from a records or columns payload, validated."""
+    if "records" in payload:
+        records = payload["records"]
+        if (
+            not isinstance(records, list)
+            or not records
+            or not all(isinstance(rec, dict) for rec in records)
+        ):
+            raise ValueError("'records' must be a non-empty list of objects")
+        wanted = names if names is not None else list(records[0])
+        columns = {name: [rec.get(name) for rec in records] for name in wanted}
+        if names is not None:
+            missing = [n for n in names if all(v is None for v in columns[n])]
+            if missing:
+                raise KeyError(f"Missing features: {missing}")
+    elif "columns" in payload:
+        columns = payload["columns"]
+        if not isinstance(columns, dict) or not columns:
+            raise ValueError("'columns' must be a non-empty object of lists")
+        if names is not None:
+            missing = [n for n in names if n not in columns]
+            if missing:
+                raise KeyError(f"Missing features: {missing}")
+            columns = {n: columns[n] for n in names}
+        if not all(isinstance(v, (list, np.ndarray)) for v in columns.values()):
+            raise ValueError("'columns' must be a non-empty object of lists")
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError("All columns must have the same length")
+    else:
+        raise ValueError("Payload must contain 'records' or 'columns'")
+    return columns
+
+
+def predict_batch(model, payload: dict, preprocessor=None) -> np.ndarray:
+    """Vectorized preprocessing + a single model.predict call for a whole batch."""
+    X, _ = build_feature_matrix(payload, feature_names(model), preprocessor)
+    return predict(model, X)
@@ -0,0 +1,191 @@
+# src/model_cache.py
+"""
+Content-addressed local cache for model artifacts stored in S3.
+
+Each artifact is stored under a name derived from its bucket, key and ETag,
+so a HEAD request is enough to know whether the cached copy is current.
+Downloads happen under a per-key file lock: when several gunicorn workers
+start together, one downloads and the others reuse its file. Large objects
+are fetched as parallel ranged GETs (see s3_transfer.download_file). Old
+versions are evicted by age and by total cache size.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+from src.s3_transfer import download_file
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "models/cache")
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(2 * 1024**3)))
+MODEL_CACHE_MAX_AGE_DAYS = float(os.getenv("MODEL_CACHE_MAX_AGE_DAYS", "30"))
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive inter-process lock held for the duration of the block."""
+    with open(path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _key_id(bucket: str, key: str) -> str:
+    return hashlib.sha256(f"s3://{bucket}/{key}".encode()).hexdigest()[:16]
+
+
+class ModelCache:
+    """Local directory of S3 artifacts keyed by (bucket, key, ETag)."""
+
+    def __init__(
+        self,
+        cache_dir: str = MODEL_CACHE_DIR,
+        max_bytes: int = MODEL_CACHE_MAX_BYTES,
+        max_age_seconds: float = MODEL_CACHE_MAX_AGE_DAYS * 86400,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_path(self, bucket: str, key: str, etag: str) -> str:
+        suffix = os.path.splitext(key)[1] or ".bin"
+        content_id = hashlib.sha256(etag.strip('"').encode()).hexdigest()[:16]
+        return os.path.join(
+            self.cache_dir, f"{_key_id(bucket, key)}-{content_id}{suffix}"
+        )
+
+    def fetch(self, s3, bucket: str, key: str, version_id=None, etag=None) -> str:
+        """
+        Return a local path holding the current version of s3://bucket/key
+        (or the pinned S3 `version_id`; with `etag`, exactly that object or
+        an error). Only downloads when no cached file matches the object's
+        ETag.
+        """
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        extra = {"VersionId": version_id} if version_id else {}
+        if etag:
+            extra["IfMatch"] = etag
+        try:
+            head = s3.head_object(Bucket=bucket, Key=key, **extra)
+        except (BotoCoreError, ClientError) as e:
+            if etag:
+                cached = self.entry_path(bucket, key, etag)
+                cached = cached if os.path.exists(cached) else None
+            else:
+                cached = self.latest_cached(bucket, key)
+            if cached is None or (version_id and not etag):
+                raise
+            logger.warning(
+                "HEAD s3://%s/%s failed (%s); using %s", bucket, key, e, cached
+            )
+            return cached
+
+        etag = head["ETag"]
+        path = self.entry_path(bucket, key, etag)
+        if os.path.exists(path):
+            os.utime(path)  # mtime doubles as last-used time for eviction
+            logger.info("Model cache hit for s3://%s/%s (%s)", bucket, key, etag)
+            return path
+
+        lock_path = os.path.join(self.cache_dir, f"{_key_id(bucket, key)}.lock")
+        with file_lock(lock_path):
+            # Another worker may have finished the download while we waited
+            if not os.path.exists(path):
+                self._download(s3, bucket, key, head, path, extra)
+        self.evict(keep={path})
+        return path
+
+    def _download(self, s3, bucket: str, key: str, head: dict, path: str, extra):
+        etag = head["ETag"]
+        logger.info("Model cache miss; downloading s3://%s/%s (%s)", bucket, key, etag)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            # IfMatch pins the bytes to the ETag we named the file after
+            stats = download_file(
+                bucket,
+                key,
+                tmp_path,
+                s3=s3,
+                head=head,
+                extra={**extra, "IfMatch": etag},
+            )
+            meta = {
+                "bucket": bucket,
+                "key": key,
+                "etag": etag,
+                "sha256": stats.sha256,
+                "size": stats.bytes,
+                "fetched_at": time.time(),
+                "mb_per_s": round(stats.mb_per_s, 1),
+            }
+            with open(path + ".json", "w") as fh:
+                json.dump(meta, fh)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def entries(self) -> list:
+        """Cached artifacts as (path, size, last_used) tuples."""
+        out = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith((".json", ".lock", ".tmp", ".arrays")):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            out.append((path, st.st_size, st.st_mtime))
+        return out
+
+    def latest_cached(self, bucket: str, key: str):
+        prefix = os.path.join(self.cache_dir, _key_id(bucket, key) + "-")
+        matches = [e for e in self.entries() if e[0].startswith(prefix)]
+        return max(matches, key=lambda e: e[2])[0] if matches else None
+
+    def evict(self, keep=()):
+        """Drop entries older than max_age, then least recently used over max_bytes."""
+        with file_lock(os.path.join(self.cache_dir, ".evict.lock")):
+            now = time.time()
+            entries = sorted(self.entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, last_used in entries:
+                if path in keep:
+                    continue
+                expired = now - last_used > self.max_age_seconds
+                if not expired and total <= self.max_bytes:
+                    continue
+                logger.info("Evicting cached model %s", path)
+                for p in (path, path + ".json", path + ".arrays.lock"):
+                    try:
+                        os.remove(p)
+                    except FileNotFoundError:
+                        pass
+                # Derived mmap arrays (see inference.load_shared_arrays)
+                shutil.rmtree(path + ".arrays", ignore_errors=True)
+                total -= size
@@ -0,0 +1,220 @@
+# src/model_format.py
+"""
+Compact single-file artifact for tree ensembles (".ftree").
+
+Layout, little-endian:
+    b"FTREE\\0\\0\\0"  uint32 format version  uint32 header length
+    JSON header (feature schema, encodings, array offsets / dtypes / shapes)
+    arrays, each 64-byte aligned
+    sha256 of everything above (32 bytes)
+
+Node indices and feature ids are int32. Thresholds are float32 rounded
+toward -inf: sklearn compares float32 inputs against float64 thresholds,
+and for any float32 x, `x <= t` holds exactly when `x <= float32_floor(t)`,
+so routing is unchanged. Leaf values are float64, float32, or linearly
+quantized to uint16 / uint8 (`value * scale + offset`). `read_forest`
+memory-maps the file and builds the CompiledForest from np.frombuffer
+views, so loading does no unpickling and no copying.
+
+    python -m src.model_format model.pkl model.pkl.ftree --leaf-encoding uint16
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from src.tree_engine import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+# Uploaded next to the model pickle as <S3_MODEL_KEY> + this
+COMPACT_MODEL_SUFFIX = ".ftree"
+FORMAT_VERSION = 1
+MAGIC = b"FTREE\0\0\0"
+LEAF_ENCODINGS = ("float64", "float32", "uint16", "uint8")
+
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 64
+_CHECKSUM_BYTES = 32
+
+
+class ModelFormatError(ValueError):
+    """The file is not a readable .ftree artifact."""
+
+
+def float32_floor(values: np.ndarray) -> np.ndarray:
+    """Largest float32 <= each float64 value."""
+    values = np.asarray(values, dtype=np.float64)
+    out = values.astype(np.float32)
+    above = out.astype(np.float64) > values
+    out[above] = np.nextafter(out[above], np.float32(-np.inf))
+    return out
+
+
+def _quantize(value: np.ndarray, is_leaf: np.ndarray, encoding: str):
+    """(stored values, scale, offset); only leaf values are ever read."""
+    if encoding in ("float64", "float32"):
+        return value.astype(encoding), None, 0.0
+    levels = np.iinfo(encoding).max
+    leaves = value[is_leaf]
+    lo, hi = float(leaves.min()), float(leaves.max())
+    scale = (hi - lo) / levels if hi > lo else 1.0
+    codes = np.zeros(len(value), dtype=encoding)
+    codes[is_leaf] = np.clip(np.rint((leaves - lo) / scale), 0, levels)
+    return codes, scale, lo
+
+
+def write_forest(model, path: str, leaf_encoding: str = "float32") -> dict:
+    """Write a fitted forest (or CompiledForest) to `path`; returns the header."""
+    if leaf_encoding not in LEAF_ENCODINGS:
+        raise ValueError(f"Unknown leaf encoding: {leaf_encoding}")
+    forest = (
+        model
+        if isinstance(model, CompiledForest)
+        else CompiledForest.from_estimator(model)
+    )
+    n_nodes = len(forest.children_left)
+    is_leaf = forest.children_left == np.arange(n_nodes)
+    value, scale, offset = _quantize(
+        np.asarray(forest.value, dtype=np.float64), is_leaf, leaf_encoding
+    )
+    arrays = {
+        "feature": np.asarray(forest.feature, dtype=np.int32),
+        "threshold": float32_floor(forest.threshold),
+        "children_left": np.asarray(forest.children_left, dtype=np.int32),
+        "children_right": np.asarray(forest.children_right, dtype=np.int32),
+        "value": value,
+        "roots": np.asarray(forest.roots, dtype=np.int32),
+    }
+    # Trees fitted without NaNs send them right everywhere; no mask needed
+    if forest.missing_go_to_left is not None and np.any(forest.missing_go_to_left):
+        arrays["missing_go_to_left"] = np.asarray(forest.missing_go_to_left, dtype=bool)
+
+    names = getattr(forest, "feature_names_in_", None)
+    header = {
+        "format_version": FORMAT_VERSION,
+        "feature_names": None if names is None else [str(n) for n in names],
+        "n_features": int(forest.n_features_in_),
+        "max_depth": int(forest.max_depth),
+        "n_trees": int(forest.n_estimators),
+        "n_nodes": int(n_nodes),
+        "leaf_encoding": leaf_encoding,
+        "value_scale": scale,
+        "value_offset": offset,
+        "arrays": {},
+    }
+    # Offsets are relative to the start of the (aligned) data section
+    position = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": position,
+        }
+        position += -(-array.nbytes // _ALIGN) * _ALIGN
+    header_bytes = json.dumps(header).encode()
+    data_start = -(-(_PREAMBLE.size + len(header_bytes)) // _ALIGN) * _ALIGN
+
+    digest = hashlib.sha256()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fh:
+
+        def write(chunk):
+            fh.write(chunk)
+            digest.update(chunk)
+
+        write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        write(header_bytes)
+        write(b"\0" * (data_start - fh.tell()))
+        for name, array in arrays.items():
+            raw = np.ascontiguousarray(array).tobytes()
+            write(raw)
+            write(b"\0" * (-len(raw) % _ALIGN))
+        fh.write(digest.digest())
+    os.replace(tmp_path, path)
+    logger.info(
+        "Wrote %s: %d trees, %d nodes, %s leaves, %.1f MB",
+        path,
+        header["n_trees"],
+        n_nodes,
+        leaf_encoding,
+        os.path.getsize(path) / 1e6,
+    )
+    return header
+
+
+def read_header(buffer) -> tuple:
+    """(header dict, data section offset) of an .ftree buffer."""
+    if len(buffer) < _PREAMBLE.size + _CHECKSUM_BYTES:
+        raise ModelFormatError("File too short for an .ftree artifact")
+    magic, version, header_len = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ModelFormatError("Not an .ftree artifact (bad magic)")
+    if version > FORMAT_VERSION:
+        raise ModelFormatError(f"Unsupported .ftree format version {version}")
+    end = _PREAMBLE.size + header_len
+    header = json.loads(bytes(buffer[_PREAMBLE.size : end]))
+    return header, -(-end // _ALIGN) * _ALIGN
+
+
+def read_forest(path: str, use_mmap: bool = True, verify: bool = True):
+    """
+    Load an .ftree file as a CompiledForest whose arrays are read-only views
+    of the file (memory-mapped, so processes share the pages). `verify`
+    checks the sha256 trailer first.
+    """
+    with open(path, "rb") as fh:
+        if use_mmap:
+            buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = fh.read()
+    view = memoryview(buffer)
+    header, data_start = read_header(view)
+    if verify:
+        expected = bytes(view[-_CHECKSUM_BYTES:])
+        if hashlib.sha256(view[:-_CHECKSUM_BYTES]).digest() != expected:
+            raise ModelFormatError(f"Checksum mismatch in {path}")
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        arrays[name] = np.frombuffer(
+            buffer, dtype=dtype, count=count, offset=data_start + spec["offset"]
+        ).reshape(spec["shape"])
+    return CompiledForest(
+        feature=arrays["feature"],
+        threshold=arrays["threshold"],
+        children_left=arrays["children_left"],
+        children_right=arrays["children_right"],
+        value=arrays["value"],
+        roots=arrays["roots"],
+        missing_go_to_left=arrays.get("missing_go_to_left"),
+        feature_names=header["feature_names"],
+        n_features=header["n_features"],
+        max_depth=header["max_depth"],
+        value_scale=header["value_scale"],
+        value_offset=header["value_offset"],
+    )
+
+
+def main():
+    import joblib
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("model", help="joblib model pickle")
+    parser.add_argument("output", help="path of the .ftree file to write")
+    parser.add_argument("--leaf-encoding", choices=LEAF_ENCODINGS, default="float32")
+    args = parser.parse_args()
+    write_forest(joblib.load(args.model), args.output, args.leaf_encoding)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
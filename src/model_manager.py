@@ -0,0 +1,331 @@
+# src/model_manager.py
+"""
+Holds the model currently being served and hot-reloads new versions.
+
+A background watcher polls the model source (the S3 object behind
+S3_MODEL_KEY, the newest MLflow run tagged with the S3 object version it
+uploaded, or a local pickle at MODEL_PATH for offline runs). When the
+version changes, the new model is downloaded, loaded and warmed up in a
+worker thread, then swapped in with a single reference assignment. S3 and
+MLflow versions are always loaded exactly: a handle labelled with a version
+holds that object, even if a newer one was uploaded in the meantime.
+Request handlers take `manager.current` once and keep that handle, so
+in-flight requests finish on the version they started with.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.codec import FeatureSchema
+from src.data_ingestion import PREPROCESSOR_SUFFIX, FeaturePreprocessor
+from src.drift_monitor import (
+    DRIFT_PROFILE_SUFFIX,
+    ReferenceProfile,
+    load_reference_profile,
+)
+from src.inference import (
+    CI_MODE,
+    INFERENCE_ENGINE,
+    S3_BUCKET,
+    S3_MODEL_KEY,
+    build_feature_matrix,
+    feature_names,
+    load_model,
+    load_model_file,
+    load_preprocessor,
+    model_version_in_s3,
+    predict,
+    resolve_model_object,
+)
+from src.model_format import COMPACT_MODEL_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+# "s3" polls S3_MODEL_KEY; "mlflow" follows the newest run's s3_model_path tag;
+# "local" serves the pickle at MODEL_PATH (no AWS access needed)
+MODEL_SOURCE = os.getenv("MODEL_SOURCE", "s3")
+MODEL_PATH = os.getenv("MODEL_PATH", "models/model.pkl")
+# Seconds between polls; 0 disables hot reload
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "60"))
+# S3 VersionId (s3 source) or MLflow run id (mlflow source) to serve forever
+MODEL_VERSION_PIN = os.getenv("MODEL_VERSION_PIN") or None
+MLFLOW_EXPERIMENT = os.getenv("MLFLOW_EXPERIMENT", "mlops-demo")
+
+
+@dataclass
+class ModelHandle:
+    """A loaded model, the version it was loaded as and its training sidecars."""
+
+    model: object
+    version: str
+    preprocessor: object = None
+    reference_profile: object = None
+    loaded_at: float = field(default_factory=time.time)
+    # Compiled request decoder; None for models fitted without feature names
+    schema: FeatureSchema = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        names = feature_names(self.model)
+        if names is not None:
+            self.schema = FeatureSchema(names, self.preprocessor)
+
+    def matrix(self, payload: dict) -> np.ndarray:
+        """Feature matrix of a batch payload, as this model expects it."""
+        if self.schema is not None:
+            return self.schema.matrix(payload)
+        # Models fitted without feature names keep the generic path
+        X, _ = build_feature_matrix(payload, None, self.preprocessor)
+        return X
+
+
+class S3ModelSource:
+    """
+    Versions are the S3 VersionId of the model key, or its ETag in an
+    unversioned bucket (where only the current object can be loaded).
+    """
+
+    # load(version) returns that version or raises, never another one
+    exact_versions = True
+
+    def __init__(self, bucket=S3_BUCKET, key=S3_MODEL_KEY):
+        self.bucket = bucket
+        self.key = key
+
+    def latest_version(self) -> str:
+        return model_version_in_s3(self.bucket, self.key)
+
+    def load(self, version: str, pinned: bool = False):
+        # Always the object named by `version`, never whatever replaced it
+        model_object = resolve_model_object(self.bucket, self.key, version)
+        return load_model(model_object=model_object)
+
+    def load_preprocessor(self, version: str):
+        # The encoder uploaded with that model version, not the latest one
+        model_object = resolve_model_object(self.bucket, self.key, version)
+        return load_preprocessor(model_object=model_object)
+
+    def load_reference_profile(self, version: str):
+        # Drift is scored against this version's own training distribution
+        model_object = resolve_model_object(self.bucket, self.key, version)
+        return load_reference_profile(model_object=model_object)
+
+
+class MlflowModelSource:
+    """
+    Versions are MLflow run ids. Every run uploads to the same S3 key, so a
+    run's model is the object version it recorded in `s3_model_version`.
+    """
+
+    exact_versions = True
+
+    def __init__(self, experiment=MLFLOW_EXPERIMENT):
+        self.experiment = experiment
+
+    def _runs(self, filter_string: str):
+        import mlflow
+
+        return mlflow.search_runs(
+            experiment_names=[self.experiment],
+            filter_string=filter_string,
+            order_by=["attributes.start_time DESC"],
+            max_results=1,
+            output_format="list",
+        )
+
+    def latest_version(self) -> str:
+        # Runs from before s3_model_version was recorded cannot be loaded
+        runs = self._runs(
+            "tags.s3_model_path LIKE 's3://%' AND tags.s3_model_version LIKE '%'"
+        )
+        if not runs:
+            raise LookupError(f"No runs with s3_model_version in {self.experiment}")
+        return runs[0].info.run_id
+
+    def _object(self, version: str):
+        import mlflow
+
+        tags = mlflow.get_run(version).data.tags
+        if "s3_model_version" not in tags:
+            raise LookupError(f"Run {version} did not record its S3 model version")
+        bucket, key = tags["s3_model_path"][len("s3://") :].split("/", 1)
+        return S3ModelSource(bucket, key), tags["s3_model_version"]
+
+    def load(self, version: str, pinned: bool = False):
+        source, object_version = self._object(version)
+        return source.load(object_version)
+
+    def load_preprocessor(self, version: str):
+        source, object_version = self._object(version)
+        return source.load_preprocessor(object_version)
+
+    def load_reference_profile(self, version: str):
+        source, object_version = self._object(version)
+        return source.load_reference_profile(object_version)
+
+
+class LocalModelSource:
+    """Versions are a content hash of a local pickle; sidecars sit beside it."""
+
+    # Only the file as it is now can be loaded, whatever version is asked for
+    exact_versions = False
+
+    def __init__(self, path=MODEL_PATH):
+        self.path = path
+
+    def latest_version(self) -> str:
+        digest = hashlib.sha256()
+        with open(self.path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()[:12]
+
+    def load(self, version: str, pinned: bool = False):
+        if INFERENCE_ENGINE == "compact":
+            return load_model_file(self.path + COMPACT_MODEL_SUFFIX)
+        return load_model_file(self.path)
+
+    def load_preprocessor(self, version: str):
+        path = self.path + PREPROCESSOR_SUFFIX
+        return FeaturePreprocessor.load(path) if os.path.exists(path) else None
+
+    def load_reference_profile(self, version: str):
+        path = self.path + DRIFT_PROFILE_SUFFIX
+        return ReferenceProfile.load(path) if os.path.exists(path) else None
+
+
+MODEL_SOURCES = {
+    "s3": S3ModelSource,
+    "mlflow": MlflowModelSource,
+    "local": LocalModelSource,
+}
+
+
+def warm_up(model, preprocessor=None):
+    """
+    Run one synthetic row through feature building and the model so first
+    requests pay no setup (lazy imports, encoder tables, sklearn dispatch).
+    """
+    names = feature_names(model)
+    if names is None:
+        X = np.zeros((1, getattr(model, "n_features_in_", 1)))
+    else:
+        X, _ = build_feature_matrix(
+            {"records": [dict.fromkeys(names, 0.0)]}, names, preprocessor
+        )
+    # Zero is an unknown category, which encodes as NaN
+    predict(model, np.nan_to_num(X))
+
+
+class ModelManager:
+    def __init__(
+        self,
+        source=None,
+        poll_interval: float = MODEL_POLL_INTERVAL,
+        pinned_version=MODEL_VERSION_PIN,
+    ):
+        if source is None:
+            source = MODEL_SOURCES.get(MODEL_SOURCE, S3ModelSource)()
+        self.source = source
+        self.poll_interval = poll_interval
+        self.pinned_version = pinned_version
+        self.current = None
+        self._task = None
+
+    @property
+    def version(self):
+        return self.current.version if self.current is not None else None
+
+    def swap(
+        self, model, version: str, preprocessor=None, reference_profile=None
+    ) -> ModelHandle:
+        """Atomically make `model` the served model."""
+        handle = ModelHandle(model, version, preprocessor, reference_profile)
+        self.current = handle
+        return handle
+
+    def _load_and_warm(self, version: str) -> ModelHandle:
+        return self.load_version(version, pinned=self.pinned_version is not None)
+
+    def load_version(self, version: str, pinned: bool = True) -> ModelHandle:
+        """
+        Load and warm `version` from the source without serving it (the
+        registry keeps canary and shadow versions this way). `pinned` asks
+        the source for that exact version rather than the latest one;
+        sources that cannot address versions refuse it with LookupError.
+        """
+        if pinned and not getattr(self.source, "exact_versions", False):
+            raise LookupError(
+                f"{type(self.source).__name__} cannot load a specific version "
+                f"({version}); canary, shadow and pinned versions need S3 or MLflow"
+            )
+        start = time.perf_counter()
+        model = self.source.load(version, pinned=pinned)
+        # Sources without a saved encoder serve with the legacy mapping, and
+        # without a reference profile drift monitoring stays off
+        preprocessor = self._load_sidecar("load_preprocessor", version)
+        reference_profile = self._load_sidecar("load_reference_profile", version)
+        warm_up(model, preprocessor)
+        logger.info(
+            "Model %s loaded and warmed in %.2fs", version, time.perf_counter() - start
+        )
+        return ModelHandle(model, version, preprocessor, reference_profile)
+
+    def _load_sidecar(self, method: str, version: str):
+        loader = getattr(self.source, method, None)
+        return loader(version) if loader is not None else None
+
+    def load_initial(self) -> ModelHandle:
+        if CI_MODE:
+            model = load_model()
+            warm_up(model)
+            return self.swap(model, "ci-dummy")
+        version = self.pinned_version or self.source.latest_version()
+        try:
+            self.current = self._load_and_warm(version)
+        except LookupError as e:
+            if self.pinned_version is None:
+                raise
+            raise LookupError(
+                f"MODEL_VERSION_PIN={self.pinned_version} cannot be loaded: {e}"
+            ) from e
+        return self.current
+
+    async def refresh(self) -> bool:
+        """Check the source once; load and swap in a new version if there is one."""
+        version = await asyncio.to_thread(self.source.latest_version)
+        if version == self.version:
+            return False
+        handle = await asyncio.to_thread(self._load_and_warm, version)
+        previous, self.current = self.version, handle
+        logger.info("🔁 Swapped model %s -> %s", previous, version)
+        return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                # Keep serving the current version; try again next interval
+                logger.exception("Model refresh failed")
+
+    def start_watching(self):
+        if CI_MODE or self.pinned_version or self.poll_interval <= 0:
+            logger.info("Model hot reload disabled (version %s)", self.version)
+            return
+        self._task = asyncio.get_running_loop().create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,339 @@
+# src/model_registry.py
+"""
+Several model versions resident in one API process, for canary and shadow
+deploys without a second fleet.
+
+The primary version is the one ModelManager hot-reloads. Other versions are
+loaded by id from the same source (S3 VersionId, MLflow run id). At most
+MODEL_MAX_RESIDENT versions, the primary included, are held in memory:
+loading one more evicts the oldest version that carries no canary or
+shadow traffic, and fails if there is none.
+
+Routing: a request sending `X-Model-Version: <resident version>` is served
+by that version; otherwise a version is drawn by weight (each canary gets
+its weight, the primary the rest). The routing table is an immutable tuple
+swapped in one assignment, so request handlers read it without locking.
+
+Shadow: a sample of scored requests is also queued for the shadow version
+once their own predictions are computed. Jobs hold the decoded request
+payload, not the served model's matrix: the shadow version may expect other
+features or encodings, so its own schema and preprocessor build its input.
+One background thread, running at a lower OS priority (MODEL_SHADOW_NICE,
+Linux), takes everything queued so far and scores it with a single stacked
+predict call, the way the API micro-batches /predict, and exports the
+served/shadow difference per version. When more than MODEL_SHADOW_MAX_PENDING
+jobs are waiting, new ones are dropped (and counted) instead of queued.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+from src.inference import predict
+
+logger = logging.getLogger(__name__)
+
+MODEL_MAX_RESIDENT = int(os.getenv("MODEL_MAX_RESIDENT", "3"))
+# Loaded at startup and given MODEL_CANARY_WEIGHT of the traffic
+MODEL_CANARY_VERSION = os.getenv("MODEL_CANARY_VERSION") or None
+MODEL_CANARY_WEIGHT = float(os.getenv("MODEL_CANARY_WEIGHT", "0.1"))
+# Loaded at startup and shadow-scores MODEL_SHADOW_SAMPLE of the requests
+MODEL_SHADOW_VERSION = os.getenv("MODEL_SHADOW_VERSION") or None
+MODEL_SHADOW_SAMPLE = float(os.getenv("MODEL_SHADOW_SAMPLE", "0.1"))
+# Added to the shadow thread's nice value so serving threads get the CPU first
+MODEL_SHADOW_NICE = int(os.getenv("MODEL_SHADOW_NICE", "10"))
+MODEL_SHADOW_MAX_PENDING = int(os.getenv("MODEL_SHADOW_MAX_PENDING", "64"))
+
+MODEL_REQUESTS = Counter(
+    "model_requests_total",
+    "Scored requests by model version and how the version was chosen",
+    ["model_version", "route"],
+)
+MODEL_PREDICT_SECONDS = Histogram(
+    "model_predict_seconds",
+    "model.predict latency by model version (served and shadow)",
+    ["model_version"],
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+SHADOW_DELTA = Histogram(
+    "shadow_prediction_delta_ratio",
+    "Mean |shadow - served| / |served| per shadow-scored request",
+    ["model_version"],
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+SHADOW_DROPPED = Counter(
+    "shadow_requests_dropped_total",
+    "Shadow jobs skipped because the shadow queue was full",
+)
+SHADOW_FAILED = Counter(
+    "shadow_requests_failed_total",
+    "Shadow jobs whose features or predictions could not be computed",
+    ["model_version"],
+)
+MODELS_RESIDENT = Gauge("models_resident", "Model versions held in memory")
+
+
+def timed_predict(handle, X: np.ndarray) -> np.ndarray:
+    """predict() on `handle.model`, observed under its version."""
+    start = time.perf_counter()
+    preds = predict(handle.model, X)
+    MODEL_PREDICT_SECONDS.labels(handle.version).observe(time.perf_counter() - start)
+    return preds
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        manager,
+        max_resident: int = MODEL_MAX_RESIDENT,
+        shadow_max_pending: int = MODEL_SHADOW_MAX_PENDING,
+    ):
+        self.manager = manager
+        self.max_resident = max(1, max_resident)
+        self._lock = threading.Lock()
+        # Non-primary handles, oldest first
+        self._resident = OrderedDict()
+        # (canary versions, cumulative weights)
+        self._routes = ((), ())
+        self.shadow_version = None
+        self.shadow_sample = 0.0
+        self.shadow_max_pending = max(1, shadow_max_pending)
+        self._shadow_jobs = deque()
+        self._shadow_cond = threading.Condition()
+        self._shadow_busy = False
+        self._shadow_thread = None
+        self._closed = False
+        # Read at scrape time: the primary can be swapped for a version that
+        # is already resident, and it counts once
+        MODELS_RESIDENT.set_function(lambda: len(self.versions()))
+
+    # -- resident versions -------------------------------------------------
+
+    @property
+    def primary(self):
+        return self.manager.current
+
+    def get(self, version: str):
+        primary = self.primary
+        if primary is not None and primary.version == version:
+            return primary
+        return self._resident.get(version)
+
+    def versions(self) -> list:
+        primary = self.primary
+        head = [primary.version] if primary is not None else []
+        return head + [v for v in self._resident if not head or v != head[0]]
+
+    def _in_use(self) -> set:
+        canaries, _ = self._routes
+        return set(canaries) | ({self.shadow_version} - {None})
+
+    def load(self, version: str):
+        """Load `version` from the model source and keep it resident."""
+        existing = self.get(version)
+        if existing is not None:
+            return existing
+        handle = self.manager.load_version(version, pinned=True)
+        with self._lock:
+            in_use = self._in_use()
+            while len(self._resident) + 2 > self.max_resident:
+                victim = next((v for v in self._resident if v not in in_use), None)
+                if victim is None:
+                    raise ValueError(
+                        f"{self.max_resident} versions resident and all in use; "
+                        "route traffic away from one first"
+                    )
+                logger.info("Evicting resident model %s", victim)
+                del self._resident[victim]
+            self._resident[version] = handle
+        logger.info("Model %s resident alongside %s", version, self.versions()[0])
+        return handle
+
+    def unload(self, version: str) -> None:
+        with self._lock:
+            if version in self._in_use():
+                raise ValueError(f"Model {version} still receives traffic")
+            if self._resident.pop(version, None) is None:
+                raise KeyError(version)
+
+    # -- routing -----------------------------------------------------------
+
+    def set_routing(self, weights: dict | None = None, shadow=None, shadow_sample=None):
+        """
+        `weights` maps resident non-primary versions to traffic shares (the
+        primary gets 1 - their sum); `shadow` names the shadow version.
+        """
+        weights = {v: float(w) for v, w in (weights or {}).items()}
+        if any(w < 0 for w in weights.values()) or sum(weights.values()) > 1.0:
+            raise ValueError("Canary weights must be >= 0 and sum to at most 1")
+        weights = {v: w for v, w in weights.items() if w > 0}
+        for version in list(weights) + ([shadow] if shadow else []):
+            if self.get(version) is None:
+                raise KeyError(f"Model {version} is not resident")
+        if shadow_sample is not None and not 0.0 <= shadow_sample <= 1.0:
+            raise ValueError("shadow_sample must be between 0 and 1")
+        cumulative, running = [], 0.0
+        for w in weights.values():
+            running += w
+            cumulative.append(running)
+        with self._lock:
+            self._routes = (tuple(weights), tuple(cumulative))
+            self.shadow_version = shadow or None
+            if shadow_sample is not None:
+                self.shadow_sample = shadow_sample
+        logger.info(
+            "Routing: canaries %s, shadow %s at %.0f%%",
+            weights,
+            self.shadow_version,
+            self.shadow_sample * 100,
+        )
+
+    def route(self, requested: str | None = None):
+        """(handle, route label) for one request."""
+        primary = self.primary
+        if primary is None:
+            raise RuntimeError("Model not loaded")
+        if requested:
+            handle = self.get(requested)
+            if handle is None:
+                raise LookupError(f"Model version {requested} is not resident")
+            choice = (handle, "header")
+        else:
+            choice = (primary, "primary")
+            canaries, cumulative = self._routes
+            if canaries:
+                draw = random.random()
+                for version, bound in zip(canaries, cumulative):
+                    if draw < bound:
+                        handle = self._resident.get(version)
+                        if handle is not None:
+                            choice = (handle, "canary")
+                        break
+        MODEL_REQUESTS.labels(choice[0].version, choice[1]).inc()
+        return choice
+
+    # -- shadow ------------------------------------------------------------
+
+    def shadow(self, served, payload: dict, preds) -> bool:
+        """
+        Maybe queue a batch `payload` ({"records": ...} or {"columns": ...})
+        for the shadow version, to be compared with `preds` from `served`.
+        Never blocks; returns whether it was queued.
+        """
+        version = self.shadow_version
+        if version is None or version == served.version:
+            return False
+        if random.random() >= self.shadow_sample:
+            return False
+        handle = self.get(version)
+        if handle is None:
+            return False
+        with self._shadow_cond:
+            if self._closed:
+                return False
+            if len(self._shadow_jobs) >= self.shadow_max_pending:
+                SHADOW_DROPPED.inc()
+                return False
+            self._shadow_jobs.append((handle, payload, preds))
+            if self._shadow_thread is None:
+                self._shadow_thread = threading.Thread(
+                    target=self._shadow_worker, name="shadow", daemon=True
+                )
+                self._shadow_thread.start()
+            self._shadow_cond.notify()
+        return True
+
+    def _shadow_worker(self):
+        try:
+            native_id = threading.get_native_id()
+            os.setpriority(
+                os.PRIO_PROCESS,
+                native_id,
+                os.getpriority(os.PRIO_PROCESS, native_id) + MODEL_SHADOW_NICE,
+            )
+        except (AttributeError, OSError):  # not Linux, or not permitted
+            pass
+        while True:
+            with self._shadow_cond:
+                self._shadow_cond.wait_for(lambda: self._shadow_jobs or self._closed)
+                if self._closed:
+                    return
+                jobs = list(self._shadow_jobs)
+                self._shadow_jobs.clear()
+                self._shadow_busy = True
+            try:
+                self._score_shadow(jobs)
+            finally:
+                with self._shadow_cond:
+                    self._shadow_busy = False
+                    self._shadow_cond.notify_all()
+
+    def _score_shadow(self, jobs: list):
+        groups = defaultdict(list)
+        for handle, payload, served in jobs:
+            try:
+                X = handle.matrix(payload)
+            except Exception:
+                logger.exception("Shadow features for %s failed", handle.version)
+                SHADOW_FAILED.labels(handle.version).inc()
+                continue
+            groups[(id(handle), X.shape[1])].append((handle, X, served))
+        for group in groups.values():
+            handle = group[0][0]
+            try:
+                shadow_preds = timed_predict(handle, np.vstack([j[1] for j in group]))
+            except Exception:
+                logger.exception("Shadow scoring with %s failed", handle.version)
+                SHADOW_FAILED.labels(handle.version).inc(len(group))
+                continue
+            bounds = np.cumsum([len(j[1]) for j in group])[:-1]
+            for (_, _, served), ours in zip(group, np.split(shadow_preds, bounds)):
+                served = np.asarray(served, dtype=np.float64)
+                delta = np.abs(ours - served) / np.maximum(np.abs(served), 1e-12)
+                SHADOW_DELTA.labels(handle.version).observe(float(delta.mean()))
+
+    def wait_for_shadow(self, timeout: float | None = None) -> bool:
+        """Block until queued shadow jobs are scored; False on timeout."""
+        with self._shadow_cond:
+            return self._shadow_cond.wait_for(
+                lambda: not self._shadow_jobs and not self._shadow_busy, timeout
+            )
+
+    def status(self) -> dict:
+        canaries, cumulative = self._routes
+        shares = np.diff((0.0,) + cumulative).tolist() if canaries else []
+        weights = dict(zip(canaries, shares))
+        primary = self.primary
+        if primary is not None:
+            weights[primary.version] = max(0.0, 1.0 - sum(shares))
+        return {
+            "resident": self.versions(),
+            "max_resident": self.max_resident,
+            "weights": weights,
+            "shadow": self.shadow_version,
+            "shadow_sample": self.shadow_sample,
+        }
+
+    def load_configured(self):
+        """Load and route MODEL_CANARY_VERSION / MODEL_SHADOW_VERSION, if set."""
+        weights = {}
+        if MODEL_CANARY_VERSION:
+            self.load(MODEL_CANARY_VERSION)
+            weights[MODEL_CANARY_VERSION] = MODEL_CANARY_WEIGHT
+        if MODEL_SHADOW_VERSION:
+            self.load(MODEL_SHADOW_VERSION)
+        if weights or MODEL_SHADOW_VERSION:
+            self.set_routing(weights, MODEL_SHADOW_VERSION, MODEL_SHADOW_SAMPLE)
+
+    def shutdown(self):
+        """Stop the shadow thread; queued shadow jobs are discarded."""
+        with self._shadow_cond:
+            self._closed = True
+            self._shadow_jobs.clear()
+            self._shadow_cond.notify_all()
@@ -0,0 +1,76 @@
+# src/peak_memory.py
+"""
+Peak resident memory of the training process, per stage.
+
+On Linux each stage resets the kernel's high-water mark (writing 5 to
+/proc/self/clear_refs) and reads VmHWM back when it ends, so every stage
+reports its own peak. Where the reset is not available the process-lifetime
+peak from getrusage is reported for each stage instead.
+"""
+
+import logging
+import resource
+import sys
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def _reset_peak() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _status_mb(field: str):
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> float:
+    """High-water RSS in MB since the last reset (or process start)."""
+    peak = _status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return maxrss / 1024 / 1024 if sys.platform == "darwin" else maxrss / 1024
+
+
+def rss_mb() -> float:
+    """Current RSS in MB (0 where /proc is unavailable)."""
+    return _status_mb("VmRSS") or 0.0
+
+
+class PeakMemory:
+    """Records the peak RSS of named stages, e.g. `with memory.stage("fit"):`."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        _reset_peak()
+        try:
+            yield
+        finally:
+            self.stages[name] = peak_rss_mb()
+            logger.info(
+                "%s: peak RSS %.0f MB, now %.0f MB", name, self.stages[name], rss_mb()
+            )
+
+    def metrics(self) -> dict:
+        """`peak_rss_mb_<stage>` for each stage plus the overall `peak_rss_mb`."""
+        out = {f"peak_rss_mb_{name}": mb for name, mb in self.stages.items()}
+        if self.stages:
+            out["peak_rss_mb"] = max(self.stages.values())
+        return out
@@ -0,0 +1,222 @@
+# src/prediction_cache.py
+"""
+In-process LRU/TTL cache of predictions.
+
+Keys are a hash of the model version plus the mapped feature vector (float64
+in the model's feature order), so the same listing re-priced across page
+views skips the forest, and a model reload invalidates everything without an
+explicit flush: new-version keys simply never match old entries, which then
+age out. An optional shared backend (Redis) sits behind the local cache so
+several workers can reuse each other's results. Its calls block on the
+network, so async handlers use `aget`/`aset`, which run them in a worker
+thread instead of on the event loop.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+# Max entries held in-process; 0 disables the cache
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "100000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "600"))
+# "memory" (local only) or "redis" (local + shared, needs REDIS_URL)
+PREDICTION_CACHE_BACKEND = os.getenv("PREDICTION_CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+CACHE_HITS = Counter(
+    "prediction_cache_hits_total", "Predictions served from cache", ["tier"]
+)
+CACHE_MISSES = Counter("prediction_cache_misses_total", "Prediction cache misses")
+CACHE_EVICTIONS = Counter(
+    "prediction_cache_evictions_total",
+    "Entries dropped from the local cache",
+    ["reason"],
+)
+
+
+def cache_key(version: str, row: np.ndarray) -> bytes:
+    """Canonical key for one mapped feature row under one model version."""
+    row = np.asarray(row, dtype=np.float64) + 0.0  # folds -0.0 into 0.0
+    row[np.isnan(row)] = np.nan  # one NaN bit pattern
+    digest = hashlib.blake2b(version.encode(), digest_size=16)
+    digest.update(row.tobytes())
+    return digest.digest()
+
+
+class InMemoryBackend:
+    """Process-local stand-in for the shared backend, used in tests."""
+
+    def __init__(self):
+        self._data = {}
+
+    def get_many(self, keys: list) -> list:
+        now = time.monotonic()
+        out = []
+        for key in keys:
+            value, expires = self._data.get(key, (None, 0.0))
+            out.append(value if expires > now else None)
+        return out
+
+    def set_many(self, items: dict, ttl: float):
+        expires = time.monotonic() + ttl
+        for key, value in items.items():
+            self._data[key] = (value, expires)
+
+
+class RedisBackend:
+    """Shared cache tier; values are stored as float strings with a TTL."""
+
+    def __init__(self, url: str = REDIS_URL, prefix: bytes = b"pred:"):
+        import redis  # optional dependency, only needed for this backend
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get_many(self, keys: list) -> list:
+        values = self.client.mget([self.prefix + k for k in keys])
+        return [None if v is None else float(v) for v in values]
+
+    def set_many(self, items: dict, ttl: float):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(self.prefix + key, repr(value), ex=max(1, int(ttl)))
+        pipe.execute()
+
+
+class PredictionCache:
+    def __init__(
+        self,
+        max_entries: int = PREDICTION_CACHE_SIZE,
+        ttl: float = PREDICTION_CACHE_TTL,
+        backend=None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()  # key -> (prediction, expires_at)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "PredictionCache":
+        backend = None
+        if PREDICTION_CACHE_BACKEND == "redis":
+            try:
+                backend = RedisBackend()
+            except ImportError:
+                logger.warning("redis is not installed; using local cache only")
+        return cls(backend=backend)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys: list) -> list:
+        """Cached predictions for `keys`, with None for every miss."""
+        if not self.enabled:
+            return [None] * len(keys)
+        out = self._get_local(keys)
+        if self.backend is not None and None in out:
+            out = self._get_shared(keys, out)
+        return self._count_misses(out)
+
+    async def aget(self, key: bytes):
+        """get() for async handlers; the shared tier is queried off the loop."""
+        if not self.enabled:
+            return None
+        out = self._get_local([key])
+        if self.backend is not None and out[0] is None:
+            out = await asyncio.to_thread(self._get_shared, [key], out)
+        return self._count_misses(out)[0]
+
+    def _get_local(self, keys: list) -> list:
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+                    CACHE_EVICTIONS.labels(reason="ttl").inc()
+                    entry = None
+                if entry is None:
+                    out.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    out.append(entry[0])
+        local_hits = sum(v is not None for v in out)
+        if local_hits:
+            CACHE_HITS.labels(tier="local").inc(local_hits)
+        return out
+
+    def _get_shared(self, keys: list, out: list) -> list:
+        # Fills the local misses in `out` from the shared backend
+        missing = [i for i, v in enumerate(out) if v is None]
+        try:
+            shared = self.backend.get_many([keys[i] for i in missing])
+        except Exception:
+            logger.exception("Shared prediction cache lookup failed")
+            shared = [None] * len(missing)
+        found = {keys[i]: v for i, v in zip(missing, shared) if v is not None}
+        if found:
+            CACHE_HITS.labels(tier="shared").inc(len(found))
+            self._store(found)
+            out = [found.get(k, v) if v is None else v for k, v in zip(keys, out)]
+        return out
+
+    def _count_misses(self, out: list) -> list:
+        misses = sum(v is None for v in out)
+        if misses:
+            CACHE_MISSES.inc(misses)
+        return out
+
+    def get(self, key: bytes):
+        return self.get_many([key])[0]
+
+    def _store(self, items: dict):
+        expires = time.monotonic() + self.ttl
+        evicted = 0
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            CACHE_EVICTIONS.labels(reason="size").inc(evicted)
+
+    def set_many(self, items: dict):
+        if not self.enabled or not items:
+            return
+        self._store(items)
+        if self.backend is not None:
+            self._set_shared(items)
+
+    def _set_shared(self, items: dict):
+        try:
+            self.backend.set_many(items, self.ttl)
+        except Exception:
+            logger.exception("Shared prediction cache write failed")
+
+    def set(self, key: bytes, value: float):
+        self.set_many({key: value})
+
+    async def aset(self, key: bytes, value: float):
+        """set() for async handlers; the shared tier is written off the loop."""
+        if not self.enabled:
+            return
+        self._store({key: value})
+        if self.backend is not None:
+            await asyncio.to_thread(self._set_shared, {key: value})
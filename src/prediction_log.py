@@ -0,0 +1,319 @@
+# src/prediction_log.py
+"""
+Capture of served predictions (request body + predictions) for drift
+analysis and as replay data for benchmarks.
+
+Request handlers only append a reference to the raw body and the predictions
+to a bounded in-memory buffer; nothing is serialized or written on the
+request path. A background thread drains the buffer every
+PREDICTION_LOG_FLUSH_SECONDS and appends the records to the current file,
+which is rotated once it grows past PREDICTION_LOG_ROTATE_MB or gets older
+than PREDICTION_LOG_ROTATE_SECONDS. When the buffer is full, new records are
+dropped and counted instead of blocking the request; size the buffer for
+about (requests/s × flush interval).
+
+Files are written as `<name>.tmp` and renamed when rotated or closed, so
+readers only ever see complete files:
+
+    predictions-<UTC time>-<pid>-<seq>.jsonl    one JSON object per line
+    predictions-<UTC time>-<pid>-<seq>.parquet  one row group per flush
+
+Each record has `ts` (unix seconds), `endpoint`, `model_version`,
+`predictions` (a list, also for /predict) and `input`, the request body as
+sent (a JSON object; a string column in Parquet). `read_records` reads
+either format back; `benchmarks/replay.py` sends them to a running API.
+"""
+
+import glob
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from prometheus_client import Counter
+
+from src import codec
+
+logger = logging.getLogger(__name__)
+
+# Directory for the log files; unset disables prediction logging
+PREDICTION_LOG_DIR = os.getenv("PREDICTION_LOG_DIR") or None
+# "jsonl" or "parquet"
+PREDICTION_LOG_FORMAT = os.getenv("PREDICTION_LOG_FORMAT", "jsonl")
+# Share of served requests that are logged
+PREDICTION_LOG_SAMPLE = float(os.getenv("PREDICTION_LOG_SAMPLE", "1.0"))
+# Records buffered between flushes; more are dropped
+PREDICTION_LOG_BUFFER = int(os.getenv("PREDICTION_LOG_BUFFER", "10000"))
+PREDICTION_LOG_FLUSH_SECONDS = float(os.getenv("PREDICTION_LOG_FLUSH_SECONDS", "1.0"))
+PREDICTION_LOG_ROTATE_MB = float(os.getenv("PREDICTION_LOG_ROTATE_MB", "64"))
+PREDICTION_LOG_ROTATE_SECONDS = float(os.getenv("PREDICTION_LOG_ROTATE_SECONDS", "300"))
+
+FORMATS = ("jsonl", "parquet")
+
+LOG_RECORDS = Counter(
+    "prediction_log_records_total", "Served requests written to the prediction log"
+)
+LOG_DROPPED = Counter(
+    "prediction_log_dropped_total",
+    "Prediction log records lost",
+    ["reason"],
+)
+
+
+def _body(raw: bytes) -> bytes:
+    # JSON Lines needs one line per record; re-encode pretty-printed bodies
+    return codec.dumps(codec.loads(raw)) if b"\n" in raw or b"\r" in raw else raw
+
+
+def _predictions(output) -> list:
+    return np.atleast_1d(np.asarray(output, dtype=np.float64)).tolist()
+
+
+class _JsonlFile:
+    def __init__(self, path: str):
+        self._fh = open(path, "ab")  # noqa: SIM115 - closed by close()
+
+    def write(self, records: list) -> int:
+        lines = []
+        for ts, endpoint, version, body, output in records:
+            head = codec.dumps(
+                {
+                    "ts": ts,
+                    "endpoint": endpoint,
+                    "model_version": version,
+                    "predictions": _predictions(output),
+                }
+            )
+            lines.append(head[:-1] + b',"input":' + _body(body) + b"}\n")
+        data = b"".join(lines)
+        self._fh.write(data)
+        self._fh.flush()
+        return len(data)
+
+    def close(self):
+        self._fh.close()
+
+
+class _ParquetFile:
+    def __init__(self, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = pa.schema(
+            [
+                ("ts", pa.float64()),
+                ("endpoint", pa.string()),
+                ("model_version", pa.string()),
+                ("predictions", pa.list_(pa.float64())),
+                ("input", pa.string()),
+            ]
+        )
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, records: list) -> int:
+        ts, endpoints, versions, bodies, outputs = zip(*records)
+        inputs = [_body(b).decode() for b in bodies]
+        table = self._pa.table(
+            [
+                list(ts),
+                list(endpoints),
+                list(versions),
+                [_predictions(o) for o in outputs],
+                inputs,
+            ],
+            schema=self.schema,
+        )
+        self._writer.write_table(table)
+        # Compressed size is only known on close; the raw size bounds it
+        return table.nbytes
+
+    def close(self):
+        self._writer.close()
+
+
+class PredictionLog:
+    """Bounded buffer of served predictions drained by a writer thread."""
+
+    def __init__(
+        self,
+        directory: str | None = None,
+        fmt: str = PREDICTION_LOG_FORMAT,
+        sample: float = PREDICTION_LOG_SAMPLE,
+        capacity: int = PREDICTION_LOG_BUFFER,
+        flush_interval: float = PREDICTION_LOG_FLUSH_SECONDS,
+        rotate_mb: float = PREDICTION_LOG_ROTATE_MB,
+        rotate_seconds: float = PREDICTION_LOG_ROTATE_SECONDS,
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Prediction log format must be one of {FORMATS}")
+        self.directory = directory
+        self.fmt = fmt
+        self.sample = sample
+        self.capacity = max(1, capacity)
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_mb * 1024 * 1024
+        self.rotate_seconds = rotate_seconds
+        self._lock = threading.Lock()
+        self._buffer = deque()
+        self._enqueued = 0
+        self._written = 0
+        self._done = threading.Condition()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._pid = None
+        self._file = None
+        self._seq = 0
+
+    @classmethod
+    def from_env(cls) -> "PredictionLog":
+        return cls(PREDICTION_LOG_DIR)
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None and self.sample > 0
+
+    def record(self, endpoint: str, model_version: str, body: bytes, output) -> bool:
+        """
+        Queue one served request; never blocks on I/O. `body` is the raw
+        JSON request body, `output` a prediction or array of predictions.
+        Returns whether the record was kept.
+        """
+        if not self.enabled:
+            return False
+        if self.sample < 1.0 and random.random() >= self.sample:
+            return False
+        with self._lock:
+            if self._closed:
+                return False
+            if len(self._buffer) >= self.capacity:
+                LOG_DROPPED.labels("buffer_full").inc()
+                return False
+            self._buffer.append((time.time(), endpoint, model_version, body, output))
+            self._enqueued += 1
+            if self._pid != os.getpid():
+                # Started lazily, and again in each forked worker
+                self._pid = os.getpid()
+                self._file = None
+                self._thread = threading.Thread(
+                    target=self._run, name="prediction-log", daemon=True
+                )
+                self._thread.start()
+        return True
+
+    # -- writer ------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._lock:
+                records, self._buffer = list(self._buffer), deque()
+                closed = self._closed
+            if records:
+                self._write(records)
+            if self._file is not None and (closed or self._file_due_for_rotation()):
+                self._close_file()
+            with self._done:
+                self._written += len(records)
+                self._done.notify_all()
+            if closed:
+                return
+
+    def _write(self, records: list):
+        try:
+            if self._file is None:
+                self._open_file()
+            self._file_bytes += self._file.write(records)
+            LOG_RECORDS.inc(len(records))
+        except Exception:
+            logger.exception("Writing %d prediction records failed", len(records))
+            LOG_DROPPED.labels("write_error").inc(len(records))
+            if self._file is not None:
+                self._close_file()
+
+    def _open_file(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._seq += 1
+        stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        name = f"predictions-{stamp}-{os.getpid()}-{self._seq:04d}.{self.fmt}"
+        self._path = os.path.join(self.directory, name)
+        writer = _ParquetFile if self.fmt == "parquet" else _JsonlFile
+        self._file = writer(self._path + ".tmp")
+        self._file_bytes = 0
+        self._file_opened = time.monotonic()
+
+    def _file_due_for_rotation(self) -> bool:
+        return (
+            self._file_bytes >= self.rotate_bytes
+            or time.monotonic() - self._file_opened >= self.rotate_seconds
+        )
+
+    def _close_file(self):
+        try:
+            self._file.close()
+            os.replace(self._path + ".tmp", self._path)
+            logger.info("Prediction log rotated: %s", self._path)
+        except Exception:
+            logger.exception("Closing prediction log %s failed", self._path)
+        self._file = None
+
+    # -- flushing ----------------------------------------------------------
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until everything queued so far is written; False on timeout."""
+        with self._lock:
+            target = self._enqueued
+            thread = self._thread
+        if thread is None:
+            return True
+        self._wake.set()
+        with self._done:
+            return self._done.wait_for(
+                lambda: self._written >= target or not thread.is_alive(), timeout
+            )
+
+    def close(self, timeout: float = 10.0):
+        """Write what is buffered, finish the current file and stop the writer."""
+        with self._lock:
+            self._closed = True
+            thread = self._thread if self._pid == os.getpid() else None
+        if thread is not None:
+            self._wake.set()
+            thread.join(timeout)
+
+
+def log_files(paths) -> list:
+    """Complete log files under the given files/directories, oldest first."""
+    files = []
+    for path in [paths] if isinstance(paths, str) else paths:
+        if os.path.isdir(path):
+            files += [
+                f
+                for fmt in FORMATS
+                for f in glob.glob(os.path.join(path, f"predictions-*.{fmt}"))
+            ]
+        else:
+            files.append(path)
+    return sorted(files, key=os.path.basename)
+
+
+def read_records(paths):
+    """Yield logged records (dicts, `input` parsed) from JSONL/Parquet files."""
+    for path in log_files(paths):
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            for row in pq.read_table(path).to_pylist():
+                row["input"] = json.loads(row["input"])
+                yield row
+        else:
+            with open(path, "rb") as fh:
+                for line in fh:
+                    if line.strip():
+                        yield codec.loads(line)
@@ -0,0 +1,350 @@
+# src/s3_transfer.py
+"""
+Shared S3 transfer layer for datasets and model artifacts.
+
+- One boto3 client per process (clients are thread-safe but not fork-safe),
+  with a connection pool sized for the transfer threads.
+- Uploads go through boto3's managed transfer with a tuned TransferConfig
+  (multipart above S3_PART_SIZE_MB, S3_TRANSFER_THREADS parts in flight).
+  The file's sha256 is stored in the object metadata.
+- Downloads split the object into ranged GETs fetched in parallel and
+  written at their offsets, pinned to one object version with IfMatch.
+- `open_object` streams an object through a read-ahead of ranged GETs, so
+  pandas can parse a CSV while the next ranges are still downloading.
+- Downloads and streams verify the sha256 metadata when it is present, and
+  every transfer logs its size, time and MB/s.
+
+Only boto3 is needed; point S3_ENDPOINT_URL at minio (or moto) to test
+locally.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+S3_PART_SIZE_MB = int(os.getenv("S3_PART_SIZE_MB", "16"))
+S3_TRANSFER_THREADS = int(os.getenv("S3_TRANSFER_THREADS", "8"))
+# Ranged GETs kept in flight ahead of the reader in open_object
+S3_READ_AHEAD = int(os.getenv("S3_READ_AHEAD", "4"))
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+# Object metadata key holding the uploaded file's sha256
+CHECKSUM_METADATA_KEY = "sha256"
+
+_MB = 1024 * 1024
+_HASH_CHUNK = 8 * _MB
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+class TransferChecksumError(IOError):
+    """Downloaded bytes do not match the sha256 recorded at upload."""
+
+
+@dataclass
+class TransferStats:
+    bytes: int
+    seconds: float
+    parts: int = 1
+    sha256: str = None
+    # Of the uploaded object; None when it was replaced before we looked
+    etag: str = None
+    version_id: str = None
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes / _MB / self.seconds if self.seconds > 0 else float("inf")
+
+    @property
+    def version(self):
+        """Uploaded object's version as object_version() labels it."""
+        if self.etag is None:
+            return None
+        return object_version({"ETag": self.etag, "VersionId": self.version_id})
+
+
+def client():
+    """The process-wide S3 client; recreated after a fork."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            # Imported on first use so importers (the API) stay cheap to load
+            import boto3
+            from botocore.config import Config
+
+            _client = boto3.client(
+                "s3",
+                region_name=os.getenv("AWS_REGION"),
+                endpoint_url=S3_ENDPOINT_URL,
+                config=Config(
+                    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                    retries={"max_attempts": 5, "mode": "standard"},
+                ),
+            )
+            _client_pid = os.getpid()
+        return _client
+
+
+def reset_client():
+    """Forget the shared client, e.g. after changing credentials or in tests."""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def transfer_config(part_size_mb=None, threads=None):
+    from boto3.s3.transfer import TransferConfig
+
+    part_size = int((part_size_mb or S3_PART_SIZE_MB) * _MB)
+    threads = threads or S3_TRANSFER_THREADS
+    return TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=threads,
+        use_threads=threads > 1,
+    )
+
+
+def object_version(head: dict) -> str:
+    """VersionId from a head_object response, or the ETag if unversioned."""
+    version_id = head.get("VersionId")
+    if version_id and version_id != "null":
+        return version_id
+    return head["ETag"].strip('"')
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _log(action: str, url: str, stats: TransferStats):
+    logger.info(
+        "%s %s: %.1f MB in %.2f s (%.1f MB/s, %d parts)",
+        action,
+        url,
+        stats.bytes / _MB,
+        stats.seconds,
+        stats.mb_per_s,
+        stats.parts,
+    )
+
+
+def _ranges(size: int, part_size: int) -> list:
+    return [
+        (start, min(start + part_size, size) - 1) for start in range(0, size, part_size)
+    ]
+
+
+def upload_file(
+    local_path: str,
+    bucket: str,
+    key: str,
+    s3=None,
+    part_size_mb=None,
+    threads=None,
+    metadata: dict | None = None,
+) -> TransferStats:
+    """
+    Multipart upload of a local file, recording its sha256 (and `metadata`)
+    as object metadata. The returned stats carry the new object's ETag and
+    VersionId, read back and matched to the upload by that sha256.
+    """
+    s3 = s3 or client()
+    config = transfer_config(part_size_mb, threads)
+    start = time.perf_counter()
+    sha256 = file_sha256(local_path)
+    s3.upload_file(
+        local_path,
+        bucket,
+        key,
+        ExtraArgs={"Metadata": {**(metadata or {}), CHECKSUM_METADATA_KEY: sha256}},
+        Config=config,
+    )
+    size = os.path.getsize(local_path)
+    stats = TransferStats(
+        bytes=size,
+        seconds=time.perf_counter() - start,
+        parts=max(1, len(_ranges(size, config.multipart_chunksize))),
+        sha256=sha256,
+    )
+    # The managed transfer does not return the PUT response
+    head = s3.head_object(Bucket=bucket, Key=key)
+    if head.get("Metadata", {}).get(CHECKSUM_METADATA_KEY) == sha256:
+        stats.etag, stats.version_id = head["ETag"], head.get("VersionId")
+    else:
+        logger.warning("s3://%s/%s was replaced right after our upload", bucket, key)
+    _log("Uploaded", f"s3://{bucket}/{key}", stats)
+    return stats
+
+
+def download_file(
+    bucket: str,
+    key: str,
+    path: str,
+    s3=None,
+    head=None,
+    extra=None,
+    part_size_mb=None,
+    threads=None,
+    verify=True,
+) -> TransferStats:
+    """
+    Download s3://bucket/key to `path` with parallel ranged GETs. `head` is
+    the object's head_object response when the caller already has it, and
+    `extra` is passed to every GET (VersionId, IfMatch). Raises
+    TransferChecksumError when `verify` and the sha256 metadata disagree.
+    """
+    s3 = s3 or client()
+    extra = dict(extra or {})
+    start = time.perf_counter()
+    if head is None:
+        head = s3.head_object(Bucket=bucket, Key=key, **extra)
+    # Every range must come from the object version we just looked at
+    extra.setdefault("IfMatch", head["ETag"])
+    size = head["ContentLength"]
+    part_size = int((part_size_mb or S3_PART_SIZE_MB) * _MB)
+    ranges = _ranges(size, part_size)
+
+    with open(path, "wb") as fh:
+        fh.truncate(size)
+
+    def fetch(byte_range):
+        kwargs = dict(extra)
+        if len(ranges) > 1:
+            kwargs["Range"] = "bytes={}-{}".format(*byte_range)
+        body = s3.get_object(Bucket=bucket, Key=key, **kwargs)["Body"]
+        with open(path, "r+b") as fh:
+            fh.seek(byte_range[0])
+            fh.writelines(iter(lambda: body.read(_HASH_CHUNK), b""))
+
+    if len(ranges) <= 1:
+        fetch((0, size - 1))
+    else:
+        workers = min(threads or S3_TRANSFER_THREADS, len(ranges))
+        with ThreadPoolExecutor(workers, thread_name_prefix="s3-download") as pool:
+            list(pool.map(fetch, ranges))
+
+    sha256 = file_sha256(path)
+    expected = head.get("Metadata", {}).get(CHECKSUM_METADATA_KEY)
+    if verify and expected and expected != sha256:
+        raise TransferChecksumError(
+            f"sha256 of s3://{bucket}/{key} is {sha256}, expected {expected}"
+        )
+    stats = TransferStats(
+        bytes=size,
+        seconds=time.perf_counter() - start,
+        parts=max(1, len(ranges)),
+        sha256=sha256,
+    )
+    _log("Downloaded", f"s3://{bucket}/{key}", stats)
+    return stats
+
+
+class RangeReader(io.RawIOBase):
+    """
+    Sequential reader over an S3 object that keeps `read_ahead` ranged GETs
+    in flight. Checks the sha256 metadata once the last byte has been read.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        key: str,
+        s3=None,
+        part_size_mb=None,
+        read_ahead=None,
+        verify=True,
+    ):
+        super().__init__()
+        self.s3 = s3 or client()
+        self.bucket, self.key = bucket, key
+        head = self.s3.head_object(Bucket=bucket, Key=key)
+        self.size = head["ContentLength"]
+        self.etag = head["ETag"]
+        self.expected = head.get("Metadata", {}).get(CHECKSUM_METADATA_KEY)
+        self.verify = verify
+        self._digest = hashlib.sha256()
+        self._pending = deque(
+            _ranges(self.size, int((part_size_mb or S3_PART_SIZE_MB) * _MB))
+        )
+        self.parts = len(self._pending)
+        self._read_ahead = read_ahead or S3_READ_AHEAD
+        self._pool = ThreadPoolExecutor(self._read_ahead, thread_name_prefix="s3-read")
+        self._futures = deque()
+        self._buffer = memoryview(b"")
+        self._read = 0
+        self._start = time.perf_counter()
+        self._fill()
+
+    def _get(self, byte_range) -> bytes:
+        return self.s3.get_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Range="bytes={}-{}".format(*byte_range),
+            IfMatch=self.etag,
+        )["Body"].read()
+
+    def _fill(self):
+        while self._pending and len(self._futures) < self._read_ahead:
+            self._futures.append(self._pool.submit(self._get, self._pending.popleft()))
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if not self._buffer:
+            if not self._futures:
+                return 0
+            chunk = self._futures.popleft().result()
+            self._fill()
+            self._digest.update(chunk)
+            self._read += len(chunk)
+            self._buffer = memoryview(chunk)
+            if not self._futures:
+                self._finish()
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def _finish(self):
+        sha256 = self._digest.hexdigest()
+        if self.verify and self.expected and self.expected != sha256:
+            raise TransferChecksumError(
+                f"sha256 of s3://{self.bucket}/{self.key} is {sha256}, "
+                f"expected {self.expected}"
+            )
+        stats = TransferStats(
+            bytes=self._read,
+            seconds=time.perf_counter() - self._start,
+            parts=self.parts,
+        )
+        _log("Streamed", f"s3://{self.bucket}/{self.key}", stats)
+
+    def close(self):
+        # Ranges not started are cancelled; GETs already running are waited
+        # for, so no worker thread outlives the reader or its client
+        if not self.closed:
+            self._pending.clear()
+            self._futures.clear()
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        super().close()
+
+
+def open_object(bucket: str, key: str, s3=None, **kwargs) -> io.BufferedReader:
+    """Buffered binary stream over s3://bucket/key (see RangeReader)."""
+    return io.BufferedReader(RangeReader(bucket, key, s3=s3, **kwargs), _MB)
@@ -0,0 +1,201 @@
+# src/telemetry.py
+"""
+Per-stage latency instrumentation for the prediction path.
+
+`stage("features")` times a block into predict_stage_seconds{endpoint,stage};
+the endpoint label comes from a context variable set by `track_request`,
+which also maintains the predict_in_flight gauge. The context variable
+follows the request into FastAPI's threadpool and the micro-batch worker,
+so stages inside src/inference.py are attributed without passing anything
+down. Label children are cached, so a timed stage costs two perf_counter
+calls and one histogram observe.
+
+`SamplingProfiler` is an optional wall-clock sampler: a daemon thread walks
+sys._current_frames() every few milliseconds and counts collapsed stacks
+(flamegraph.pl / speedscope "folded" format). It is started and stopped at
+runtime through the /admin/profiler endpoints in src/api.py.
+"""
+
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from prometheus_client import Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "1") == "1"
+# Hard limits so a forgotten profiler cannot grow or run forever
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+PROFILER_MAX_STACKS = int(os.getenv("PROFILER_MAX_STACKS", "10000"))
+
+STAGE_SECONDS = Histogram(
+    "predict_stage_seconds",
+    "Time spent in each stage of the prediction path",
+    ["endpoint", "stage"],
+    buckets=(
+        0.00001,
+        0.00005,
+        0.0001,
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.5,
+    ),
+)
+BATCH_ROWS = Histogram(
+    "predict_request_rows",
+    "Rows scored per prediction request",
+    ["endpoint", "model_version"],
+    buckets=(1, 2, 8, 32, 128, 512, 2048, 8192, 32768),
+)
+IN_FLIGHT = Gauge(
+    "predict_in_flight", "Prediction requests currently being served", ["endpoint"]
+)
+
+_endpoint = contextvars.ContextVar("telemetry_endpoint", default="other")
+_stage_children = {}
+
+
+def _stage_histogram(endpoint: str, name: str):
+    child = _stage_children.get((endpoint, name))
+    if child is None:
+        child = _stage_children[(endpoint, name)] = STAGE_SECONDS.labels(
+            endpoint=endpoint, stage=name
+        )
+    return child
+
+
+def observe_stage(name: str, seconds: float):
+    """Record a stage whose duration was measured elsewhere."""
+    if TELEMETRY_ENABLED:
+        _stage_histogram(_endpoint.get(), name).observe(seconds)
+
+
+class stage:
+    """Time the enclosed block as stage `name` of the current endpoint."""
+
+    # A plain class rather than @contextmanager: no generator per span
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if TELEMETRY_ENABLED:
+            _stage_histogram(_endpoint.get(), self.name).observe(
+                time.perf_counter() - self.start
+            )
+        return False
+
+
+@contextmanager
+def track_request(endpoint: str):
+    """Label stages with `endpoint` and count the request as in flight."""
+    token = _endpoint.set(endpoint)
+    gauge = IN_FLIGHT.labels(endpoint=endpoint)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+        _endpoint.reset(token)
+
+
+def record_rows(endpoint: str, model_version: str, rows: int):
+    if TELEMETRY_ENABLED:
+        BATCH_ROWS.labels(endpoint=endpoint, model_version=model_version).observe(rows)
+
+
+class SamplingProfiler:
+    """Wall-clock stack sampler for all threads of this process."""
+
+    def __init__(
+        self,
+        max_seconds: float = PROFILER_MAX_SECONDS,
+        max_stacks: int = PROFILER_MAX_STACKS,
+    ):
+        self.max_seconds = max_seconds
+        self.max_stacks = max_stacks
+        self.interval = 0.005
+        self.samples = Counter()
+        self.started_at = None
+        self.stopped_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = 5.0):
+        with self._lock:
+            if self.running:
+                return
+            self.interval = max(0.001, interval_ms / 1000.0)
+            self.samples = Counter()
+            self.started_at, self.stopped_at = time.time(), None
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+        logger.info("Sampling profiler started (%.1f ms)", self.interval * 1000)
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            self.stopped_at = time.time()
+            logger.info("Sampling profiler stopped")
+
+    def _run(self):
+        me = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline:
+                break
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                if key in self.samples or len(self.samples) < self.max_stacks:
+                    self.samples[key] += 1
+        self.stopped_at = time.time()
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": sum(self.samples.values()),
+            "distinct_stacks": len(self.samples),
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+        }
+
+    def collapsed(self) -> str:
+        """Samples in folded-stack format, most frequent first."""
+        return "\n".join(f"{stack} {n}" for stack, n in self.samples.most_common())
@@ -0,0 +1,341 @@
+# src/tracking.py
+"""
+Buffered, asynchronous MLflow logging for training runs.
+
+`BufferedTracker` queues params, metrics and tags in memory and a
+background thread sends them with `log_batch` every TRACKING_FLUSH_SECONDS
+(or as soon as a full batch is waiting), so a hot loop logging per-stage or
+per-trial metrics never waits on the tracking store; with the SQLite
+backend each fluent call was its own transaction. Artifact uploads and
+other slow side work (`submit`) run on a small thread pool while training
+continues.
+
+Everything is flushed when the tracker is closed: on leaving its `with`
+block (also when an exception is propagating) and at interpreter exit.
+Batches that still fail after retries are appended to a JSONL spool file
+under TRACKING_SPOOL_DIR, which `replay_spool` sends later:
+
+    python -m src.tracking replay mlflow_spool/<run_id>.jsonl
+
+The client is injectable: anything with `log_batch(run_id, metrics, params,
+tags)` (metrics as (key, value, timestamp_ms, step) tuples, params and tags
+as dicts), `log_artifact(run_id, local_path, artifact_path)` and, for
+`log_sklearn_model`, `log_artifacts(run_id, local_dir, artifact_path)`.
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+TRACKING_FLUSH_SECONDS = float(os.getenv("TRACKING_FLUSH_SECONDS", "1.0"))
+TRACKING_ARTIFACT_WORKERS = int(os.getenv("TRACKING_ARTIFACT_WORKERS", "4"))
+TRACKING_SPOOL_DIR = os.getenv("TRACKING_SPOOL_DIR", "mlflow_spool")
+
+# MLflow's log_batch limits
+MAX_ENTITIES_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+
+_RETRIES = 3
+
+
+class TrackingError(RuntimeError):
+    """Some tracking data could not be sent (it was spooled to disk)."""
+
+
+class MlflowBatchClient:
+    """Adapter from the tuple/dict interface above to MlflowClient."""
+
+    def __init__(self, client=None):
+        if client is None:
+            from mlflow.tracking import MlflowClient
+
+            client = MlflowClient()
+        self.client = client
+
+    def log_batch(self, run_id: str, metrics=(), params=None, tags=None):
+        from mlflow.entities import Metric, Param, RunTag
+
+        self.client.log_batch(
+            run_id,
+            metrics=[Metric(k, v, ts, step) for k, v, ts, step in metrics],
+            params=[Param(k, str(v)) for k, v in (params or {}).items()],
+            tags=[RunTag(k, str(v)) for k, v in (tags or {}).items()],
+        )
+
+    def log_artifact(self, run_id: str, local_path: str, artifact_path=None):
+        self.client.log_artifact(run_id, local_path, artifact_path)
+
+    def log_artifacts(self, run_id: str, local_dir: str, artifact_path=None):
+        self.client.log_artifacts(run_id, local_dir, artifact_path)
+
+
+class _Pending:
+    __slots__ = ("metrics", "params", "tags")
+
+    def __init__(self):
+        self.metrics = []
+        # Params are write-once in MLflow and duplicate keys fail a batch
+        self.params = {}
+        self.tags = {}
+
+    def __len__(self):
+        return len(self.metrics) + len(self.params) + len(self.tags)
+
+
+def _batches(pending: _Pending):
+    """Split one run's records into log_batch calls within MLflow's limits."""
+    metrics = list(pending.metrics)
+    params = list(pending.params.items())
+    tags = list(pending.tags.items())
+    while metrics or params or tags:
+        batch_params = dict(params[:MAX_PARAMS_PER_BATCH])
+        params = params[MAX_PARAMS_PER_BATCH:]
+        batch_tags = dict(tags[:MAX_TAGS_PER_BATCH])
+        tags = tags[MAX_TAGS_PER_BATCH:]
+        room = MAX_ENTITIES_PER_BATCH - len(batch_params) - len(batch_tags)
+        batch_metrics, metrics = metrics[:room], metrics[room:]
+        yield batch_metrics, batch_params, batch_tags
+
+
+class BufferedTracker:
+    """
+    Queue MLflow records for `run_id` and send them in the background.
+    Records for other runs (e.g. nested trial runs) pass `run_id=`.
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        client=None,
+        flush_interval: float = TRACKING_FLUSH_SECONDS,
+        artifact_workers: int = TRACKING_ARTIFACT_WORKERS,
+        spool_dir: str = TRACKING_SPOOL_DIR,
+    ):
+        self.run_id = run_id
+        self.client = client or MlflowBatchClient()
+        self.flush_interval = flush_interval
+        self.spool_dir = spool_dir
+        self.errors = []
+        self._cond = threading.Condition()
+        self._pending = {}
+        # Every param value accepted per run, sent or not (params are write-once)
+        self._params = {}
+        self._enqueued = 0
+        self._sent = 0
+        self._closed = False
+        self._wake = threading.Event()
+        self._futures = set()
+        self._pool = ThreadPoolExecutor(
+            artifact_workers, thread_name_prefix="tracking-artifacts"
+        )
+        self._thread = threading.Thread(
+            target=self._run, name="tracking-flush", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    # -- records ---------------------------------------------------------
+
+    def _add(self, run_id, kind: str, record) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Tracker is closed")
+            run_id = run_id or self.run_id
+            if kind == "params":
+                logged = self._params.setdefault(run_id, {})
+                key, value = record
+                if key in logged and str(logged[key]) != str(value):
+                    raise ValueError(
+                        f"Param {key!r} of run {run_id} already logged as "
+                        f"{logged[key]!r}; cannot change it to {value!r}"
+                    )
+                logged[key] = value
+            pending = self._pending.setdefault(run_id, _Pending())
+            if kind == "metrics":
+                pending.metrics.append(record)
+            else:
+                getattr(pending, kind)[record[0]] = record[1]
+            self._enqueued += 1
+            full = len(pending) >= MAX_ENTITIES_PER_BATCH
+        if full:
+            self._wake.set()
+
+    def log_metric(self, key: str, value, step: int = 0, run_id=None) -> None:
+        record = (key, float(value), int(time.time() * 1000), int(step or 0))
+        self._add(run_id, "metrics", record)
+
+    def log_metrics(self, metrics: dict, step: int = 0, run_id=None) -> None:
+        for key, value in metrics.items():
+            self.log_metric(key, value, step, run_id)
+
+    def log_param(self, key: str, value, run_id=None) -> None:
+        self._add(run_id, "params", (key, value))
+
+    def log_params(self, params: dict, run_id=None) -> None:
+        for key, value in params.items():
+            self.log_param(key, value, run_id)
+
+    def set_tag(self, key: str, value, run_id=None) -> None:
+        self._add(run_id, "tags", (key, value))
+
+    def set_tags(self, tags: dict, run_id=None) -> None:
+        for key, value in tags.items():
+            self.set_tag(key, value, run_id)
+
+    # -- artifacts and side work -----------------------------------------
+
+    def submit(self, fn, *args, **kwargs):
+        """Run `fn` on the artifact pool; flush() waits for it and re-raises."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Tracker is closed")
+            future = self._pool.submit(fn, *args, **kwargs)
+            self._futures.add(future)
+        return future
+
+    def log_artifact(self, local_path: str, artifact_path=None, run_id=None):
+        return self.submit(
+            self.client.log_artifact, run_id or self.run_id, local_path, artifact_path
+        )
+
+    # -- background sender -----------------------------------------------
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._cond:
+                pending, self._pending = self._pending, {}
+                enqueued, closed = self._enqueued, self._closed
+            for run_id, records in pending.items():
+                for batch in _batches(records):
+                    self._send(run_id, *batch)
+            with self._cond:
+                self._sent = enqueued
+                self._cond.notify_all()
+                if closed and not self._pending:
+                    return
+
+    def _send(self, run_id, metrics, params, tags):
+        for attempt in range(_RETRIES):
+            try:
+                self.client.log_batch(run_id, metrics=metrics, params=params, tags=tags)
+                return
+            except Exception as e:  # noqa: BLE001 - never take training down
+                error = e
+                time.sleep(0.2 * 2**attempt)
+        logger.error("MLflow log_batch for run %s failed: %s", run_id, error)
+        self.errors.append(error)
+        self._spool(run_id, metrics, params, tags)
+
+    def _spool(self, run_id, metrics, params, tags):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{run_id}.jsonl")
+        with open(path, "a") as fh:
+            record = {"metrics": metrics, "params": params, "tags": tags}
+            fh.write(json.dumps(record, default=str) + "\n")
+        logger.warning("Spooled unsent tracking data to %s", path)
+
+    # -- flushing --------------------------------------------------------
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Block until everything queued so far is sent and artifacts are done."""
+        with self._cond:
+            target = self._enqueued
+            futures = set(self._futures)
+        self._wake.set()
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._sent >= target or not self._thread.is_alive(), timeout
+            )
+        done, _ = wait(futures, timeout)
+        with self._cond:
+            self._futures -= done
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+        if self.errors:
+            raise TrackingError(f"{len(self.errors)} tracking batches were spooled")
+
+    def close(self) -> None:
+        """Flush, stop the sender thread and the artifact pool. Idempotent."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)
+        try:
+            wait(set(self._futures))
+            self._wake.set()
+            self._thread.join()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        # Surface send/upload failures, but never mask the original exception
+        if exc_type is None:
+            self.flush()
+
+
+def log_sklearn_model(model, run_id: str, name: str = "model", client=None):
+    """
+    Log `model` as the `name` artifact directory of `run_id`, from any thread.
+
+    Resuming the run with the fluent start_run would end it (status FINISHED)
+    when this worker is done, while training is still logging to it; the
+    model is saved locally and uploaded through the client instead.
+    """
+    import mlflow.sklearn
+
+    client = client or MlflowBatchClient()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, name)
+        mlflow.sklearn.save_model(model, path)
+        client.log_artifacts(run_id, path, name)
+
+
+def replay_spool(path: str, client=None) -> int:
+    """Send the batches spooled to `path` (named <run_id>.jsonl); returns count."""
+    client = client or MlflowBatchClient()
+    run_id = os.path.splitext(os.path.basename(path))[0]
+    sent = 0
+    with open(path) as fh:
+        for line in fh:
+            record = json.loads(line)
+            client.log_batch(
+                run_id,
+                metrics=[tuple(m) for m in record["metrics"]],
+                params=record["params"],
+                tags=record["tags"],
+            )
+            sent += 1
+    os.remove(path)
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+    replay = sub.add_parser("replay", help="send a spooled <run_id>.jsonl file")
+    replay.add_argument("path")
+    args = parser.parse_args()
+    if args.command == "replay":
+        logger.info("Replayed %d batches", replay_spool(args.path))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
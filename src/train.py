@@ -15,8 +15,6 @@ import sys
 import tempfile
 import joblib
 import mlflow
-import mlflow.sklearn
-import boto3
 import logging
 from sklearn.ensemble import ExtraTreesRegressor
 from sklearn.model_selection import train_test_split
@@ -24,12 +22,43 @@ from sklearn.metrics import root_mean_squared_error, r2_score
 from dotenv import load_dotenv
 import time
 
-from data_ingestion import full_pipeline_from_csv
-from aws_utils import start_ec2_instance, stop_ec2_instance, run_docker_commands_on_ec2
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-# from monitoring.evidently_dashboard import generate_data_drift_report
+from src.aws_utils import (
+    run_docker_commands_on_ec2,
+    start_ec2_instance,
+    stop_ec2_instance,
+)
+from src.data_ingestion import (
+    LEAN_TRAINING,
+    PREPROCESSOR_SUFFIX,
+    FeaturePreprocessor,
+    full_pipeline_from_csv,
+    split_float32,
+)
+from src.drift_monitor import DRIFT_PROFILE_SUFFIX, build_reference_profile
+from src.feature_cache import load_features, load_preprocessor
+from src.hyperparameter_search import (
+    SEARCH_TRIALS,
+    candidate_params,
+    log_trial_to_mlflow,
+    run_search,
+)
+from src.incremental_training import (
+    INCREMENTAL_TRAINING,
+    grow_forest,
+    load_deployed_model,
+    log_lineage_to_mlflow,
+    partition_cutoff,
+    recent_partition,
+)
+from src.inference import sidecar_metadata
+from src.model_format import COMPACT_MODEL_SUFFIX, write_forest
+from src.peak_memory import PeakMemory
+from src.s3_transfer import upload_file
+from src.tracking import BufferedTracker, log_sklearn_model
 
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+# from monitoring.evidently_dashboard import generate_data_drift_report
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -39,6 +68,8 @@ logger = logging.getLogger(__name__)
 N_ESTIMATORS = int(os.getenv("N_ESTIMATORS", 2))
 RANDOM_STATE = int(os.getenv("RANDOM_STATE", 42))
 TEST_SIZE = float(os.getenv("TEST_SIZE", 0.2))
+# Leaf value encoding of the .ftree artifact (see src/model_format.py)
+COMPACT_LEAF_ENCODING = os.getenv("COMPACT_LEAF_ENCODING", "float32")
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
 
@@ -64,23 +95,17 @@ TRAIN_CSV = os.getenv("TRAIN_CSV", "data/train.csv")
 S3_TRAIN_KEY = os.getenv("S3_TRAIN_KEY")
 S3_TEST_KEY = os.getenv("S3_TEST_KEY")
 MLFLOW_EXPERIMENT = os.getenv("MLFLOW_EXPERIMENT", "mlops-demo")
-aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-aws_secret_access = os.getenv("AWS_SECRET_ACCESS_KEY")
+# Read cleaned features from the Arrow cache (see src/feature_cache.py); off
+# by default, since the cache is built from TRAIN_CSV_SOURCE, not TRAIN_CSV
+FEATURE_CACHE = os.getenv("FEATURE_CACHE", "0") == "1"
 API_INSTANCE_ID = os.getenv("API_INSTANCE_ID")
 region = os.getenv("AWS_REGION")
 
 
-def upload_file_to_s3(local_path: str, bucket: str, key: str):
-    """Upload a file to S3 at s3://{bucket}/{key} using boto3 and env creds."""
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_access,
-        region_name=region,
-    )
+def upload_file_to_s3(local_path: str, bucket: str, key: str, metadata=None):
+    """Upload a file to S3 at s3://{bucket}/{key} (multipart, see s3_transfer)."""
     logger.info("Uploading %s to s3://%s/%s", local_path, bucket, key)
-    s3.upload_file(local_path, bucket, key)
-    logger.info("Upload finished")
+    return upload_file(local_path, bucket, key, metadata=metadata)
 
 
 def main():
@@ -96,20 +121,86 @@ def main():
     mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
     mlflow.set_experiment(MLFLOW_EXPERIMENT)
 
+    # Peak RSS of each stage, logged to the run
+    memory = PeakMemory()
+
     # Load data
     logger.info("Loading and preprocessing data from %s", TRAIN_CSV)
-    X, y = full_pipeline_from_csv(TRAIN_CSV)
-
-    X_train, X_val, y_train, y_val = train_test_split(
-        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
-    )
-
-    with mlflow.start_run():
-        logger.info("Training ExtraTreesRegressor (n_estimators=%s)", N_ESTIMATORS)
-        model = ExtraTreesRegressor(
-            n_estimators=N_ESTIMATORS, n_jobs=-1, random_state=RANDOM_STATE
-        )
-        model.fit(X_train, y_train)
+    with memory.stage("load"):
+        if INCREMENTAL_TRAINING:
+            # Encode new data with the deployed model's codes, extended if needed
+            base_model, preprocessor, parent_version = load_deployed_model(
+                S3_BUCKET, S3_MODEL_KEY
+            )
+            preprocessor = preprocessor or FeaturePreprocessor()
+            X, y = full_pipeline_from_csv(TRAIN_CSV, preprocessor=preprocessor)
+        elif FEATURE_CACHE:
+            X, y = load_features()
+            preprocessor = load_preprocessor()
+        else:
+            preprocessor = FeaturePreprocessor()
+            X, y = full_pipeline_from_csv(TRAIN_CSV, preprocessor=preprocessor)
+
+    with memory.stage("split"):
+        if LEAN_TRAINING:
+            # Same rows, as views of one float32 matrix sklearn uses as is
+            X_train, X_val, y_train, y_val = split_float32(
+                X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+            )
+        else:
+            X_train, X_val, y_train, y_val = train_test_split(
+                X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+            )
+
+    # Tracking calls are queued and sent in batches by a background thread;
+    # the tracker flushes (and waits for artifact uploads) when the run ends
+    with mlflow.start_run() as run, BufferedTracker(run.info.run_id) as tracker:
+        params = {"n_estimators": N_ESTIMATORS}
+        if INCREMENTAL_TRAINING:
+            # Only rows after the deployed forest's recorded cutoff are new
+            X_recent, y_recent = recent_partition(
+                X_train, y_train, partition_cutoff(base_model, X.index)
+            )
+            logger.info("Warm-starting deployed model %s", parent_version)
+            with memory.stage("fit"):
+                lineage = grow_forest(
+                    base_model,
+                    X_recent,
+                    y_recent,
+                    source=run.info.run_id,
+                    data_cutoff=X.index.max(),
+                )
+            log_lineage_to_mlflow(lineage, parent_version, tracker)
+            params = {"n_estimators": lineage["trees_total"]}
+            model = base_model
+        else:
+            if SEARCH_TRIALS:
+                # Trials become nested runs; the winner is refit on all cores
+                best = run_search(
+                    X_train,
+                    y_train,
+                    X_val,
+                    y_val,
+                    candidate_params(random_state=RANDOM_STATE),
+                    random_state=RANDOM_STATE,
+                    on_result=lambda result: log_trial_to_mlflow(result, tracker),
+                )
+                params = best["params"]
+                tracker.log_params({f"best_{k}": v for k, v in params.items()})
+
+            logger.info("Training ExtraTreesRegressor (%s)", params)
+            model = ExtraTreesRegressor(n_jobs=-1, random_state=RANDOM_STATE, **params)
+            with memory.stage("fit"):
+                model.fit(X_train, y_train)
+            # Incremental runs warm-start from the rows after this one
+            model.data_cutoff_ = X.index.max()
+
+        # Log the model in MLflow (artifacts go to the tracking uri -> S3) and
+        # save the copy the API loads while the model is being evaluated
+        tracker.submit(log_sklearn_model, model, run.info.run_id, client=tracker.client)
+        with tempfile.NamedTemporaryFile(suffix=".pkl", delete=False) as tf:
+            local_model_path = tf.name
+        model_saved = tracker.submit(joblib.dump, model, local_model_path)
 
         # Eval
         preds = model.predict(X_val)
@@ -119,25 +210,64 @@ def main():
         logger.info("Validation RMSE: %.4f, R2: %.4f", rmse, r2)
 
         # Log metrics
-        mlflow.log_metric("rmse", float(rmse))
-        mlflow.log_metric("r2", float(r2))
-        mlflow.log_param("n_estimators", N_ESTIMATORS)
-        mlflow.log_param("random_state", RANDOM_STATE)
+        tracker.log_metrics({"rmse": float(rmse), "r2": float(r2)})
+        tracker.log_metrics(memory.metrics())
+        tracker.log_params(
+            {
+                "n_estimators": params["n_estimators"],
+                "random_state": RANDOM_STATE,
+                "compact_leaf_encoding": COMPACT_LEAF_ENCODING,
+                "lean_training": LEAN_TRAINING,
+            }
+        )
 
-        # Log model in MLflow (this will store artifacts to the MLflow tracking uri -> S3)
-        mlflow.sklearn.log_model(model, name="model")
-
-        # Also save a copy to a temp file and upload to S3 as latest_model.pkl for inference script
-        with tempfile.NamedTemporaryFile(suffix=".pkl", delete=False) as tf:
-            joblib.dump(model, tf.name)
-            local_model_path = tf.name
+        # The API encodes requests with the exact codes fitted here. Sidecars
+        # are uploaded (in parallel) before the model, whose metadata records
+        # which sidecar versions belong to it (see inference.sidecar_selector).
+        model_saved.result()
+        preprocessor_path = local_model_path + PREPROCESSOR_SUFFIX
+        preprocessor.save(preprocessor_path)
+        # Reference distributions the API's drift monitor compares traffic to;
+        # features and predictions both come from the held-out rows
+        profile_path = local_model_path + DRIFT_PROFILE_SUFFIX
+        build_reference_profile(X_val, preds).save(profile_path)
+        # Compact copy for INFERENCE_ENGINE=compact
+        compact_path = local_model_path + COMPACT_MODEL_SUFFIX
+        write_forest(model, compact_path, COMPACT_LEAF_ENCODING)
+
+        sidecars = {}
+        for path, suffix in (
+            (preprocessor_path, PREPROCESSOR_SUFFIX),
+            (profile_path, DRIFT_PROFILE_SUFFIX),
+            (compact_path, COMPACT_MODEL_SUFFIX),
+        ):
+            tracker.log_artifact(path, artifact_path="model")
+            sidecars[suffix] = tracker.submit(
+                upload_file_to_s3, path, S3_BUCKET, S3_MODEL_KEY + suffix
+            )
+        sidecars = {suffix: upload.result() for suffix, upload in sidecars.items()}
+        replaced = [suffix for suffix, stats in sidecars.items() if stats.etag is None]
+        if replaced:
+            raise RuntimeError(f"Sidecars {replaced} were replaced during upload")
 
         # Upload to S3 (explicit)
-        upload_file_to_s3(local_model_path, S3_BUCKET, S3_MODEL_KEY)
+        upload = upload_file_to_s3(
+            local_model_path,
+            S3_BUCKET,
+            S3_MODEL_KEY,
+            metadata=sidecar_metadata(sidecars),
+        )
+        tracker.log_metric("model_upload_mb_per_s", upload.mb_per_s)
         logger.info("Model uploaded to s3://%s/%s", S3_BUCKET, S3_MODEL_KEY)
 
-        # Log S3 location as tag/artifact
-        mlflow.set_tag("s3_model_path", f"s3://{S3_BUCKET}/{S3_MODEL_KEY}")
+        # Log S3 location as tag/artifact. The key is overwritten by every
+        # run, so the object version is what ties it to this run (the API's
+        # MODEL_SOURCE=mlflow loads exactly that version).
+        if upload.version is None:
+            logger.warning("Model object replaced during upload; run not loadable")
+        else:
+            tracker.set_tag("s3_model_version", upload.version)
+        tracker.set_tag("s3_model_path", f"s3://{S3_BUCKET}/{S3_MODEL_KEY}")
 
     logger.info("Training run finished. MLflow run info available.")
 
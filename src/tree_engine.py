@@ -0,0 +1,231 @@
+# src/tree_engine.py
+"""
+Flat-array inference engine for fitted tree ensembles.
+
+The fitted estimators' `tree_` structures are converted once into contiguous
+NumPy arrays (feature, threshold, children, value) covering every tree, and
+prediction walks all trees for all rows together, one depth level per step.
+This skips sklearn's per-call input validation and joblib dispatch, which
+dominate latency for single rows and small batches.
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledForest:
+    """
+    A forest of regression trees stored as flat node arrays.
+
+    Node ids are global across trees; `roots[t]` is the first node of tree t.
+    Leaves point to themselves as both children, so a fixed number of
+    traversal steps (the deepest tree's depth) always lands every row on a leaf.
+    """
+
+    def __init__(
+        self,
+        feature,
+        threshold,
+        children_left,
+        children_right,
+        value,
+        roots,
+        missing_go_to_left=None,
+        feature_names=None,
+        n_features=None,
+        max_depth=None,
+        value_scale=None,
+        value_offset=0.0,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.missing_go_to_left = missing_go_to_left
+        # Quantized leaf values (see model_format.py): value * scale + offset
+        self.value_scale = value_scale
+        self.value_offset = value_offset
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = (
+            n_features if n_features is not None else int(feature.max()) + 1
+        )
+        self.max_depth = (
+            max_depth if max_depth is not None else self._depth_from_children()
+        )
+        # Optional original estimator for batches large enough that sklearn's
+        # compiled traversal beats the per-level NumPy gathers used here.
+        self.fallback = None
+        self.fallback_min_rows = None
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_estimator(cls, model) -> "CompiledForest":
+        """Compile a fitted sklearn forest (or single tree) regressor."""
+        estimators = getattr(model, "estimators_", None)
+        if estimators is None and hasattr(model, "tree_"):
+            estimators = [model]
+        if not estimators or not hasattr(estimators[0], "tree_"):
+            raise TypeError(f"{type(model).__name__} is not a fitted tree ensemble")
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output regressors can be compiled")
+
+        trees = [est.tree_ for est in estimators]
+        counts = np.array([t.node_count for t in trees], dtype=np.intp)
+        roots = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.intp)
+
+        feature, threshold, left, right, value, missing = [], [], [], [], [], []
+        for tree, offset in zip(trees, roots):
+            ids = np.arange(tree.node_count, dtype=np.intp) + offset
+            is_leaf = tree.children_left == -1
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            left.append(np.where(is_leaf, ids, tree.children_left + offset))
+            right.append(np.where(is_leaf, ids, tree.children_right + offset))
+            value.append(tree.value[:, 0, 0])
+            missing.append(
+                getattr(tree, "missing_go_to_left", np.zeros(tree.node_count))
+            )
+
+        names = getattr(model, "feature_names_in_", None)
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(feature), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(threshold)),
+            children_left=np.ascontiguousarray(np.concatenate(left), dtype=np.intp),
+            children_right=np.ascontiguousarray(np.concatenate(right), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(value)),
+            roots=roots,
+            missing_go_to_left=np.concatenate(missing).astype(bool),
+            feature_names=None if names is None else list(names),
+            n_features=model.n_features_in_,
+            max_depth=max(t.max_depth for t in trees),
+        )
+
+    def _depth_from_children(self) -> int:
+        frontier, depth = self.roots, 0
+        while True:
+            inner = frontier[self.children_left[frontier] != frontier]
+            if inner.size == 0:
+                return depth
+            frontier = np.concatenate(
+                (self.children_left[inner], self.children_right[inner])
+            )
+            depth += 1
+
+    def leaf_indices(self, X) -> np.ndarray:
+        """Global leaf node id reached by every (tree, row) pair, shape (n_trees, n)."""
+        # sklearn compares float32 feature values against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"Expected 2D input with {self.n_features_in_} features, "
+                f"got shape {X.shape}"
+            )
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+        # One slot per (tree, row) pair; `active` holds the slots not yet on a
+        # leaf, so each level only gathers for paths that are still descending.
+        nodes = np.repeat(self.roots, n_rows)
+        row_offsets = np.tile(
+            np.arange(n_rows, dtype=np.intp) * n_features, len(self.roots)
+        )
+        active = np.arange(nodes.size, dtype=np.intp)
+        has_nan = self.missing_go_to_left is not None and np.isnan(flat_x).any()
+        for _ in range(self.max_depth):
+            current = nodes[active]
+            values = flat_x[row_offsets[active] + self.feature[current]]
+            go_left = values <= self.threshold[current]
+            if has_nan:
+                go_left |= np.isnan(values) & self.missing_go_to_left[current]
+            nxt = np.where(
+                go_left, self.children_left[current], self.children_right[current]
+            )
+            nodes[active] = nxt
+            active = active[self.children_left[nxt] != nxt]
+            if active.size == 0:
+                break
+        return nodes.reshape(len(self.roots), n_rows)
+
+    def predict(self, X) -> np.ndarray:
+        """Average of the per-tree leaf values, matching ForestRegressor.predict."""
+        if self.fallback is not None and len(X) >= self.fallback_min_rows:
+            return self.fallback.predict(X)
+        preds = self.value[self.leaf_indices(X)].mean(axis=0, dtype=np.float64)
+        if self.value_scale is not None:
+            preds = preds * self.value_scale + self.value_offset
+        return preds
+
+
+_ARRAY_FIELDS = (
+    "feature",
+    "threshold",
+    "children_left",
+    "children_right",
+    "value",
+    "roots",
+    "missing_go_to_left",
+)
+
+
+def save_arrays(forest: CompiledForest, directory: str):
+    """
+    Write the forest as one uncompressed .npy file per array plus meta.json.
+    The layout is what `load_arrays(..., mmap_mode="r")` maps straight from
+    disk, so every process serving it shares the same page-cache pages.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in _ARRAY_FIELDS:
+        np.save(os.path.join(directory, f"{name}.npy"), getattr(forest, name))
+    names = getattr(forest, "feature_names_in_", None)
+    meta = {
+        "feature_names": None if names is None else [str(n) for n in names],
+        "n_features": int(forest.n_features_in_),
+        "max_depth": int(forest.max_depth),
+    }
+    # meta.json is written last; its presence marks a complete directory
+    with open(os.path.join(directory, "meta.json"), "w") as fh:
+        json.dump(meta, fh)
+
+
+def load_arrays(directory: str, mmap_mode="r") -> CompiledForest:
+    """Load a forest written by `save_arrays`, memory-mapped read-only by default."""
+    with open(os.path.join(directory, "meta.json")) as fh:
+        meta = json.load(fh)
+    arrays = {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in _ARRAY_FIELDS
+    }
+    return CompiledForest(**arrays, **meta)
+
+
+def compile_model(model, fallback_min_rows=None):
+    """
+    Compile `model` if it is a tree ensemble, otherwise return it unchanged.
+    With `fallback_min_rows`, batches of at least that many rows are still
+    routed to the original estimator.
+    """
+    try:
+        compiled = CompiledForest.from_estimator(model)
+    except (TypeError, ValueError) as e:
+        logger.warning("Falling back to sklearn predict: %s", e)
+        return model
+    if fallback_min_rows:
+        compiled.fallback = model
+        compiled.fallback_min_rows = fallback_min_rows
+    logger.info(
+        "Compiled %d trees (%d nodes, depth %d) for flat-array inference",
+        compiled.n_estimators,
+        compiled.value.shape[0],
+        compiled.max_depth,
+    )
+    return compiled
@@ -44,9 +44,11 @@ def sample_payload():
 
 
 def test_predict_endpoint_status(sample_payload):
-    """Check if /predict returns status 200."""
+    """Without a loaded model /predict answers 503, not 200 with an error."""
     response = client.post("/predict", json=sample_payload)
-    assert response.status_code == 200
+    assert response.status_code == 503
+    response = client.post("/predict/batch", json={"records": [{"full_sq": 89}]})
+    assert response.status_code == 503
 
 
 def test_predict_response_structure(sample_payload):
@@ -62,3 +64,468 @@ def test_predict_invalid_payload():
     bad_payload = {"wrong_key": [1, 2, 3]}
     response = client.post("/predict", json=bad_payload)
     assert response.status_code in [400, 422], "Should return validation error for bad input"
+
+
+# -----------------------------
+# Batch Prediction Endpoint Tests
+# -----------------------------
+
+@pytest.fixture
+def fitted_model(monkeypatch):
+    """Small ExtraTrees fitted on named features, installed as the API model."""
+    import numpy as np
+    import pandas as pd
+    from sklearn.ensemble import ExtraTreesRegressor
+    import src.api as api
+    from src.prediction_cache import PredictionCache
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(
+        {
+            "full_sq": rng.uniform(20, 150, 200),
+            "life_sq": rng.uniform(10, 100, 200),
+            "floor": rng.integers(1, 25, 200),
+            "product_type": rng.integers(0, 2, 200),
+        }
+    )
+    y = X["full_sq"] * 1000 + X["product_type"] * 5000
+    model = ExtraTreesRegressor(n_estimators=5, random_state=0).fit(X, y)
+    monkeypatch.setattr(api.model_manager, "current", None)
+    monkeypatch.setattr(api, "prediction_cache", PredictionCache())
+    api.model_manager.swap(model, "test-v1")
+    return model
+
+
+def test_predict_batch_records_match_dataframe_path(fitted_model):
+    """Batch predictions equal the model's own DataFrame predictions, in order."""
+    import pandas as pd
+
+    records = [
+        {"floor": 3, "full_sq": 89, "life_sq": 50, "product_type": "Investment"},
+        {"full_sq": 40, "life_sq": 20, "floor": 12, "product_type": "OwnerOccupier"},
+    ]
+    response = client.post("/predict/batch", json={"records": records})
+    assert response.status_code == 200
+    data = response.json()
+    expected = fitted_model.predict(
+        pd.DataFrame(records)
+        .assign(product_type=[1, 0])[list(fitted_model.feature_names_in_)]
+    )
+    assert data["count"] == 2
+    assert data["predictions"] == pytest.approx(expected.tolist())
+
+
+def test_predict_uses_models_fitted_preprocessor(fitted_model):
+    """A model shipped with its own encoder is served with those codes."""
+    import pandas as pd
+    import src.api as api
+    from src.data_ingestion import FeaturePreprocessor
+
+    # Training-time codes: Investment=0, OwnerOccupier=1 (legacy mapping is 1/0)
+    preprocessor = FeaturePreprocessor().fit(
+        pd.DataFrame({"product_type": ["Investment", "OwnerOccupier"]})
+    )
+    api.model_manager.swap(fitted_model, "test-v2", preprocessor)
+    payload = {"full_sq": 89, "life_sq": 50, "floor": 3, "product_type": "Investment"}
+
+    response = client.post("/predict", json=payload)
+
+    row = pd.DataFrame([{**payload, "product_type": 0}])
+    expected = fitted_model.predict(row[list(fitted_model.feature_names_in_)])
+    assert response.status_code == 200
+    assert response.json()["prediction"] == pytest.approx(float(expected[0]))
+
+
+def test_predictions_feed_drift_monitor(fitted_model, monkeypatch):
+    """Traffic against a model with a reference profile updates drift gauges."""
+    import pandas as pd
+    import src.api as api
+    from src.drift_monitor import VersionedDriftMonitor, build_reference_profile
+
+    names = list(fitted_model.feature_names_in_)
+    reference = pd.DataFrame(
+        {"full_sq": [30.0, 60, 90, 120], "life_sq": [20.0, 40, 60, 80],
+         "floor": [1.0, 5, 10, 20], "product_type": [0.0, 1, 0, 1]}
+    )[names]
+    profile = build_reference_profile(reference, fitted_model.predict(reference))
+    monitor = VersionedDriftMonitor(update_every=1)
+    monkeypatch.setattr(api, "drift_monitor", monitor)
+    api.model_manager.swap(fitted_model, "test-v2", reference_profile=profile)
+
+    payload = {"columns": {"full_sq": [300, 310], "life_sq": [20, 30],
+                           "floor": [3, 4], "product_type": ["Investment", "Investment"]}}
+    response = client.post("/predict/batch", json=payload)
+
+    assert response.status_code == 200
+    assert monitor.monitor("test-v2").profile is profile
+    assert monitor.scores("test-v2")["full_sq"]["psi"] > 1
+    metrics = client.get("/metrics").text
+    assert 'feature_drift_psi{feature="full_sq",model_version="test-v2"}' in metrics
+
+
+def test_stage_timings_exposed_on_metrics(fitted_model):
+    """Prediction requests record per-stage latencies and their batch size."""
+    payload = {"columns": {"full_sq": [89, 40], "life_sq": [50, 20],
+                           "floor": [3, 12], "product_type": ["Investment", "Investment"]}}
+    assert client.post("/predict/batch", json=payload).status_code == 200
+    text = client.get("/metrics").text
+    for name in ("decode", "features", "encode", "predict", "drift"):
+        assert f'predict_stage_seconds_count{{endpoint="predict_batch",stage="{name}"}}' in text
+    assert 'predict_request_rows_count{endpoint="predict_batch",model_version="test-v1"}' in text
+    assert 'predict_in_flight{endpoint="predict_batch"} 0.0' in text
+
+
+def test_admin_profiler_requires_token(monkeypatch):
+    """The profiler can only be toggled with the configured admin token."""
+    import src.api as api
+
+    monkeypatch.setattr(api, "ADMIN_TOKEN", None)
+    assert client.post("/admin/profiler/start").status_code == 403
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    assert client.post("/admin/profiler/start", headers={"X-Admin-Token": "x"}).status_code == 403
+
+    headers = {"X-Admin-Token": "secret"}
+    started = client.post("/admin/profiler/start?interval_ms=1", headers=headers)
+    assert started.json()["running"] is True
+    client.get("/health")
+    stopped = client.post("/admin/profiler/stop", headers=headers)
+    assert stopped.status_code == 200
+    assert stopped.headers["content-type"].startswith("text/plain")
+    assert client.get("/admin/profiler", headers=headers).json()["running"] is False
+
+
+def test_predict_batch_columnar_matches_records(fitted_model):
+    """Columnar and record payloads produce identical predictions."""
+    columns = {
+        "full_sq": [89, 40],
+        "life_sq": [50, 20],
+        "floor": [3, 12],
+        "product_type": ["Investment", "OwnerOccupier"],
+    }
+    records = [dict(zip(columns, row)) for row in zip(*columns.values())]
+    by_columns = client.post("/predict/batch", json={"columns": columns}).json()
+    by_records = client.post("/predict/batch", json={"records": records}).json()
+    assert by_columns["predictions"] == by_records["predictions"]
+
+
+def test_predict_echo_is_optional(fitted_model):
+    """?echo=false drops the input from the response, the prediction is unchanged."""
+    payload = {"full_sq": 89, "life_sq": 50, "floor": 3, "product_type": "Investment"}
+    echoed = client.post("/predict", json=payload).json()
+    bare = client.post("/predict?echo=false", json=payload).json()
+    assert echoed["input"] == payload
+    assert "input" not in bare
+    assert bare["prediction"] == echoed["prediction"]
+
+
+def test_predict_batch_missing_feature(fitted_model):
+    """A feature the model needs but the payload lacks is a 400."""
+    response = client.post("/predict/batch", json={"columns": {"full_sq": [1.0]}})
+    assert response.status_code == 400
+
+
+def test_predict_batch_non_object_records(fitted_model):
+    """Records that are not JSON objects are a 400, not an error body."""
+    response = client.post("/predict/batch", json={"records": [1, 2]})
+    assert response.status_code == 400
+    assert "records" in response.json()["detail"]
+
+
+# -----------------------------
+# Micro-batching Tests
+# -----------------------------
+
+def test_concurrent_predicts_are_micro_batched(fitted_model):
+    """Concurrent single-record calls share predict calls and keep their own results."""
+    import asyncio
+    import httpx
+    import src.api as api
+    from src.inference import predict_batch
+
+    payloads = [
+        {"full_sq": 30 + i, "life_sq": 20, "floor": 2, "product_type": "Investment"}
+        for i in range(16)
+    ]
+    calls = []
+    predict_fn = api.batcher.predict_fn
+
+    def counting_predict(model, X):
+        calls.append(len(X))
+        return predict_fn(model, X)
+
+    async def fire():
+        api.batcher.predict_fn = counting_predict
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+                responses = await asyncio.gather(
+                    *(c.post("/predict", json=p) for p in payloads)
+                )
+        finally:
+            api.batcher.predict_fn = predict_fn
+            await api.batcher.stop()
+        return [r.json() for r in responses]
+
+    results = asyncio.run(fire())
+    for payload, result in zip(payloads, results):
+        assert result["input"] == payload
+        expected = predict_batch(fitted_model, {"records": [payload]})[0]
+        assert result["prediction"] == pytest.approx(expected)
+    assert sum(calls) == len(payloads)
+    assert len(calls) < len(payloads)
+
+
+# -----------------------------
+# Model Version / Hot Reload Tests
+# -----------------------------
+
+def test_version_reported_in_health_and_headers(fitted_model):
+    """The served version shows up in /health and on every response."""
+    health = client.get("/health")
+    assert health.json()["model_version"] == "test-v1"
+    assert health.headers["X-Model-Version"] == "test-v1"
+    payload = {"full_sq": 50, "life_sq": 30, "floor": 4, "product_type": "Investment"}
+    response = client.post("/predict", json=payload)
+    assert response.json()["model_version"] == "test-v1"
+    assert response.headers["X-Model-Version"] == "test-v1"
+
+
+def test_refresh_swaps_in_new_version(fitted_model, monkeypatch):
+    """A new source version is loaded, warmed and swapped in."""
+    import asyncio
+    import src.api as api
+
+    class FakeSource:
+        version = "test-v2"
+
+        def latest_version(self):
+            return self.version
+
+        def load(self, version, pinned=False):
+            return fitted_model
+
+    monkeypatch.setattr(api.model_manager, "source", FakeSource())
+    assert asyncio.run(api.model_manager.refresh()) is True
+    assert api.model_manager.version == "test-v2"
+    assert asyncio.run(api.model_manager.refresh()) is False
+    assert client.get("/health").json()["model_version"] == "test-v2"
+
+
+def test_ready_only_after_background_load(fitted_model, monkeypatch):
+    """/ready is 503 until the initial model is loaded and warmed, /health stays up."""
+    import asyncio
+    import src.api as api
+
+    class FakeSource:
+        def latest_version(self):
+            return "test-v3"
+
+        def load(self, version, pinned=False):
+            return fitted_model
+
+    monkeypatch.setattr(api.model_manager, "current", None)
+    monkeypatch.setattr(api.model_manager, "source", FakeSource())
+    monkeypatch.setattr(api.model_manager, "poll_interval", 0)
+    assert client.get("/ready").status_code == 503
+    health = client.get("/health").json()
+    assert health["status"] == "healthy" and health["ready"] is False
+
+    asyncio.run(api.load_initial_model())
+    ready = client.get("/ready")
+    assert ready.status_code == 200
+    assert ready.json()["model_version"] == "test-v3"
+    assert client.get("/health").json()["ready"] is True
+
+
+def test_local_source_serves_pickle_with_sidecars(fitted_model, tmp_path):
+    """MODEL_SOURCE=local loads a pickle and its preprocessor without AWS."""
+    import joblib
+    import numpy as np
+    from src.data_ingestion import PREPROCESSOR_SUFFIX, FeaturePreprocessor
+    from src.model_manager import LocalModelSource, ModelManager
+
+    path = str(tmp_path / "model.pkl")
+    joblib.dump(fitted_model, path)
+    FeaturePreprocessor({"product_type": {"Investment": 1}}).save(path + PREPROCESSOR_SUFFIX)
+
+    manager = ModelManager(LocalModelSource(path), poll_interval=0)
+    handle = manager._load_and_warm(manager.source.latest_version())
+    assert len(handle.version) == 12
+    assert handle.preprocessor.handles("product_type")
+    assert handle.reference_profile is None
+    row = np.array([[50.0, 30.0, 4.0, 1.0]])
+    assert handle.model.predict(row) == pytest.approx(fitted_model.predict(row))
+    # The file cannot be loaded as any other version (e.g. a canary)
+    with pytest.raises(LookupError):
+        manager.load_version("canary-v2")
+
+
+def test_local_mmap_source_serves_a_replaced_pickle(tmp_path, monkeypatch):
+    """A hot reload of a rewritten pickle serves the new trees, not stale arrays."""
+    import asyncio
+    import joblib
+    import numpy as np
+    from sklearn.ensemble import ExtraTreesRegressor
+    from src.model_manager import LocalModelSource, ModelManager
+
+    monkeypatch.setattr("src.inference.INFERENCE_ENGINE", "mmap")
+    path = str(tmp_path / "model.pkl")
+    X = np.array([[0.0], [1.0]])
+    joblib.dump(ExtraTreesRegressor(n_estimators=2).fit(X, [1.0, 1.0]), path)
+    manager = ModelManager(LocalModelSource(path), poll_interval=0)
+    manager.load_initial()
+    first = manager.version
+    assert manager.current.model.predict(X[:1]) == pytest.approx([1.0])
+
+    joblib.dump(ExtraTreesRegressor(n_estimators=2).fit(X, [2.0, 2.0]), path)
+    assert asyncio.run(manager.refresh()) is True
+    assert manager.version != first
+    assert manager.current.model.predict(X[:1]) == pytest.approx([2.0])
+
+
+def test_batch_reuses_cached_predictions(fitted_model, monkeypatch):
+    """Repeated rows are served from the prediction cache, not the model."""
+    import src.api as api
+    from src.prediction_cache import PredictionCache
+
+    monkeypatch.setattr(api, "prediction_cache", PredictionCache(max_entries=100))
+    payload = {
+        "columns": {
+            "full_sq": [89, 40],
+            "life_sq": [50, 20],
+            "floor": [3, 12],
+            "product_type": ["Investment", "Investment"],
+        }
+    }
+    first = client.post("/predict/batch", json=payload).json()
+    monkeypatch.setattr(
+        api, "timed_predict", lambda handle, X: pytest.fail("cache miss")
+    )
+    second = client.post("/predict/batch", json=payload).json()
+    assert second["predictions"] == first["predictions"]
+
+
+def test_canary_routing_and_admin_models(fitted_model, monkeypatch):
+    """Admin endpoints load a second version; X-Model-Version routes to it."""
+    import src.api as api
+    from src.model_registry import ModelRegistry
+    from sklearn.dummy import DummyRegressor
+
+    canary = DummyRegressor(strategy="constant", constant=42.0).fit(
+        [[0.0, 0.0, 0.0, 0.0]], [42.0]
+    )
+    canary.feature_names_in_ = fitted_model.feature_names_in_
+
+    class FakeSource:
+        exact_versions = True
+
+        def load(self, version, pinned=False):
+            assert pinned
+            if version == "gone":
+                raise LookupError(f"No version {version}")
+            return canary
+
+    monkeypatch.setattr(api.model_manager, "source", FakeSource())
+    monkeypatch.setattr(api, "registry", ModelRegistry(api.model_manager))
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    admin = {"X-Admin-Token": "secret"}
+    payload = {"full_sq": 89, "life_sq": 50, "floor": 9, "product_type": "Investment"}
+
+    assert client.post("/admin/models/canary-v2").status_code == 403
+    status = client.post("/admin/models/canary-v2", headers=admin).json()
+    assert status["resident"] == ["test-v1", "canary-v2"]
+    assert client.post("/admin/models/gone", headers=admin).status_code == 404
+
+    pinned = client.post("/predict", json=payload, headers={"X-Model-Version": "canary-v2"})
+    assert pinned.json()["prediction"] == 42.0
+    assert pinned.headers["X-Model-Version"] == "canary-v2"
+    default = client.post("/predict", json=payload)
+    assert default.headers["X-Model-Version"] == "test-v1"
+    missing = client.post("/predict", json=payload, headers={"X-Model-Version": "v9"})
+    assert missing.status_code == 404
+
+    routing = {"weights": {"canary-v2": 1.0}}
+    assert client.put("/admin/routing", json=routing, headers=admin).status_code == 200
+    batch = client.post("/predict/batch", json={"records": [payload]})
+    assert batch.json()["predictions"] == [42.0]
+    assert client.delete("/admin/models/canary-v2", headers=admin).status_code == 409
+    client.put("/admin/routing", json={"weights": {}}, headers=admin)
+    assert client.delete("/admin/models/canary-v2", headers=admin).status_code == 200
+    assert "model_requests_total" in client.get("/metrics").text
+
+
+def test_served_predictions_are_logged_and_replay(fitted_model, monkeypatch, tmp_path):
+    """Logged requests read back with their predictions and replay unchanged."""
+    import asyncio
+    import httpx
+    import src.api as api
+    from benchmarks.replay import replay
+    from src.prediction_log import PredictionLog, read_records
+
+    log = PredictionLog(str(tmp_path), flush_interval=60)
+    monkeypatch.setattr(api, "prediction_log", log)
+    payload = {"full_sq": 89, "life_sq": 50, "floor": 9, "product_type": "Investment"}
+    single = client.post("/predict", json=payload).json()
+    batch = client.post("/predict/batch", json={"records": [payload] * 2}).json()
+    log.close()
+
+    records = list(read_records(str(tmp_path)))
+    assert [r["input"] for r in records] == [payload, {"records": [payload] * 2}]
+    assert records[0]["predictions"] == [single["prediction"]]
+    assert records[1]["predictions"] == batch["predictions"]
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as ac:
+            return await replay(ac, records, speed=0, concurrency=2, rtol=1e-9)
+
+    stats, changed = asyncio.run(run())
+    assert stats["requests"] == 2 and stats["errors"] == 0
+    assert changed == {}
+
+
+def test_feature_name_warning_is_only_silenced_inside_predict(fitted_model):
+    """inference.predict hides sklearn's array warning without a global filter."""
+    import warnings
+    import numpy as np
+    from src.inference import predict
+
+    row = np.array([[50.0, 30.0, 4.0, 1.0]])
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        predict(fitted_model, row)
+        assert caught == []
+        fitted_model.predict(row)
+    assert any("valid feature names" in str(w.message) for w in caught)
+
+
+def test_load_test_counts_error_bodies_as_errors():
+    """A 200 {"error": ...} from a broken model is not a successful request."""
+    import httpx
+    from benchmarks.load_test import succeeded
+
+    assert succeeded(httpx.Response(200, json={"prediction": 1.0}))
+    assert succeeded(httpx.Response(200, json={"predictions": [1.0], "count": 1}))
+    assert not succeeded(httpx.Response(200, json={"error": "Model not loaded"}))
+    assert not succeeded(httpx.Response(200, json={"model_version": "v1"}))
+    assert not succeeded(httpx.Response(503, json={"prediction": 1.0}))
+
+
+def test_replay_counts_error_bodies_as_errors():
+    """Replayed requests answered with 200 {"error": ...} are errors, not NaN."""
+    import asyncio
+    import httpx
+    from benchmarks.replay import replay
+
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, json={"error": "boom"})
+    )
+    records = [{"ts": 0.0, "endpoint": "/predict", "input": {}, "predictions": [1.0]}]
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as ac:
+            return await replay(ac, records, speed=0, concurrency=1, rtol=1e-9)
+
+    stats, changed = asyncio.run(run())
+    assert stats["requests"] == 0 and stats["errors"] == 1
+    assert changed == {}
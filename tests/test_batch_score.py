@@ -0,0 +1,78 @@
+# tests/test_batch_score.py
+"""
+Test suite for src/batch_score.py
+Ensures chunked, multi-process scoring returns predictions in input order.
+"""
+
+import json
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor
+
+from src.batch_score import score_file
+from src.data_ingestion import PREPROCESSOR_SUFFIX, FeaturePreprocessor
+
+FEATURES = ["full_sq", "life_sq", "floor", "product_type"]
+
+
+@pytest.fixture
+def portfolio(tmp_path):
+    """A saved model + preprocessor and 101 raw records to score."""
+    rng = np.random.default_rng(0)
+    n = 101
+    raw = pd.DataFrame(
+        {
+            "listing_id": np.arange(n),
+            "full_sq": rng.uniform(20, 150, n),
+            "life_sq": rng.uniform(10, 100, n),
+            "floor": rng.integers(1, 25, n),
+            "product_type": rng.choice(["Investment", "OwnerOccupier"], n),
+        }
+    )
+    preprocessor = FeaturePreprocessor().fit(raw)
+    X = preprocessor.transform(raw.copy())[FEATURES]
+    model = ExtraTreesRegressor(n_estimators=5, random_state=0)
+    model.fit(X, X["full_sq"] * 1000 + X["product_type"] * 5000)
+
+    model_path = str(tmp_path / "model.pkl")
+    joblib.dump(model, model_path)
+    preprocessor.save(model_path + PREPROCESSOR_SUFFIX)
+    return raw, model.predict(X), model_path
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_jsonl_to_jsonl_preserves_order(portfolio, tmp_path, workers):
+    raw, expected, model_path = portfolio
+    src = tmp_path / "in.jsonl"
+    raw.to_json(src, orient="records", lines=True)
+    out = tmp_path / "out.jsonl"
+
+    stats = score_file(
+        str(src),
+        str(out),
+        model_path=model_path,
+        chunk_size=7,
+        workers=workers,
+        id_column="listing_id",
+    )
+
+    lines = [json.loads(line) for line in out.read_text().splitlines()]
+    assert stats["rows"] == len(raw) == len(lines)
+    assert [r["listing_id"] for r in lines] == raw["listing_id"].tolist()
+    np.testing.assert_allclose([r["prediction"] for r in lines], expected)
+
+
+def test_csv_to_parquet(portfolio, tmp_path):
+    raw, expected, model_path = portfolio
+    src = tmp_path / "in.csv"
+    raw.to_csv(src, index=False)
+    out = tmp_path / "out.parquet"
+
+    score_file(str(src), str(out), model_path=model_path, chunk_size=10, workers=2)
+
+    result = pd.read_parquet(out)
+    assert list(result.columns) == ["prediction"]
+    np.testing.assert_allclose(result["prediction"], expected)
@@ -0,0 +1,78 @@
+# tests/test_codec.py
+"""
+Test suite for src/codec.py
+Ensures the compiled schema builds exactly the matrix build_feature_matrix does.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+import src.codec as codec
+from src.codec import FeatureSchema
+from src.data_ingestion import FeaturePreprocessor
+from src.inference import build_feature_matrix
+
+NAMES = ["full_sq", "floor", "product_type"]
+COLUMNS = {
+    "full_sq": [89, 40.5, None],
+    "floor": [3, 12, 7],
+    "product_type": ["Investment", "OwnerOccupier", "Unknown"],
+}
+RECORDS = [dict(zip(COLUMNS, row)) for row in zip(*COLUMNS.values())]
+
+
+@pytest.mark.parametrize(
+    "preprocessor",
+    [
+        None,
+        FeaturePreprocessor({"product_type": {"OwnerOccupier": 0, "Investment": 1}}),
+    ],
+)
+@pytest.mark.parametrize("payload", [{"records": RECORDS}, {"columns": COLUMNS}])
+def test_schema_matches_build_feature_matrix(payload, preprocessor):
+    expected, _ = build_feature_matrix(payload, NAMES, preprocessor)
+    X = FeatureSchema(NAMES, preprocessor).matrix(codec.loads(json.dumps(payload)))
+    np.testing.assert_array_equal(X, expected)
+    assert X.dtype == np.float64 and X.shape == (3, 3)
+
+
+def test_schema_rejects_bad_payloads():
+    schema = FeatureSchema(NAMES)
+    with pytest.raises(KeyError):
+        schema.matrix({"records": [{"full_sq": 1.0}]})
+    with pytest.raises(KeyError):
+        schema.matrix({"columns": {"full_sq": [1.0]}})
+    with pytest.raises(ValueError):
+        schema.matrix({"columns": {**COLUMNS, "floor": [1, 2]}})
+    with pytest.raises(ValueError, match="floor"):
+        schema.matrix({"records": [{**RECORDS[0], "floor": "high"}]})
+    with pytest.raises(TypeError):
+        schema.matrix([1, 2, 3])
+    with pytest.raises(ValueError):
+        codec.loads(b"{not json")
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"records": [1, 2]},
+        {"records": [RECORDS[0], "row"]},
+        {"columns": {**COLUMNS, "floor": 3}},
+    ],
+)
+def test_malformed_rows_are_value_errors(payload):
+    with pytest.raises(ValueError):
+        FeatureSchema(NAMES).matrix(payload)
+    with pytest.raises(ValueError):
+        build_feature_matrix(payload, NAMES)
+
+
+def test_dumps_numpy_with_and_without_orjson(monkeypatch):
+    body = {"predictions": np.array([1.5, 2.0]), "count": np.int64(2)}
+    fast = json.loads(codec.dumps(body))
+    monkeypatch.setattr(codec, "orjson", None)
+    assert (
+        json.loads(codec.dumps(body)) == fast == {"predictions": [1.5, 2.0], "count": 2}
+    )
@@ -0,0 +1,229 @@
+# tests/test_data_ingestion.py
+"""
+Test suite for src/data_ingestion.py
+Ensures the streaming (chunked) pipeline matches the in-memory pipeline.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_ingestion import (
+    FeaturePreprocessor,
+    basic_clean,
+    drop_na,
+    encode_labels,
+    map_booleans,
+    pipeline_from_csv,
+    prepare_features_target,
+    read_csv_schema,
+    split_float32,
+    streaming_pipeline_from_csv,
+)
+
+
+@pytest.fixture
+def wide_csv(tmp_path):
+    """A CSV with the kept columns first and many columns that get dropped."""
+    rng = np.random.default_rng(0)
+    n = 53
+    df = pd.DataFrame(
+        {
+            "full_sq": rng.uniform(20, 150, n),
+            "life_sq": rng.uniform(10, 100, n),
+            "floor": rng.integers(1, 25, n),
+            "product_type": rng.choice(["Investment", "OwnerOccupier"], n),
+        }
+    )
+    df.loc[::9, "life_sq"] = np.nan
+    for i in range(30):
+        df[f"extra_{i}"] = rng.normal(size=n)
+    df["price_doc"] = rng.uniform(1e6, 1e7, n)
+    path = tmp_path / "train.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_schema_pushes_down_kept_columns(wide_csv):
+    usecols, dtypes = read_csv_schema(wide_csv)
+    assert usecols == ["full_sq", "life_sq", "floor", "product_type", "price_doc"]
+    assert dtypes["product_type"] == "object"
+    assert dtypes["floor"] == "float64"
+
+
+def test_streaming_matches_in_memory_pipeline(wide_csv):
+    df = pd.read_csv(wide_csv)
+    df = map_booleans(encode_labels(basic_clean(drop_na(df))))
+    X_expected, y_expected = prepare_features_target(df)
+
+    X, y = streaming_pipeline_from_csv(wide_csv, chunksize=7)
+
+    pd.testing.assert_frame_equal(
+        X, X_expected.reset_index(drop=True), check_dtype=False
+    )
+    pd.testing.assert_series_equal(y, y_expected.reset_index(drop=True))
+
+
+def test_streaming_peak_memory_stays_near_the_output_size(tmp_path):
+    import tracemalloc
+
+    rng = np.random.default_rng(0)
+    n = 100_000
+    df = pd.DataFrame(
+        {
+            "full_sq": rng.uniform(20, 150, n),
+            "life_sq": rng.uniform(10, 100, n),
+            "floor": rng.integers(1, 25, n),
+            "product_type": rng.choice(["Investment", "OwnerOccupier"], n),
+            "price_doc": rng.uniform(1e6, 1e7, n),
+        }
+    )
+    path = str(tmp_path / "train.csv")
+    df.to_csv(path, index=False)
+    del df
+
+    tracemalloc.start()
+    try:
+        X, y = streaming_pipeline_from_csv(path, chunksize=5_000, lean=True)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    output = X.memory_usage(deep=True).sum() + y.memory_usage(deep=True)
+    # Keeping every cleaned chunk and concatenating them peaked above 3x
+    assert peak < 2.5 * output
+
+
+def test_feature_cache_miss_then_hit(wide_csv, tmp_path, monkeypatch):
+    from src import feature_cache
+
+    cache_dir = str(tmp_path / "features")
+    X_built, y_built = feature_cache.load_features(wide_csv, cache_dir=cache_dir)
+    suffixes = sorted(os.path.splitext(n)[1] for n in os.listdir(cache_dir))
+    assert suffixes == [".arrow", ".json"]  # features + fitted preprocessor
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cache hit should not re-run the pipeline")
+
+    monkeypatch.setattr(feature_cache, "pipeline_from_csv", fail)
+    X, y = feature_cache.load_features(wide_csv, cache_dir=cache_dir)
+
+    pd.testing.assert_frame_equal(X, X_built)
+    pd.testing.assert_series_equal(y, y_built)
+
+
+def test_cached_features_are_views_of_the_mapped_file(tmp_path):
+    from src.feature_cache import read_features, write_features
+
+    X = pd.DataFrame({"full_sq": [40.0, np.nan, 89.0], "floor": [1, 5, 9]})
+    y = pd.Series([1.0e6, 2.0e6, 3.0e6], name="price_doc")
+    path = str(tmp_path / "features.arrow")
+    write_features(X, y, path)
+    X_read, y_read = read_features(path)
+
+    pd.testing.assert_frame_equal(X_read, X)
+    pd.testing.assert_series_equal(y_read, y)
+    # Copies would be writeable; Arrow-backed views of the map are not
+    for values in [X_read[c].to_numpy() for c in X_read] + [y_read.to_numpy()]:
+        assert not values.flags.writeable
+
+
+def test_feature_cache_key_tracks_source_and_config(wide_csv, monkeypatch):
+    from src import feature_cache
+
+    key = feature_cache.cache_key(wide_csv)
+    assert feature_cache.cache_key(wide_csv) == key
+
+    monkeypatch.setattr(feature_cache, "PIPELINE_VERSION", 2)
+    assert feature_cache.cache_key(wide_csv) != key
+    monkeypatch.undo()
+
+    os.utime(wide_csv, ns=(0, 0))  # a re-uploaded/rewritten train.csv
+    assert feature_cache.cache_key(wide_csv) != key
+
+
+def test_preprocessor_matches_label_encoder_and_boolean_map():
+    df = pd.DataFrame(
+        {
+            "product_type": ["OwnerOccupier", "Investment", "OwnerOccupier"],
+            "ecology": ["good", "poor", "excellent"],
+            "water_1line": ["yes", "no", None],
+        }
+    )
+    expected = map_booleans(encode_labels(df.copy()))
+
+    preprocessor = FeaturePreprocessor().fit(df)
+    pd.testing.assert_frame_equal(preprocessor.transform(df.copy()), expected)
+
+
+def test_preprocessor_round_trips_and_flags_unknown_categories(tmp_path):
+    df = pd.DataFrame({"product_type": ["OwnerOccupier", "Investment"]})
+    path = str(tmp_path / "model.pkl.preprocessor.json")
+    FeaturePreprocessor().fit(df).save(path)
+
+    loaded = FeaturePreprocessor.load(path)
+    out = loaded.transform_column("product_type", ["Investment", "Unknown", None])
+    np.testing.assert_array_equal(out, [0.0, np.nan, np.nan])
+    np.testing.assert_array_equal(
+        loaded.transform_column("water_1line", ["yes", "no", "maybe"]), [1, 0, 0]
+    )
+
+
+def test_preprocessor_keeps_numeric_boolean_flags():
+    # Clients sent yes/no columns as 0/1 before the encoder handled them
+    preprocessor = FeaturePreprocessor()
+    out = preprocessor.transform_column(
+        "culture_objects_top_25", [1, 0, "yes", "no", True, 1.0, None, "maybe"]
+    )
+    np.testing.assert_array_equal(out, [1, 0, 1, 0, 1, 1, 0, 0])
+    categorical = pd.Series(["yes", "1", None, "no"], dtype="category")
+    np.testing.assert_array_equal(
+        preprocessor.transform_column("water_1line", categorical), [1, 1, 0, 0]
+    )
+
+
+def test_preprocessor_refit_keeps_existing_codes():
+    preprocessor = FeaturePreprocessor(
+        mappings={"product_type": {"OwnerOccupier": 0, "Investment": 1}}
+    )
+    preprocessor.fit(pd.DataFrame({"product_type": ["Auction", "Investment"]}))
+
+    assert preprocessor.mappings["product_type"] == {
+        "OwnerOccupier": 0,
+        "Investment": 1,
+        "Auction": 2,
+    }
+
+
+@pytest.mark.parametrize("chunksize", [0, 7])
+def test_lean_pipeline_parses_features_as_float32(wide_csv, chunksize):
+    X_full, y_full = pipeline_from_csv(wide_csv, chunksize=0, lean=False)
+
+    X, y = pipeline_from_csv(wide_csv, chunksize=chunksize, lean=True)
+
+    assert (X.dtypes == np.float32).all()
+    assert y.dtype == np.float64
+    pd.testing.assert_frame_equal(
+        X.reset_index(drop=True),
+        X_full.astype(np.float32).reset_index(drop=True),
+    )
+    np.testing.assert_array_equal(y.to_numpy(), y_full.to_numpy())
+
+
+def test_split_float32_matches_train_test_split_without_copies(wide_csv):
+    from sklearn.model_selection import train_test_split
+
+    X, y = pipeline_from_csv(wide_csv, lean=True)
+    expected = train_test_split(X, y, test_size=0.25, random_state=3)
+
+    X_train, X_val, y_train, y_val = split_float32(X, y, 0.25, 3)
+
+    for ours, theirs in zip((X_train, X_val, y_train, y_val), expected):
+        pd.testing.assert_index_equal(ours.index, theirs.index)
+        np.testing.assert_array_equal(ours.to_numpy(), theirs.to_numpy())
+    train, val = X_train.to_numpy(), X_val.to_numpy()
+    assert train.dtype == np.float32 and train.flags.c_contiguous
+    # One matrix: the validation rows directly follow the training rows
+    assert val.ctypes.data == train.ctypes.data + train.nbytes
+    assert list(X_train.columns) == list(X.columns)
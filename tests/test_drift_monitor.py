@@ -0,0 +1,109 @@
+# tests/test_drift_monitor.py
+"""
+Test suite for src/drift_monitor.py
+Ensures drift scores react to shifted traffic while memory stays fixed.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.drift_monitor import (
+    DRIFT_PSI,
+    DriftMonitor,
+    ReferenceProfile,
+    VersionedDriftMonitor,
+    build_reference_profile,
+)
+
+
+def _features(n, seed, shift=0.0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "full_sq": rng.normal(60 + shift, 15, n),
+            "floor": rng.integers(1, 25, n).astype(float),
+        }
+    )
+
+
+@pytest.fixture
+def profile():
+    X = _features(5000, 0)
+    return build_reference_profile(X, X["full_sq"] * 1000)
+
+
+def _feed(monitor, profile, X, batch=50):
+    values = X.to_numpy()
+    for start in range(0, len(values), batch):
+        rows = values[start : start + batch]
+        monitor.observe(profile, rows, rows[:, 0] * 1000)
+
+
+def test_same_distribution_scores_low(profile):
+    monitor = DriftMonitor(window_rows=2000, update_every=100)
+    _feed(monitor, profile, _features(3000, 1))
+
+    scores = monitor.scores()
+    assert set(scores) == {"full_sq", "floor", "prediction"}
+    assert all(s["psi"] < 0.05 and s["ks"] < 0.1 for s in scores.values())
+
+
+def test_shifted_traffic_raises_scores_and_gauges(profile):
+    monitor = DriftMonitor(window_rows=2000, update_every=100)
+    _feed(monitor, profile, _features(3000, 1, shift=20))
+
+    scores = monitor.scores()
+    assert scores["full_sq"]["psi"] > 0.25 and scores["full_sq"]["ks"] > 0.3
+    assert scores["prediction"]["psi"] > 0.25
+    assert scores["floor"]["psi"] < 0.05
+    gauge = DRIFT_PSI.labels(model_version="", feature="full_sq")._value.get()
+    assert gauge == pytest.approx(scores["full_sq"]["psi"], rel=0.2)
+
+
+def test_memory_is_fixed_and_old_windows_roll_off(profile):
+    monitor = DriftMonitor(window_rows=1000, update_every=100)
+    _feed(monitor, profile, _features(1000, 1, shift=20))
+    shapes = [c.shape for c in monitor._current]
+
+    # Two full windows of normal traffic push the shifted rows out entirely
+    _feed(monitor, profile, _features(2000, 2))
+
+    assert [c.shape for c in monitor._current] == shapes
+    assert monitor.scores()["full_sq"]["psi"] < 0.05
+
+
+def test_interleaved_versions_keep_their_own_windows(profile):
+    """Canary and primary traffic alternate without resetting each other."""
+    canary_profile = build_reference_profile(
+        _features(5000, 3, shift=20), _features(5000, 3, shift=20)["full_sq"] * 1000
+    )
+    monitors = VersionedDriftMonitor(max_versions=2, window_rows=2000, update_every=100)
+    primary, canary = _features(3000, 1).to_numpy(), _features(3000, 2).to_numpy()
+    for start in range(0, 3000, 50):
+        for version, ref, rows in (
+            ("v1", profile, primary),
+            ("v2", canary_profile, canary),
+        ):
+            batch = rows[start : start + 50]
+            monitors.observe(version, ref, batch, batch[:, 0] * 1000)
+
+    # v1 matches its training data; v2 is scored against its own profile
+    assert monitors.scores("v1")["full_sq"]["psi"] < 0.05
+    assert monitors.scores("v2")["full_sq"]["psi"] > 0.25
+    # 3000 rows: one full window rolled over, none discarded by the other version
+    assert monitors.monitor("v1")._current_rows == 1000
+    gauge = DRIFT_PSI.labels(model_version="v2", feature="full_sq")._value.get()
+    assert gauge > 0.25
+
+    monitors.observe("v3", profile, primary[:50], primary[:50, 0])
+    assert monitors.scores("v1") and not monitors.scores("v2")  # LRU eviction
+
+
+def test_profile_round_trip(profile, tmp_path):
+    path = str(tmp_path / "model.pkl.drift_profile.json")
+    profile.save(path)
+    loaded = ReferenceProfile.load(path)
+    assert loaded.columns == profile.columns
+    for a, b in zip(loaded.edges, profile.edges):
+        np.testing.assert_array_equal(a, b)
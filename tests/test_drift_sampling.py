@@ -0,0 +1,93 @@
+# tests/test_drift_sampling.py
+"""
+Test suite for monitoring/drift_sampling.py
+Ensures bounded stratified samples, correct drift flags and reference caching.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from monitoring import drift_sampling
+from monitoring.drift_sampling import (
+    StratifiedReservoir,
+    generate_sampled_drift_report,
+)
+
+
+def _frame(n, seed, shift=0.0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "full_sq": rng.normal(60 + shift, 15, n),
+            "floor": rng.integers(1, 25, n),
+            "product_type": rng.choice(
+                ["Investment", "OwnerOccupier"], n, p=[0.8, 0.2]
+            ),
+            "price_doc": rng.uniform(1e6, 1e7, n),
+        }
+    )
+
+
+def test_reservoir_is_bounded_and_keeps_strata_shares():
+    reservoir = StratifiedReservoir(500, strata_col="product_type", seed=0)
+    for seed in range(10):
+        reservoir.add(_frame(1000, seed))
+
+    sample = reservoir.sample()
+
+    assert reservoir.rows_seen == 10_000
+    assert abs(len(sample) - 500) <= 1
+    share = (sample["product_type"] == "Investment").mean()
+    assert share == pytest.approx(0.8, abs=0.03)
+
+
+def test_reservoir_total_is_capped_across_many_strata():
+    reservoir = StratifiedReservoir(500, strata_col="district", seed=0)
+    rng = np.random.default_rng(0)
+    for seed in range(10):
+        frame = _frame(1000, seed)
+        frame["district"] = rng.integers(0, 50, len(frame))
+        reservoir.add(frame)
+
+    assert reservoir.rows_held <= 500 + 50
+    assert abs(len(reservoir.sample()) - 500) <= 50
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_report_flags_only_shifted_columns(tmp_path, workers):
+    reference = tmp_path / "train.csv"
+    current = tmp_path / "test.csv"
+    _frame(20_000, 0).to_csv(reference, index=False)
+    _frame(20_000, 2, shift=5).to_csv(current, index=False)
+
+    report = generate_sampled_drift_report(
+        str(reference),
+        str(current),
+        output_path=str(tmp_path / "drift.json"),
+        sample_size=5000,
+        workers=workers,
+        cache_dir=str(tmp_path / "cache"),
+    )
+
+    drift = {c["column"]: c["drift"] for c in report["columns"]}
+    assert drift == {"full_sq": True, "floor": False, "product_type": False}
+    assert os.path.exists(tmp_path / "drift.json")
+
+
+def test_reference_stats_are_cached(tmp_path, monkeypatch):
+    reference = _frame(2000, 0)
+    cache_dir = str(tmp_path / "cache")
+    first = drift_sampling.cached_reference_stats(reference, 500, cache_dir=cache_dir)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("reference should not be re-sampled")
+
+    monkeypatch.setattr(drift_sampling, "sample_rows", fail)
+    second = drift_sampling.cached_reference_stats(reference, 500, cache_dir=cache_dir)
+
+    np.testing.assert_array_equal(
+        first["full_sq"]["values"], second["full_sq"]["values"]
+    )
@@ -0,0 +1,49 @@
+# tests/test_hyperparameter_search.py
+"""
+Test suite for src/hyperparameter_search.py
+Ensures trials run in worker processes and losing trials stop early.
+"""
+
+import numpy as np
+import pytest
+
+from src.hyperparameter_search import candidate_params, run_search
+
+
+@pytest.fixture
+def split():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 1, (400, 4))
+    y = X[:, 0] * 10 + np.sin(X[:, 1] * 6) * 3 + rng.normal(0, 0.1, 400)
+    return X[:300], y[:300], X[300:], y[300:]
+
+
+def test_candidate_params_grid_and_random():
+    space = {"n_estimators": [4, 8], "max_depth": [None, 2]}
+    assert len(candidate_params(space, n_trials=10, mode="grid")) == 4
+    sampled = candidate_params(space, n_trials=3, mode="random")
+    assert len(sampled) == 3 and all(p["n_estimators"] in (4, 8) for p in sampled)
+
+
+def test_search_prunes_losing_trials(split):
+    good = {"n_estimators": 8, "max_depth": None, "min_samples_leaf": 1}
+    bad = {"n_estimators": 8, "max_depth": 1, "min_samples_leaf": 1}
+    results = []
+
+    # One worker runs trials in submission order, so the good trial sets the bar
+    best = run_search(*split, [good, bad], workers=1, on_result=results.append)
+
+    by_trial = {r["trial"]: r for r in results}
+    assert best["params"] == good
+    assert not by_trial[0]["pruned"] and by_trial[0]["n_trees"] == 8
+    assert by_trial[1]["pruned"] and by_trial[1]["n_trees"] < 8
+
+
+def test_search_runs_trials_in_parallel_workers(split):
+    candidates = [{"n_estimators": 4, "min_samples_leaf": leaf} for leaf in (1, 2, 4)]
+    results = []
+
+    best = run_search(*split, candidates, workers=2, on_result=results.append)
+
+    assert sorted(r["trial"] for r in results) == [0, 1, 2]
+    assert best["rmse"] == min(r["rmse"] for r in results if not r["pruned"])
@@ -0,0 +1,106 @@
+# tests/test_incremental_training.py
+"""
+Test suite for src/incremental_training.py
+Ensures warm-started forests grow, retire their oldest trees and keep lineage.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor
+
+from src.incremental_training import (
+    grow_forest,
+    log_lineage_to_mlflow,
+    partition_cutoff,
+    recent_cutoff,
+    recent_partition,
+)
+from src.tracking import BufferedTracker
+
+
+def _frame(n, seed):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        {"full_sq": rng.uniform(20, 150, n), "floor": rng.integers(1, 25, n)}
+    )
+    return X, X["full_sq"] * 1000 + rng.normal(0, 100, n)
+
+
+@pytest.fixture
+def deployed():
+    X, y = _frame(200, 0)
+    return ExtraTreesRegressor(n_estimators=6, random_state=0).fit(X, y)
+
+
+def test_grow_forest_adds_then_retires_oldest(deployed):
+    original = list(deployed.estimators_)
+    X_new, y_new = _frame(50, 1)
+
+    summary = grow_forest(deployed, X_new, y_new, "run-2", n_new_trees=4, max_trees=8)
+
+    assert summary["trees_added"] == 4 and summary["trees_retired"] == 2
+    assert len(deployed.estimators_) == deployed.n_estimators == 8
+    assert deployed.estimators_[:4] == original[2:]  # two oldest trees retired
+    assert deployed.tree_sources_ == ["initial"] * 4 + ["run-2"] * 4
+    assert summary["tree_sources"] == {"initial": 4, "run-2": 4}
+    assert deployed.predict(X_new).shape == (50,)
+
+
+def test_grow_forest_rejects_different_features(deployed):
+    X_new, y_new = _frame(20, 2)
+    with pytest.raises(ValueError):
+        grow_forest(deployed, X_new[["floor", "full_sq"]], y_new, "run-2")
+
+
+def test_recent_partition_uses_file_order():
+    X, y = _frame(100, 3)
+    shuffled = X.sample(frac=1, random_state=0)
+
+    X_recent, y_recent = recent_partition(
+        shuffled, y[shuffled.index], recent_cutoff(X.index, 0.1)
+    )
+
+    assert sorted(X_recent.index) == list(range(90, 100))
+    assert (y_recent.index == X_recent.index).all()
+
+
+def test_next_partition_starts_after_the_recorded_cutoff(deployed):
+    X, y = _frame(300, 5)
+    # No recorded cutoff yet: the trailing fraction
+    assert partition_cutoff(deployed, X.index[:200], 0.1) == 180
+
+    grow_forest(deployed, X[:200], y[:200], "run-2", n_new_trees=2, data_cutoff=199)
+    X_recent, _ = recent_partition(X, y, partition_cutoff(deployed, X.index))
+    assert list(X_recent.index) == list(range(200, 300))
+
+    summary = grow_forest(
+        deployed, X_recent, y[X_recent.index], "run-3", n_new_trees=2, data_cutoff=299
+    )
+    assert summary["data_cutoff"] == 299
+    with pytest.raises(ValueError):
+        partition_cutoff(deployed, X.index)
+
+
+def test_lineage_goes_through_the_tracker(deployed):
+    class Client:
+        def __init__(self):
+            self.batches, self.artifacts = [], []
+
+        def log_batch(self, run_id, metrics=(), params=None, tags=None):
+            self.batches.append((run_id, params, tags))
+
+        def log_artifact(self, run_id, local_path, artifact_path=None):
+            with open(local_path) as fh:
+                self.artifacts.append((run_id, artifact_path, json.load(fh)))
+
+    X_new, y_new = _frame(20, 4)
+    summary = grow_forest(deployed, X_new, y_new, "run-2", n_new_trees=2)
+    client = Client()
+    with BufferedTracker("run-2", client, flush_interval=60) as tracker:
+        log_lineage_to_mlflow(summary, "v1", tracker)
+
+    assert client.artifacts == [("run-2", "lineage", {"initial": 6, "run-2": 2})]
+    assert client.batches[0][2]["parent_model_version"] == "v1"
@@ -0,0 +1,94 @@
+# tests/test_model_cache.py
+"""
+Test suite for src/model_cache.py against a moto S3 stand-in.
+Ensures:
+- unchanged objects are served from cache without a second download
+- a new object version is downloaded under a new name
+- concurrent fetches download once
+- old versions are evicted by size
+"""
+
+import threading
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from src.model_cache import ModelCache
+
+BUCKET = "models-bucket"
+KEY = "models/latest_model.pkl"
+
+
+class CountingS3:
+    """Wraps a boto3 client and counts object downloads."""
+
+    def __init__(self, client):
+        self.client = client
+        self.downloads = 0
+        self._lock = threading.Lock()
+
+    def head_object(self, **kwargs):
+        return self.client.head_object(**kwargs)
+
+    def get_object(self, **kwargs):
+        with self._lock:
+            self.downloads += 1
+        return self.client.get_object(**kwargs)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        client.put_object(Bucket=BUCKET, Key=KEY, Body=b"model-v1")
+        yield CountingS3(client)
+
+
+def test_second_fetch_is_a_cache_hit(s3, tmp_path):
+    cache = ModelCache(str(tmp_path))
+    first = cache.fetch(s3, BUCKET, KEY)
+    second = cache.fetch(s3, BUCKET, KEY)
+    assert first == second
+    assert s3.downloads == 1
+    with open(first, "rb") as fh:
+        assert fh.read() == b"model-v1"
+
+
+def test_new_version_is_downloaded(s3, tmp_path):
+    cache = ModelCache(str(tmp_path))
+    first = cache.fetch(s3, BUCKET, KEY)
+    s3.client.put_object(Bucket=BUCKET, Key=KEY, Body=b"model-v2")
+    second = cache.fetch(s3, BUCKET, KEY)
+    assert first != second
+    assert s3.downloads == 2
+    with open(second, "rb") as fh:
+        assert fh.read() == b"model-v2"
+
+
+def test_concurrent_fetches_download_once(s3, tmp_path):
+    cache = ModelCache(str(tmp_path))
+    paths = []
+    threads = [
+        threading.Thread(target=lambda: paths.append(cache.fetch(s3, BUCKET, KEY)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(paths)) == 1
+    assert s3.downloads == 1
+
+
+def test_old_versions_evicted_by_size(s3, tmp_path):
+    cache = ModelCache(str(tmp_path), max_bytes=10)
+    first = cache.fetch(s3, BUCKET, KEY)
+    s3.client.put_object(Bucket=BUCKET, Key=KEY, Body=b"model-v2")
+    second = cache.fetch(s3, BUCKET, KEY)
+    assert [e[0] for e in cache.entries()] == [second]
+    assert first != second
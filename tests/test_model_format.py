@@ -0,0 +1,108 @@
+# tests/test_model_format.py
+"""
+Test suite for src/model_format.py
+Ensures .ftree files route rows exactly like the fitted forest and reject
+corrupted files.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor
+
+from src.model_format import (
+    LEAF_ENCODINGS,
+    ModelFormatError,
+    float32_floor,
+    read_forest,
+    write_forest,
+)
+from src.tree_engine import CompiledForest
+
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(1000, 4)), columns=["a", "b", "c", "d"])
+    X.loc[::7, "b"] = np.nan
+    y = X["a"] * 3e6 + X["c"].pow(2) * 1e6 + 8e6
+    return ExtraTreesRegressor(n_estimators=10, random_state=0).fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def rows():
+    X = np.random.default_rng(1).normal(size=(500, 4))
+    X[::5, 1] = np.nan
+    return X
+
+
+@pytest.mark.parametrize("encoding", LEAF_ENCODINGS)
+def test_routing_is_exact_for_every_encoding(forest, rows, encoding, tmp_path):
+    path = str(tmp_path / "model.ftree")
+    write_forest(forest, path, encoding)
+    loaded = read_forest(path)
+    reference = CompiledForest.from_estimator(forest)
+    np.testing.assert_array_equal(
+        loaded.leaf_indices(rows), reference.leaf_indices(rows)
+    )
+    assert list(loaded.feature_names_in_) == ["a", "b", "c", "d"]
+
+
+@pytest.mark.parametrize("encoding", LEAF_ENCODINGS)
+def test_quantization_error_is_bounded(forest, rows, encoding, tmp_path):
+    path = str(tmp_path / "model.ftree")
+    write_forest(forest, path, encoding)
+    expected = forest.predict(pd.DataFrame(rows, columns=forest.feature_names_in_))
+    error = np.abs(read_forest(path, use_mmap=False).predict(rows) - expected)
+    leaves = np.concatenate([e.tree_.value.ravel() for e in forest.estimators_])
+    if encoding.startswith("uint"):
+        # Half a quantization step per leaf, so at most that for the mean
+        step = (leaves.max() - leaves.min()) / np.iinfo(encoding).max
+        assert error.max() <= step / 2 * (1 + 1e-9)
+    else:
+        eps = np.finfo(encoding).eps
+        assert error.max() <= eps * np.abs(leaves).max()
+
+
+def test_float32_floor_keeps_comparisons():
+    t = np.random.default_rng(3).normal(size=10_000)
+    x = np.random.default_rng(4).normal(size=10_000).astype(np.float32)
+    floored = float32_floor(t)
+    assert np.all(floored.astype(np.float64) <= t)
+    np.testing.assert_array_equal(x.astype(np.float64) <= t, x <= floored)
+
+
+def test_corrupted_files_are_rejected(forest, tmp_path):
+    path = str(tmp_path / "model.ftree")
+    write_forest(forest, path)
+    data = bytearray(open(path, "rb").read())
+
+    flipped = bytearray(data)
+    flipped[len(data) // 2] ^= 0xFF
+    (tmp_path / "flipped.ftree").write_bytes(flipped)
+    with pytest.raises(ModelFormatError, match="Checksum"):
+        read_forest(str(tmp_path / "flipped.ftree"))
+
+    (tmp_path / "magic.ftree").write_bytes(b"PICKLE!!" + data[8:])
+    with pytest.raises(ModelFormatError, match="magic"):
+        read_forest(str(tmp_path / "magic.ftree"))
+
+    (tmp_path / "short.ftree").write_bytes(data[:16])
+    with pytest.raises(ModelFormatError):
+        read_forest(str(tmp_path / "short.ftree"))
+
+
+def test_unknown_leaf_encoding(forest, tmp_path):
+    with pytest.raises(ValueError):
+        write_forest(forest, str(tmp_path / "model.ftree"), "float16")
+
+
+def test_compact_engine_loads_ftree(forest, rows, tmp_path):
+    from src.inference import load_model_file
+
+    path = str(tmp_path / "model.pkl.ftree")
+    write_forest(forest, path, "float64")
+    model = load_model_file(path, engine="compact")
+    np.testing.assert_allclose(
+        model.predict(rows), CompiledForest.from_estimator(forest).predict(rows)
+    )
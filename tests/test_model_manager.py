@@ -0,0 +1,180 @@
+# tests/test_model_manager.py
+"""
+Test suite for the S3 model source in src/model_manager.py, against a moto
+S3 stand-in.
+Ensures a version is always loaded as exactly that object, also after a
+newer model has replaced it under the same key, together with the sidecars
+uploaded with it.
+"""
+
+import joblib
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import ExtraTreesRegressor
+
+from src import s3_transfer
+from src.data_ingestion import PREPROCESSOR_SUFFIX, FeaturePreprocessor
+from src.drift_monitor import DRIFT_PROFILE_SUFFIX, ReferenceProfile
+from src.inference import sidecar_metadata
+from src.model_cache import ModelCache
+from src.model_format import COMPACT_MODEL_SUFFIX, write_forest
+from src.model_manager import S3ModelSource
+
+BUCKET = "models-bucket"
+KEY = "models/latest_model.pkl"
+
+
+def constant_model(value):
+    return DummyRegressor(strategy="constant", constant=value).fit([[0.0]], [value])
+
+
+@pytest.fixture
+def s3(monkeypatch, tmp_path):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    monkeypatch.setattr(
+        "src.inference.ModelCache", lambda: ModelCache(str(tmp_path / "cache"))
+    )
+    with mock_aws():
+        s3_transfer.reset_client()
+        client = s3_transfer.client()
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+    s3_transfer.reset_client()
+
+
+def upload_model(tmp_path, value, key=KEY, metadata=None):
+    path = str(tmp_path / f"model-{value}.pkl")
+    joblib.dump(constant_model(value), path)
+    return s3_transfer.upload_file(path, BUCKET, key, metadata=metadata)
+
+
+def upload_release(tmp_path, value):
+    """Like train.py: sidecars first, then the model recording their versions."""
+    path = str(tmp_path / f"model-{value}")
+    FeaturePreprocessor({"product_type": {f"type-{value}": 1}}).save(
+        path + PREPROCESSOR_SUFFIX
+    )
+    ReferenceProfile(["full_sq"], [[value]], [[0.5, 0.5, 0.0]]).save(
+        path + DRIFT_PROFILE_SUFFIX
+    )
+    sidecars = {
+        suffix: s3_transfer.upload_file(path + suffix, BUCKET, KEY + suffix)
+        for suffix in (PREPROCESSOR_SUFFIX, DRIFT_PROFILE_SUFFIX)
+    }
+    return upload_model(tmp_path, value, metadata=sidecar_metadata(sidecars))
+
+
+def predicted(model):
+    return float(model.predict([[0.0]])[0])
+
+
+def test_versioned_bucket_loads_the_labelled_version(s3, tmp_path):
+    s3.put_bucket_versioning(
+        Bucket=BUCKET, VersioningConfiguration={"Status": "Enabled"}
+    )
+    first = upload_model(tmp_path, 1.0)
+    source = S3ModelSource(BUCKET, KEY)
+    assert source.latest_version() == first.version == first.version_id
+
+    second = upload_model(tmp_path, 2.0)
+    assert source.latest_version() == second.version
+    # Not pinned, yet the handle labelled `first` must hold the first object
+    assert predicted(source.load(first.version)) == 1.0
+    assert predicted(source.load(second.version)) == 2.0
+    with pytest.raises(LookupError):
+        source.load("no-such-version")
+
+
+def test_unversioned_bucket_refuses_a_replaced_version(s3, tmp_path):
+    first = upload_model(tmp_path, 1.0)
+    source = S3ModelSource(BUCKET, KEY)
+    assert first.version_id is None and first.version == first.etag.strip('"')
+    assert predicted(source.load(first.version)) == 1.0
+
+    upload_model(tmp_path, 2.0)
+    with pytest.raises(LookupError):
+        source.load(first.version)
+
+
+def test_versioned_bucket_pairs_each_model_with_its_encoder(s3, tmp_path):
+    s3.put_bucket_versioning(
+        Bucket=BUCKET, VersioningConfiguration={"Status": "Enabled"}
+    )
+    first = upload_release(tmp_path, 1.0)
+    second = upload_release(tmp_path, 2.0)
+    source = S3ModelSource(BUCKET, KEY)
+    assert source.load_preprocessor(first.version).mappings == {
+        "product_type": {"type-1.0": 1}
+    }
+    assert source.load_preprocessor(second.version).mappings == {
+        "product_type": {"type-2.0": 1}
+    }
+
+
+def test_replaced_or_unrecorded_encoders_are_refused(s3, tmp_path):
+    first = upload_release(tmp_path, 1.0)
+    source = S3ModelSource(BUCKET, KEY)
+    # A new encoder lands before its model (the window during an upload)
+    FeaturePreprocessor({}).save(str(tmp_path / "next.json"))
+    s3_transfer.upload_file(
+        str(tmp_path / "next.json"), BUCKET, KEY + PREPROCESSOR_SUFFIX
+    )
+    with pytest.raises(ClientError):
+        source.load_preprocessor(first.version)
+
+    s3.put_bucket_versioning(
+        Bucket=BUCKET, VersioningConfiguration={"Status": "Enabled"}
+    )
+    legacy = upload_model(tmp_path, 3.0)  # no recorded sidecar versions
+    assert source.load_preprocessor(legacy.version).mappings == {}
+    upload_release(tmp_path, 4.0)
+    with pytest.raises(LookupError):
+        source.load_preprocessor(legacy.version)
+
+
+def test_drift_profile_follows_the_model_version(s3, tmp_path):
+    s3.put_bucket_versioning(
+        Bucket=BUCKET, VersioningConfiguration={"Status": "Enabled"}
+    )
+    first = upload_release(tmp_path, 1.0)
+    upload_release(tmp_path, 2.0)
+    source = S3ModelSource(BUCKET, KEY)
+    assert source.load_reference_profile(first.version).edges[0].tolist() == [1.0]
+
+    legacy = upload_model(tmp_path, 3.0)
+    upload_release(tmp_path, 4.0)
+    # Not identifiable: drift monitoring is switched off rather than wrong
+    assert source.load_reference_profile(legacy.version) is None
+
+
+def test_compact_engine_loads_the_forest_saved_with_the_version(
+    s3, tmp_path, monkeypatch
+):
+    monkeypatch.setattr("src.inference.INFERENCE_ENGINE", "compact")
+    s3.put_bucket_versioning(
+        Bucket=BUCKET, VersioningConfiguration={"Status": "Enabled"}
+    )
+
+    def upload_compact(value, record=True):
+        path = str(tmp_path / f"model-{value}{COMPACT_MODEL_SUFFIX}")
+        forest = ExtraTreesRegressor(n_estimators=1).fit([[0.0], [1.0]], [value] * 2)
+        write_forest(forest, path)
+        stats = s3_transfer.upload_file(path, BUCKET, KEY + COMPACT_MODEL_SUFFIX)
+        metadata = sidecar_metadata({COMPACT_MODEL_SUFFIX: stats}) if record else None
+        return upload_model(tmp_path, value, metadata=metadata)
+
+    first = upload_compact(1.0)
+    upload_compact(2.0)
+    source = S3ModelSource(BUCKET, KEY)
+    assert predicted(source.load(first.version)) == 1.0
+
+    legacy = upload_compact(3.0, record=False)
+    assert predicted(source.load(legacy.version)) == 3.0  # current: latest .ftree
+    upload_compact(4.0)
+    with pytest.raises(LookupError):
+        source.load(legacy.version)
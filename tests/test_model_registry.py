@@ -0,0 +1,173 @@
+# tests/test_model_registry.py
+"""
+Test suite for src/model_registry.py
+Ensures weighted and header routing, the resident-version cap, and shadow
+scoring that runs off the request path and sheds load when behind.
+"""
+
+import threading
+from collections import Counter
+
+import numpy as np
+import pytest
+from prometheus_client import REGISTRY
+from sklearn.dummy import DummyRegressor
+
+from src.model_manager import ModelHandle
+from src.model_registry import SHADOW_DELTA, SHADOW_DROPPED, ModelRegistry
+
+
+def constant_model(value):
+    return DummyRegressor(strategy="constant", constant=value).fit([[0.0]], [value])
+
+
+class FakeManager:
+    """Primary handle plus load_version serving constant models by version."""
+
+    def __init__(self):
+        self.current = ModelHandle(constant_model(100.0), "v1")
+        self.loaded = []
+
+    def load_version(self, version, pinned=True):
+        self.loaded.append(version)
+        return ModelHandle(constant_model(100.0 + len(self.loaded)), version)
+
+
+@pytest.fixture
+def registry():
+    registry = ModelRegistry(FakeManager(), max_resident=3)
+    yield registry
+    registry.shutdown()
+
+
+def test_weighted_and_header_routing(registry, monkeypatch):
+    registry.load("v2")
+    registry.set_routing({"v2": 0.25})
+    draws = iter(np.linspace(0, 1, 400, endpoint=False))
+    monkeypatch.setattr("src.model_registry.random.random", lambda: next(draws))
+    routes = Counter(registry.route()[0].version for _ in range(400))
+    assert routes == {"v2": 100, "v1": 300}
+
+    handle, route = registry.route("v2")
+    assert (handle.version, route) == ("v2", "header")
+    with pytest.raises(LookupError):
+        registry.route("v9")
+    assert registry.status()["weights"] == {"v2": 0.25, "v1": 0.75}
+
+
+def test_resident_cap_evicts_versions_without_traffic(registry):
+    registry.load("v2")
+    registry.load("v3")
+    assert registry.versions() == ["v1", "v2", "v3"]
+    registry.load("v4")  # v2 is the oldest version carrying no traffic
+    assert registry.versions() == ["v1", "v3", "v4"]
+    registry.load("v3")  # already resident: not loaded again
+    assert registry.manager.loaded == ["v2", "v3", "v4"]
+
+    registry.set_routing({"v3": 0.1}, shadow="v4")
+    with pytest.raises(ValueError):
+        registry.load("v5")
+    with pytest.raises(ValueError):
+        registry.unload("v3")
+    registry.set_routing({}, shadow="v4")
+    registry.unload("v3")
+    assert registry.versions() == ["v1", "v4"]
+
+
+def test_resident_gauge_counts_a_promoted_primary_once(registry):
+    registry.load("v2")
+    registry.load("v3")
+    assert REGISTRY.get_sample_value("models_resident") == 3
+
+    registry.manager.current = registry.get("v2")
+    assert REGISTRY.get_sample_value("models_resident") == 2
+
+
+def test_invalid_routing_is_rejected(registry):
+    registry.load("v2")
+    with pytest.raises(ValueError):
+        registry.set_routing({"v2": 1.5})
+    with pytest.raises(ValueError):
+        registry.set_routing({"v2": -0.1})
+    with pytest.raises(KeyError):
+        registry.set_routing({"v9": 0.1})
+    with pytest.raises(KeyError):
+        registry.set_routing(shadow="v9")
+
+
+def _delta_count(version):
+    return sum(
+        s.value
+        for m in SHADOW_DELTA.collect()
+        for s in m.samples
+        if s.name.endswith("_count") and s.labels["model_version"] == version
+    )
+
+
+def test_shadow_scores_in_background(registry):
+    shadow = registry.load("v2")  # constant 101 vs the primary's 100
+    registry.set_routing(shadow="v2", shadow_sample=1.0)
+    before = _delta_count("v2")
+    payload = {"records": [{"full_sq": 0.0}] * 3}
+    assert registry.shadow(registry.primary, payload, np.full(3, 100.0))
+    assert registry.shadow(registry.primary, {"columns": {"x": [0]}}, [100.0])
+    assert not registry.shadow(shadow, payload, np.full(3, 101.0))  # never itself
+    assert registry.wait_for_shadow(timeout=5)
+    assert _delta_count("v2") == before + 2
+
+
+def test_shadow_builds_its_own_features(registry):
+    """The shadow encodes the raw payload with its own schema and encoder."""
+    import pandas as pd
+
+    from src.data_ingestion import FeaturePreprocessor
+    from src.model_registry import SHADOW_FAILED
+
+    X = pd.DataFrame({"full_sq": [40.0, 80.0], "product_type": [0, 1]})
+    model = DummyRegressor().fit(X, [1.0, 2.0])
+    seen = []
+    model.predict = lambda X: seen.append(np.array(X)) or np.full(len(X), 1.5)
+    encoder = FeaturePreprocessor({"product_type": {"Investment": 7}})
+    registry.manager.load_version = lambda version, pinned=True: ModelHandle(
+        model, version, encoder
+    )
+    registry.load("v2")
+    registry.set_routing(shadow="v2", shadow_sample=1.0)
+    failed = SHADOW_FAILED.labels("v2")._value.get()
+
+    record = {"product_type": "Investment", "full_sq": 50, "ignored": 1}
+    # The primary (fitted without names) saw a 1-column matrix of its own
+    assert registry.shadow(registry.primary, {"records": [record]}, [100.0])
+    assert registry.shadow(registry.primary, {"records": [{"floor": 1}]}, [100.0])
+    assert registry.wait_for_shadow(timeout=5)
+    np.testing.assert_array_equal(seen[0], [[50.0, 7.0]])
+    assert SHADOW_FAILED.labels("v2")._value.get() == failed + 1
+
+
+class BlockingModel:
+    """Shadow model whose predict waits until released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def predict(self, X):
+        self.started.set()
+        self.release.wait(5)
+        return np.full(len(X), 100.0)
+
+
+def test_shadow_drops_when_behind():
+    registry = ModelRegistry(FakeManager(), shadow_max_pending=2)
+    registry.load("v2").model = blocking = BlockingModel()
+    registry.set_routing(shadow="v2", shadow_sample=1.0)
+    dropped = SHADOW_DROPPED._value.get()
+    payload = {"records": [{"full_sq": 0.0}]}
+    assert registry.shadow(registry.primary, payload, [100.0])
+    assert blocking.started.wait(5)  # the worker is now busy
+    queued = [registry.shadow(registry.primary, payload, [100.0]) for _ in range(5)]
+    blocking.release.set()
+    assert registry.wait_for_shadow(timeout=5)
+    registry.shutdown()
+    assert queued == [True, True, False, False, False]
+    assert SHADOW_DROPPED._value.get() == dropped + 3
@@ -0,0 +1,27 @@
+# tests/test_peak_memory.py
+"""
+Test suite for src/peak_memory.py
+Ensures each stage reports its own peak RSS and metrics are named per stage.
+"""
+
+import sys
+
+import numpy as np
+import pytest
+
+from src.peak_memory import PeakMemory
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="per-stage peaks need /proc")
+def test_stages_report_their_own_peak():
+    memory = PeakMemory()
+    with memory.stage("allocate"):
+        block = np.ones(32 * 1024 * 1024 // 8)  # 32 MB, touched
+        del block
+    with memory.stage("idle"):
+        pass
+
+    metrics = memory.metrics()
+    assert set(metrics) == {"peak_rss_mb_allocate", "peak_rss_mb_idle", "peak_rss_mb"}
+    assert metrics["peak_rss_mb"] == metrics["peak_rss_mb_allocate"]
+    assert metrics["peak_rss_mb_allocate"] >= metrics["peak_rss_mb_idle"] + 16
@@ -0,0 +1,83 @@
+# tests/test_prediction_cache.py
+"""
+Test suite for src/prediction_cache.py
+Ensures:
+- keys are canonical and version-scoped
+- LRU size bound and TTL expiry evict entries
+- the shared backend fills the local tier
+"""
+
+import time
+
+import numpy as np
+
+from src.prediction_cache import InMemoryBackend, PredictionCache, cache_key
+
+
+def test_keys_are_canonical_and_version_scoped():
+    row = np.array([89.0, -0.0, np.nan])
+    assert cache_key("v1", row) == cache_key("v1", np.array([89, 0.0, float("nan")]))
+    assert cache_key("v1", row) != cache_key("v2", row)
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = PredictionCache(max_entries=2, ttl=60)
+    cache.set(b"a", 1.0)
+    cache.set(b"b", 2.0)
+    assert cache.get(b"a") == 1.0  # a is now most recently used
+    cache.set(b"c", 3.0)
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") == 1.0
+    assert len(cache) == 2
+
+
+def test_ttl_expiry():
+    cache = PredictionCache(max_entries=10, ttl=0.01)
+    cache.set(b"a", 1.0)
+    time.sleep(0.02)
+    assert cache.get(b"a") is None
+    assert len(cache) == 0
+
+
+def test_shared_backend_populates_local_tier():
+    shared = InMemoryBackend()
+    writer = PredictionCache(max_entries=10, ttl=60, backend=shared)
+    reader = PredictionCache(max_entries=10, ttl=60, backend=shared)
+    writer.set_many({b"a": 1.0, b"b": 2.0})
+    assert reader.get_many([b"a", b"b", b"c"]) == [1.0, 2.0, None]
+    reader.backend = None
+    assert reader.get(b"a") == 1.0
+
+
+def test_disabled_cache_never_hits():
+    cache = PredictionCache(max_entries=0)
+    cache.set(b"a", 1.0)
+    assert cache.get(b"a") is None
+
+
+def test_async_access_calls_the_shared_tier_off_the_event_loop():
+    import asyncio
+    import threading
+
+    class ThreadRecordingBackend(InMemoryBackend):
+        threads = set()
+
+        def get_many(self, keys):
+            self.threads.add(threading.get_ident())
+            return super().get_many(keys)
+
+        def set_many(self, items, ttl):
+            self.threads.add(threading.get_ident())
+            super().set_many(items, ttl)
+
+    shared = ThreadRecordingBackend()
+    writer = PredictionCache(max_entries=10, ttl=60, backend=shared)
+    reader = PredictionCache(max_entries=10, ttl=60, backend=shared)
+
+    async def run():
+        await writer.aset(b"a", 1.0)
+        return await reader.aget(b"a"), await reader.aget(b"b")
+
+    assert asyncio.run(run()) == (1.0, None)
+    assert reader.get(b"a") == 1.0  # now in the local tier
+    assert shared.threads and threading.get_ident() not in shared.threads
@@ -0,0 +1,53 @@
+# tests/test_prediction_log.py
+"""
+Test suite for src/prediction_log.py
+Ensures records are written in the background to rotated JSONL / Parquet
+files that read back intact, and that a full buffer drops instead of blocking.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from src.prediction_log import LOG_DROPPED, PredictionLog, read_records
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "parquet"])
+def test_records_round_trip_through_rotated_files(tmp_path, fmt):
+    log = PredictionLog(str(tmp_path), fmt=fmt, flush_interval=60, rotate_mb=1e-6)
+    assert log.record("/predict", "v1", b'{"full_sq": 89,\n "floor": 3}', 1.5)
+    assert log.flush(timeout=5)
+    batch = b'{"records": [{"full_sq": 40}, {"full_sq": 50}]}'
+    assert log.record("/predict/batch", "v2", batch, np.array([2.0, 3.0]))
+    log.close()
+
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == 2 and all(f.endswith("." + fmt) for f in files)
+    records = list(read_records(str(tmp_path)))
+    assert [r["endpoint"] for r in records] == ["/predict", "/predict/batch"]
+    assert records[0]["input"] == {"full_sq": 89, "floor": 3}
+    assert records[0]["predictions"] == [1.5]
+    assert records[1]["model_version"] == "v2"
+    assert records[1]["predictions"] == [2.0, 3.0]
+    assert records[0]["ts"] <= records[1]["ts"]
+
+
+def test_full_buffer_drops_and_counts(tmp_path):
+    log = PredictionLog(str(tmp_path), capacity=3, flush_interval=60)
+    dropped = LOG_DROPPED.labels("buffer_full")._value.get()
+    kept = [log.record("/predict", "v1", b"{}", 1.0) for _ in range(5)]
+    assert kept == [True, True, True, False, False]
+    assert LOG_DROPPED.labels("buffer_full")._value.get() == dropped + 2
+    log.close()
+    assert len(list(read_records(str(tmp_path)))) == 3
+    assert not log.record("/predict", "v1", b"{}", 1.0)  # closed
+
+
+def test_disabled_and_sampled_out_records_are_skipped(tmp_path):
+    assert not PredictionLog(None).record("/predict", "v1", b"{}", 1.0)
+    log = PredictionLog(str(tmp_path), sample=0.0)
+    assert not log.enabled
+    assert not log.record("/predict", "v1", b"{}", 1.0)
+    with pytest.raises(ValueError):
+        PredictionLog(str(tmp_path), fmt="csv")
@@ -0,0 +1,146 @@
+# tests/test_s3_transfer.py
+"""
+Test suite for src/s3_transfer.py against a moto S3 stand-in.
+Ensures:
+- multipart uploads record a sha256 that ranged downloads verify
+- corrupted or replaced objects fail the checksum
+- the streaming reader feeds pandas the exact CSV bytes
+- closing the reader early cancels queued GETs and waits for running ones
+- one client is shared per process
+"""
+
+import io
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from src import s3_transfer
+from src.s3_transfer import (
+    RangeReader,
+    TransferChecksumError,
+    download_file,
+    open_object,
+    upload_file,
+)
+
+BUCKET = "transfer-bucket"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    with mock_aws():
+        s3_transfer.reset_client()
+        client = s3_transfer.client()
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+    s3_transfer.reset_client()
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / "artifact.bin"
+    path.write_bytes(np.random.default_rng(0).bytes(11 * 1024 * 1024 + 123))
+    return str(path)
+
+
+def test_multipart_roundtrip_with_checksum(s3, artifact, tmp_path):
+    up = upload_file(artifact, BUCKET, "a.bin", part_size_mb=5, threads=4)
+    assert up.parts == 3
+    head = s3.head_object(Bucket=BUCKET, Key="a.bin")
+    assert head["Metadata"]["sha256"] == up.sha256
+    assert "-3" in head["ETag"]  # stored as a 3-part multipart upload
+
+    target = str(tmp_path / "out.bin")
+    down = download_file(BUCKET, "a.bin", target, part_size_mb=1, threads=4)
+    assert down.parts == 12 and down.sha256 == up.sha256
+    assert open(target, "rb").read() == open(artifact, "rb").read()
+    assert down.mb_per_s > 0
+
+
+def test_checksum_mismatch_is_detected(s3, tmp_path):
+    s3.put_object(
+        Bucket=BUCKET, Key="bad.bin", Body=b"tampered", Metadata={"sha256": "0" * 64}
+    )
+    with pytest.raises(TransferChecksumError):
+        download_file(BUCKET, "bad.bin", str(tmp_path / "bad.bin"))
+    with pytest.raises(TransferChecksumError):
+        with open_object(BUCKET, "bad.bin") as stream:
+            stream.read()
+    # Objects uploaded without the metadata still download
+    s3.put_object(Bucket=BUCKET, Key="plain.bin", Body=b"plain")
+    assert download_file(BUCKET, "plain.bin", str(tmp_path / "p")).bytes == 5
+
+
+def test_ranges_pinned_to_one_version(s3, artifact, tmp_path):
+    upload_file(artifact, BUCKET, "a.bin")
+    stale = s3.head_object(Bucket=BUCKET, Key="a.bin")
+    s3.put_object(Bucket=BUCKET, Key="a.bin", Body=b"replaced")
+    with pytest.raises(s3.exceptions.ClientError):
+        download_file(BUCKET, "a.bin", str(tmp_path / "x"), head=stale, part_size_mb=1)
+
+
+@pytest.mark.parametrize("part_size_mb", [0.01, 16])
+def test_streaming_reader_parses_csv(s3, tmp_path, part_size_mb):
+    df = pd.DataFrame(
+        {"full_sq": np.arange(20_000) * 0.5, "product_type": ["Investment"] * 20_000}
+    )
+    path = str(tmp_path / "train.csv")
+    df.to_csv(path, index=False)
+    upload_file(path, BUCKET, "datasets/train.csv")
+    with open_object(
+        BUCKET, "datasets/train.csv", part_size_mb=part_size_mb, read_ahead=3
+    ) as stream:
+        pd.testing.assert_frame_equal(pd.read_csv(stream), df)
+    with open_object(BUCKET, "datasets/train.csv", part_size_mb=part_size_mb) as fh:
+        assert fh.read() == open(path, "rb").read()
+
+
+def test_client_is_shared(s3):
+    assert s3_transfer.client() is s3
+    assert s3.meta.config.max_pool_connections == s3_transfer.S3_MAX_POOL_CONNECTIONS
+
+
+def test_empty_object(s3, tmp_path):
+    s3.put_object(Bucket=BUCKET, Key="empty", Body=b"")
+    target = str(tmp_path / "empty")
+    assert download_file(BUCKET, "empty", target).bytes == 0
+    assert os.path.getsize(target) == 0
+    with open_object(BUCKET, "empty") as stream:
+        assert stream.read() == b""
+
+
+def test_closing_reader_early_leaves_no_get_running():
+    class SlowS3:
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.started = self.running = 0
+
+        def head_object(self, Bucket, Key):
+            return {"ContentLength": 100 * 1024, "ETag": '"e"'}
+
+        def get_object(self, Bucket, Key, Range, IfMatch):
+            with self.lock:
+                self.started += 1
+                self.running += 1
+            start, end = map(int, Range[len("bytes=") :].split("-"))
+            time.sleep(0.2 if start else 0)
+            with self.lock:
+                self.running -= 1
+            return {"Body": io.BytesIO(b"x" * (end - start + 1))}
+
+    s3 = SlowS3()
+    reader = RangeReader(BUCKET, "k", s3=s3, part_size_mb=1 / 1024, read_ahead=4)
+    reader.read(10)
+    reader.close()
+
+    assert s3.running == 0
+    assert s3.started < reader.parts
@@ -0,0 +1,82 @@
+# tests/test_telemetry.py
+"""
+Test suite for src/telemetry.py
+Ensures stages are labelled by endpoint and the sampling profiler sees threads.
+"""
+
+import threading
+import time
+
+from prometheus_client import REGISTRY
+
+from src.telemetry import IN_FLIGHT, SamplingProfiler, stage, track_request
+
+
+def _stage_count(endpoint, name):
+    value = REGISTRY.get_sample_value(
+        "predict_stage_seconds_count", {"endpoint": endpoint, "stage": name}
+    )
+    return value or 0.0
+
+
+def test_stage_is_labelled_with_current_endpoint():
+    before = _stage_count("unit", "work")
+    with track_request("unit"):
+        assert IN_FLIGHT.labels(endpoint="unit")._value.get() == 1
+        with stage("work"):
+            pass
+    assert IN_FLIGHT.labels(endpoint="unit")._value.get() == 0
+    assert _stage_count("unit", "work") == before + 1
+
+
+def test_endpoint_label_follows_into_threads():
+    """asyncio.to_thread / the FastAPI threadpool copy the context like this."""
+    import contextvars
+
+    before = _stage_count("threaded", "work")
+
+    def work():
+        with stage("work"):
+            pass
+
+    with track_request("threaded"):
+        ctx = contextvars.copy_context()
+    thread = threading.Thread(target=ctx.run, args=(work,))
+    thread.start()
+    thread.join()
+    assert _stage_count("threaded", "work") == before + 1
+
+
+def test_profiler_collects_collapsed_stacks():
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop)
+    worker.start()
+    profiler = SamplingProfiler()
+    try:
+        profiler.start(interval_ms=1)
+        assert profiler.status()["running"]
+        time.sleep(0.2)
+        profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    status = profiler.status()
+    assert not status["running"]
+    assert status["samples"] > 0
+    lines = profiler.collapsed().splitlines()
+    assert any("busy_loop" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1 and ";" in stack
+
+
+def test_profiler_stops_itself_after_max_seconds():
+    profiler = SamplingProfiler(max_seconds=0.05)
+    profiler.start(interval_ms=1)
+    time.sleep(0.3)
+    assert not profiler.status()["running"]
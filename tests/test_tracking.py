@@ -0,0 +1,169 @@
+# tests/test_tracking.py
+"""
+Test suite for src/tracking.py
+Ensures buffered records reach the client in log_batch calls within MLflow's
+limits, artifacts upload in the background, and nothing is lost on close or
+when the tracking store is down.
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from src.tracking import (
+    MAX_ENTITIES_PER_BATCH,
+    BufferedTracker,
+    TrackingError,
+    log_sklearn_model,
+    replay_spool,
+)
+
+
+class FakeClient:
+    """Records log_batch / log_artifact calls; optionally slow or failing."""
+
+    def __init__(self, delay=0.0, fail=0):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+        self.artifacts = []
+        self.lock = threading.Lock()
+
+    def log_batch(self, run_id, metrics=(), params=None, tags=None):
+        time.sleep(self.delay)
+        with self.lock:
+            if self.fail:
+                self.fail -= 1
+                raise ConnectionError("tracking store unavailable")
+            self.batches.append((run_id, list(metrics), params, tags))
+
+    def log_artifact(self, run_id, local_path, artifact_path=None):
+        time.sleep(self.delay)
+        with self.lock:
+            self.artifacts.append((run_id, local_path, artifact_path))
+
+    def metrics(self, run_id="run"):
+        return [m for r, ms, _, _ in self.batches if r == run_id for m in ms]
+
+
+def test_records_are_batched_and_flushed_on_close():
+    client = FakeClient(delay=0.01)
+    with BufferedTracker("run", client, flush_interval=60) as tracker:
+        start = time.perf_counter()
+        for step in range(2500):
+            tracker.log_metric("partial_rmse", step * 0.5, step=step)
+        tracker.log_params({"n_estimators": 100, "max_depth": None})
+        tracker.set_tag("pruned", False)
+        tracker.log_metric("rmse", 1.5, run_id="trial-1")
+        # Logging never waits on the (slow) client
+        assert time.perf_counter() - start < 0.5
+    metrics = client.metrics()
+    assert [m[3] for m in metrics] == list(range(2500))
+    assert all(
+        len(ms) + len(p) + len(t) <= MAX_ENTITIES_PER_BATCH
+        for _, ms, p, t in client.batches
+    )
+    params = {k: v for _, _, p, _ in client.batches for k, v in p.items()}
+    assert params == {"n_estimators": 100, "max_depth": None}
+    assert client.metrics("trial-1")[0][:2] == ("rmse", 1.5)
+    assert len(client.batches) < 10
+
+
+def test_flush_waits_for_records_and_artifacts():
+    client = FakeClient(delay=0.05)
+    tracker = BufferedTracker("run", client, flush_interval=60)
+    tracker.log_metric("r2", 0.9)
+    futures = [tracker.log_artifact(f"/tmp/a{i}", "model") for i in range(4)]
+    done = tracker.submit(lambda: "uploaded")
+    tracker.flush()
+    assert client.metrics()[0][:2] == ("r2", 0.9)
+    assert sorted(a[1] for a in client.artifacts) == [f"/tmp/a{i}" for i in range(4)]
+    assert all(f.done() for f in futures) and done.result() == "uploaded"
+    tracker.close()
+    tracker.close()  # idempotent
+    with pytest.raises(RuntimeError):
+        tracker.log_metric("late", 1.0)
+
+
+def test_failed_batches_are_retried_then_spooled(tmp_path):
+    client = FakeClient(fail=1)
+    with BufferedTracker("run", client, spool_dir=str(tmp_path)) as tracker:
+        tracker.log_metric("rmse", 2.0)
+    assert client.metrics()[0][:2] == ("rmse", 2.0)
+
+    client = FakeClient(fail=100)
+    with pytest.raises(TrackingError):
+        with BufferedTracker("run", client, spool_dir=str(tmp_path)) as tracker:
+            tracker.log_metric("rmse", 3.0)
+            tracker.log_param("seed", 42)
+    spooled = tmp_path / "run.jsonl"
+    assert spooled.exists()
+
+    replayed = FakeClient()
+    assert replay_spool(str(spooled), replayed) == 1
+    assert replayed.metrics()[0][:2] == ("rmse", 3.0)
+    assert replayed.batches[0][2] == {"seed": 42}
+    assert not spooled.exists()
+
+
+def test_close_flushes_when_training_raises():
+    client = FakeClient()
+    with pytest.raises(ValueError):
+        with BufferedTracker("run", client, flush_interval=60) as tracker:
+            tracker.log_metric("rmse", 4.0)
+            raise ValueError("fit failed")
+    assert client.metrics()[0][:2] == ("rmse", 4.0)
+
+
+def test_artifact_errors_surface_on_flush():
+    tracker = BufferedTracker("run", FakeClient(), flush_interval=60)
+    tracker.submit(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        tracker.flush()
+    tracker.close()
+
+
+def test_conflicting_param_is_rejected_when_logged():
+    client = FakeClient()
+    with BufferedTracker("run", client, flush_interval=60) as tracker:
+        tracker.log_param("n_estimators", 100)
+        tracker.flush()
+        tracker.log_param("n_estimators", "100")  # same value, as MLflow stores it
+        with pytest.raises(ValueError, match="n_estimators"):
+            tracker.log_param("n_estimators", 200)
+        tracker.log_param("n_estimators", 300, run_id="trial-1")
+    assert not tracker.errors
+
+
+def test_sklearn_model_is_uploaded_without_resuming_the_run(monkeypatch):
+    # A fluent start_run in the worker would end the run when it returns
+    import sys
+    import types
+
+    saved = []
+
+    def save_model(model, path):
+        os.makedirs(path)
+        with open(os.path.join(path, "MLmodel"), "w") as fh:
+            fh.write(str(model))
+        saved.append(path)
+
+    sklearn_flavor = types.SimpleNamespace(save_model=save_model)
+    monkeypatch.setitem(
+        sys.modules, "mlflow", types.SimpleNamespace(sklearn=sklearn_flavor)
+    )
+    monkeypatch.setitem(sys.modules, "mlflow.sklearn", sklearn_flavor)
+
+    class ArtifactClient(FakeClient):
+        def log_artifacts(self, run_id, local_dir, artifact_path=None):
+            self.artifacts.append(
+                (run_id, sorted(os.listdir(local_dir)), artifact_path)
+            )
+
+    client = ArtifactClient()
+    with BufferedTracker("run", client, flush_interval=60) as tracker:
+        tracker.submit(log_sklearn_model, "forest", "run", client=client)
+    assert client.artifacts == [("run", ["MLmodel"], "model")]
+    assert not os.path.exists(saved[0])  # the local copy is cleaned up
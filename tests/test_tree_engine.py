@@ -0,0 +1,75 @@
+# tests/test_tree_engine.py
+"""
+Test suite for src/tree_engine.py
+Ensures the compiled flat-array forest predicts exactly like sklearn.
+"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor
+from sklearn.dummy import DummyRegressor
+
+from src.tree_engine import CompiledForest, compile_model, load_arrays, save_arrays
+
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(1000, 5))
+    y = X[:, 0] * 3 + X[:, 1] ** 2 + rng.normal(size=1000)
+    return ExtraTreesRegressor(n_estimators=20, random_state=0).fit(X, y)
+
+
+@pytest.mark.parametrize("n_rows", [1, 64, 500])
+def test_compiled_matches_sklearn(forest, n_rows):
+    X = np.random.default_rng(1).normal(size=(n_rows, 5))
+    compiled = CompiledForest.from_estimator(forest)
+    np.testing.assert_allclose(compiled.predict(X), forest.predict(X), rtol=1e-9)
+
+
+def test_compiled_handles_missing_values(forest):
+    X = np.random.default_rng(2).normal(size=(200, 5))
+    X[::3, 1] = np.nan
+    compiled = CompiledForest.from_estimator(forest)
+    np.testing.assert_allclose(compiled.predict(X), forest.predict(X), rtol=1e-9)
+
+
+def test_depth_recomputed_from_children(forest):
+    compiled = CompiledForest.from_estimator(forest)
+    assert compiled._depth_from_children() == compiled.max_depth
+
+
+def test_compile_model_falls_back_for_non_tree_models():
+    dummy = DummyRegressor().fit(np.zeros((2, 1)), np.zeros(2))
+    assert compile_model(dummy) is dummy
+
+
+def test_large_batches_use_fallback(forest):
+    compiled = compile_model(forest, fallback_min_rows=10)
+    X = np.random.default_rng(3).normal(size=(20, 5))
+    np.testing.assert_array_equal(compiled.predict(X), forest.predict(X))
+
+
+def test_saved_arrays_are_memory_mapped(forest, tmp_path):
+    compiled = CompiledForest.from_estimator(forest)
+    save_arrays(compiled, str(tmp_path / "arrays"))
+    mapped = load_arrays(str(tmp_path / "arrays"))
+    assert isinstance(mapped.threshold, np.memmap)
+    assert not mapped.threshold.flags.writeable
+    X = np.random.default_rng(4).normal(size=(50, 5))
+    np.testing.assert_array_equal(mapped.predict(X), compiled.predict(X))
+
+
+def test_load_shared_arrays_builds_once(forest, tmp_path):
+    import joblib
+    from src.inference import load_shared_arrays
+
+    model_path = str(tmp_path / "model.pkl")
+    joblib.dump(forest, model_path)
+    first = load_shared_arrays(model_path)
+    meta_mtime = (tmp_path / "model.pkl.arrays" / "meta.json").stat().st_mtime_ns
+    second = load_shared_arrays(model_path)
+    assert (tmp_path / "model.pkl.arrays" / "meta.json").stat().st_mtime_ns == meta_mtime
+    X = np.random.default_rng(5).normal(size=(10, 5))
+    np.testing.assert_allclose(second.predict(X), forest.predict(X), rtol=1e-9)
+    assert first.n_estimators == forest.n_estimators